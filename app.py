@@ -5,6 +5,7 @@ import plotly.graph_objects as go
 import joblib
 import numpy as np
 from scipy import stats  
+import model_warmup
 
 # ---------------------- 全局配置 ----------------------
 st.set_page_config(page_title="学生成绩分析与预测系统", page_icon="📊", layout="wide")
@@ -17,7 +18,8 @@ def load_data():
     df = df.dropna()  
     return df
 
-model = joblib.load("score_prediction_model.pkl")
+# 模型由后台预热线程加载（进程内只加载一次，而不是每次重新运行脚本都joblib.load）
+model = model_warmup.wait_for("score")
 majors = joblib.load("majors_list.pkl")
 df = load_data()
 
@@ -0,0 +1,148 @@
+# 模型基准矩阵 - 在不同规模的模拟数据上测量 读取/训练/预测 耗时，对比随机森林与直方图梯度提升树
+# 结果写入JSON文件（每条记录一个 数据集×行数×模型 组合），便于后续比较与作图
+# 用法：
+#   python benchmark_matrix.py                                    默认 1千/1万/10万/100万行，四个数据集
+#   python benchmark_matrix.py --sizes 1000 100000 10000000 --datasets insurance sales
+#   python benchmark_matrix.py --format parquet --out results.json
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.model_selection import train_test_split
+import synthetic_data
+
+# ===================== 全局配置 =====================
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+RESULTS_PATH = "benchmark_results.json"
+TIME_BUDGET = 300   # 预计训练耗时超过该秒数的组合直接跳过（按上一规模的耗时线性外推）
+RANDOM_STATE = 42
+# 每个数据集的预测任务：目标列、任务类型、不作为特征的列
+TASKS = {
+    "insurance": {"target": "医疗费用", "kind": "regression", "drop": []},
+    "penguins": {"target": "企鹅的种类", "kind": "classification", "drop": ["观测年份"]},
+    "students": {"target": "期末考试分数", "kind": "regression", "drop": ["学号"]},
+    "sales": {"target": "总价", "kind": "regression", "drop": ["订单号", "日期", "时间", "单价"]},
+}
+MODELS = {
+    "RandomForest": {
+        "regression": lambda: RandomForestRegressor(n_estimators=100, n_jobs=-1, random_state=RANDOM_STATE),
+        "classification": lambda: RandomForestClassifier(n_estimators=100, n_jobs=-1, random_state=RANDOM_STATE),
+    },
+    "HistGradientBoosting": {
+        "regression": lambda: HistGradientBoostingRegressor(random_state=RANDOM_STATE),
+        "classification": lambda: HistGradientBoostingClassifier(random_state=RANDOM_STATE),
+    },
+}
+
+# ===================== 数据准备 =====================
+def to_matrix(df, task):
+    """分类列转为整数编码（缺失为NaN），两种模型使用同一份矩阵"""
+    df = df.dropna(subset=[task["target"]])
+    X = df.drop(columns=[task["target"]] + task["drop"])
+    for col in X.columns:
+        if not pd.api.types.is_numeric_dtype(X[col]):
+            codes = pd.Categorical(X[col]).codes.astype(np.float32)
+            codes[codes < 0] = np.nan
+            X[col] = codes
+    return X.to_numpy(dtype=np.float32), df[task["target"]].to_numpy()
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+# ===================== 基准矩阵 =====================
+def run_matrix(datasets, sizes, file_format="csv", budget=TIME_BUDGET, log=print):
+    """
+    逐个 数据集 × 行数 生成文件、读取、训练、预测
+    :return: 结果记录列表
+    """
+    workdir = tempfile.mkdtemp(prefix="benchmark_matrix_")
+    records = []
+    last_train = {}  # (数据集, 模型) -> (行数, 训练耗时)，用于外推跳过
+    try:
+        for name in datasets:
+            task = TASKS[name]
+            for rows in sorted(sizes):
+                path = os.path.join(workdir, f"{name}_{rows}.{file_format}")
+                _, gen_seconds = _timed(lambda: synthetic_data.write_file(name, rows, path))
+                reader = pd.read_parquet if file_format == "parquet" else \
+                    (lambda p: pd.read_csv(p, encoding="utf-8-sig"))
+                df, load_seconds = _timed(lambda: reader(path))
+                X, y = to_matrix(df, task)
+                del df
+                X_train, X_test, y_train, y_test = train_test_split(
+                    X, y, test_size=0.2, random_state=RANDOM_STATE)
+                for model_name, factories in MODELS.items():
+                    record = {
+                        "数据集": name, "行数": rows, "模型": model_name, "任务": task["kind"],
+                        "文件格式": file_format, "文件大小(MB)": round(os.path.getsize(path) / 2**20, 2),
+                        "生成耗时(秒)": round(gen_seconds, 3), "读取耗时(秒)": round(load_seconds, 3),
+                    }
+                    prev = last_train.get((name, model_name))
+                    if prev and prev[1] * rows / prev[0] > budget:
+                        record["状态"] = f"跳过（预计训练超过{budget}秒）"
+                        records.append(record)
+                        log(record)
+                        continue
+                    model = factories[task["kind"]]()
+                    _, train_seconds = _timed(lambda: model.fit(X_train, y_train))
+                    _, predict_seconds = _timed(lambda: model.predict(X_test))
+                    last_train[(name, model_name)] = (rows, train_seconds)
+                    record.update({
+                        "状态": "完成",
+                        "训练耗时(秒)": round(train_seconds, 3),
+                        "预测耗时(秒)": round(predict_seconds, 3),
+                        "预测吞吐量(行/秒)": int(len(X_test) / predict_seconds) if predict_seconds > 0 else None,
+                        "评估指标": "准确率" if task["kind"] == "classification" else "R²",
+                        "得分": round(float(model.score(X_test, y_test)), 4),
+                    })
+                    records.append(record)
+                    log(record)
+                os.remove(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return records
+
+def write_results(records, path=RESULTS_PATH):
+    """结果连同运行环境写入JSON"""
+    payload = {
+        "环境": {
+            "CPU核数": os.cpu_count(),
+            "平台": platform.platform(),
+            "Python": platform.python_version(),
+            "scikit-learn": sklearn.__version__,
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "时间": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "结果": records,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+# ===================== 命令行入口 =====================
+def main():
+    parser = argparse.ArgumentParser(description="模型基准矩阵")
+    parser.add_argument("--datasets", nargs="+", choices=sorted(TASKS), default=list(TASKS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--budget", type=float, default=TIME_BUDGET, help="单次训练的预计耗时上限（秒）")
+    parser.add_argument("--out", default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    records = run_matrix(args.datasets, args.sizes, args.format, args.budget,
+                         log=lambda r: print({k: r[k] for k in r if k not in ("任务", "文件格式")}))
+    write_results(records, args.out)
+    print(f"✅ 结果已写入：{args.out}（{len(records)}条）")
+
+if __name__ == "__main__":
+    main()
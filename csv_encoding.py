@@ -0,0 +1,21 @@
+# 文件编码检测 - 读取中文CSV前先探测编码（企鹅/医疗费用的数据集与上传文件共用）
+# 用法：
+#   from csv_encoding import detect_encoding
+#   pd.read_csv(path, encoding=detect_encoding(path))
+import os
+import chardet
+
+# ===================== 全局配置 =====================
+SAMPLE_BYTES = 10000  # 用于检测的字节数
+
+# ===================== 编码检测 =====================
+def detect_encoding(file_obj):
+    """检测CSV编码（支持路径或二进制文件对象；文件对象读完后回到原位置）"""
+    if isinstance(file_obj, (str, os.PathLike)):
+        with open(file_obj, 'rb') as f:
+            raw_data = f.read(SAMPLE_BYTES)
+    else:
+        pos = file_obj.tell()
+        raw_data = file_obj.read(SAMPLE_BYTES)
+        file_obj.seek(pos)
+    return chardet.detect(raw_data)['encoding'] or 'utf-8'
@@ -1,113 +1,8 @@
 # 第8章/streamlit_predict_v2.py - 适配中文数据集penguins-chinese.csv
 import streamlit as st
-import pickle
 import pandas as pd
-import os
-import chardet
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder
-
-# ===================== 全局配置（适配中文数据集） =====================
-DATA_PATH = "penguins-chinese.csv"  # 中文数据集路径
-MODEL_PATH = "rfc_model.pkl"        # 模型保存路径
-MAP_PATH = "output_uniques.pkl"     # 物种映射文件路径
-# 中文数据集必要列名（已从CSV读取确认）
-REQUIRED_COLS = ["岛屿", "性别", "喙长度(mm)", "喙深度(mm)", "鳍长度(mm)", "体重(g)", "物种"]
-# 模型输入特征列名（中文编码后）
-FEATURE_NAMES = [
-    "喙长度(mm)", "喙深度(mm)", "鳍长度(mm)", "体重(g)",
-    "岛屿_托托尔森岛", "岛屿_比斯科岛", "岛屿_德里姆岛",
-    "性别_雌性", "性别_雄性"
-]
-
-# ===================== 辅助函数：检测文件编码 =====================
-def detect_encoding(file_path):
-    """检测CSV文件编码，解决中文解码错误"""
-    with open(file_path, 'rb') as f:
-        raw_data = f.read(10000)
-    return chardet.detect(raw_data)['encoding']
-
-# ===================== 数据预处理与模型训练 =====================
-def load_preprocess_data():
-    """加载中文数据集并预处理"""
-    # 1. 检查文件是否存在
-    if not os.path.exists(DATA_PATH):
-        st.error(f"❌ 未找到数据集：{DATA_PATH}，请放在代码同一目录！")
-        st.stop()
-    
-    # 2. 读取中文CSV（适配编码）
-    try:
-        df = pd.read_csv(DATA_PATH, encoding='gbk')
-    except UnicodeDecodeError:
-        enc = detect_encoding(DATA_PATH)
-        st.warning(f"⚠️ 用检测到的编码{enc}读取文件")
-        df = pd.read_csv(DATA_PATH, encoding=enc)
-    
-    # 3. 检查必要列
-    missing_cols = [col for col in REQUIRED_COLS if col not in df.columns]
-    if missing_cols:
-        st.error(f"❌ 数据集缺少列：{missing_cols}")
-        st.error(f"当前列名：{list(df.columns)}")
-        st.stop()
-    
-    # 4. 处理缺失值
-    df = df.dropna(subset=REQUIRED_COLS)
-    if len(df) == 0:
-        st.error("❌ 数据集无有效数据（全为缺失值）")
-        st.stop()
-    
-    # 5. 分离特征（X）和标签（y）
-    X = df[["岛屿", "性别", "喙长度(mm)", "喙深度(mm)", "鳍长度(mm)", "体重(g)"]]
-    y = df["物种"]
-    
-    # 6. 分类特征独热编码（中文值）
-    cat_encoder = OneHotEncoder(sparse_output=False, drop=None)
-    encoded_cats = cat_encoder.fit_transform(X[["岛屿", "性别"]])
-    
-    # 7. 构造编码后特征名
-    encoded_names = []
-    for i, feat in enumerate(["岛屿", "性别"]):
-        for cat in cat_encoder.categories_[i]:
-            encoded_names.append(f"{feat}_{cat}")
-    
-    # 8. 合并数值特征与编码特征
-    numeric_feat = X[["喙长度(mm)", "喙深度(mm)", "鳍长度(mm)", "体重(g)"]].reset_index(drop=True)
-    encoded_df = pd.DataFrame(encoded_cats, columns=encoded_names)
-    X_processed = pd.concat([numeric_feat, encoded_df], axis=1)
-    
-    # 9. 补全特征列（确保与FEATURE_NAMES一致）
-    for col in FEATURE_NAMES:
-        if col not in X_processed.columns:
-            X_processed[col] = 0
-    X_processed = X_processed[FEATURE_NAMES]
-    
-    # 10. 生成物种映射（用于预测结果显示）
-    species_map = {i: sp for i, sp in enumerate(y.unique())}
-    return X_processed, y, species_map, cat_encoder
-
-def train_model():
-    """训练随机森林模型并保存（无模型时自动执行）"""
-    if os.path.exists(MODEL_PATH) and os.path.exists(MAP_PATH):
-        return
-    
-    # 加载预处理数据
-    X, y, species_map, _ = load_preprocess_data()
-    
-    # 划分训练集
-    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # 训练模型
-    rfc = RandomForestClassifier(n_estimators=100, random_state=42)
-    rfc.fit(X_train, y_train)
-    
-    # 保存模型和映射
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump(rfc, f)
-    with open(MAP_PATH, 'wb') as f:
-        pickle.dump(species_map, f)
-    
-    st.success("✅ 模型训练完成！已生成rfc_model.pkl和output_uniques.pkl")
+import model_warmup
+import penguin_model as pm
 
 # ===================== 页面功能 =====================
 def intro_page():
@@ -150,33 +45,23 @@ def predict_page():
             body_mass = st.number_input('体重(克)', min_value=2700.0, max_value=6300.0, value=4000.0)
             submitted = st.form_submit_button('预测物种', type='primary')
 
-            # 1. 初始化特征向量（与FEATURE_NAMES对齐）
-            feature_vec = [0] * len(FEATURE_NAMES)
-            # 填充数值特征
-            feature_vec[FEATURE_NAMES.index("喙长度(mm)")] = bill_length
-            feature_vec[FEATURE_NAMES.index("喙深度(mm)")] = bill_depth
-            feature_vec[FEATURE_NAMES.index("鳍长度(mm)")] = flipper_length
-            feature_vec[FEATURE_NAMES.index("体重(g)")] = body_mass
-            # 填充分类特征（独热编码）
-            feature_vec[FEATURE_NAMES.index(f"岛屿_{island}")] = 1
-            feature_vec[FEATURE_NAMES.index(f"性别_{sex}")] = 1
-
-            # 2. 加载模型（无模型则自动训练）
-            if not (os.path.exists(MODEL_PATH) and os.path.exists(MAP_PATH)):
-                with st.spinner("首次使用，正在训练模型...（约5秒）"):
-                    train_model()
+            # 1. 按penguin_model的列名组织输入（与后台预热的模型使用同一套编码和特征名）
+            raw_row = pd.DataFrame([{
+                pm.ISLAND_COL: island, pm.SEX_COL: sex,
+                "喙的长度": bill_length, "喙的深度": bill_depth,
+                "翅膀的长度": flipper_length, "身体质量": body_mass,
+            }])
 
-            # 3. 预测逻辑
+            # 2. 预测逻辑
+            pred_species = ""
             if submitted:
                 try:
-                    # 加载模型和物种映射
-                    with open(MODEL_PATH, 'rb') as f:
-                        rfc_model = pickle.load(f)
-                    with open(MAP_PATH, 'rb') as f:
-                        species_map = pickle.load(f)
+                    # 取出后台预热好的模型和物种映射（服务启动时已加载/训练，未就绪则等待）
+                    with st.spinner("模型正在后台预热，请稍候..."):
+                        rfc_model, species_map = model_warmup.wait_for("penguin")
 
                     # 格式化输入数据
-                    input_df = pd.DataFrame([feature_vec], columns=FEATURE_NAMES)
+                    input_df = pm.to_frame(pm.encode_features(raw_row)[0])
                     # 预测（返回物种索引，映射为中文名称）
                     pred_idx = rfc_model.predict(input_df)[0]
                     pred_species = species_map[pred_idx]
@@ -186,7 +71,7 @@ def predict_page():
 
                 except Exception as e:
                     st.error(f"❌ 预测出错：{str(e)}")
-                    st.info("建议：删除rfc_model.pkl和output_uniques.pkl后重新运行，重新训练模型")
+                    st.info(f"建议：删除{pm.MODEL_PATH}和{pm.MAP_PATH}后重新运行，重新训练模型")
 
     # 右侧显示图片（无图片时显示提示）
     with col_logo:
@@ -195,7 +80,7 @@ def predict_page():
                 st.image('images/rigth_logo.png', width=300, caption="企鹅分类器")
             except:
                 st.info("⚠️ 未找到images/rigth_logo.png，可添加Logo图片")
-        else:
+        elif pred_species:
             # 预测后显示对应物种图片（需提前准备图片，命名为物种名.png）
             try:
                 st.image(f'images/{pred_species}.png', width=300, caption=f"{pred_species}")
@@ -204,6 +89,8 @@ def predict_page():
 
 # ===================== 主程序 =====================
 def main():
+    # 启动模型后台预热（用serve.py启动时已在服务启动时开始，这里重复调用无副作用）
+    model_warmup.start_warmup(["penguin"])
     # 页面基础配置
     st.set_page_config(
         page_title="企鹅分类器（中文数据集版）",
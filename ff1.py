@@ -1,6 +1,5 @@
 # 第8章/streamlit_predict_v2.py - 修复物种映射+特征列名问题
 import streamlit as st
-import pickle
 import pandas as pd
 import os
 import chardet
@@ -10,6 +9,10 @@ from PIL import Image
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder, LabelEncoder
+from penguin_batch import batch_page
+from model_registry import get_params
+from model_store import ensure_trained, load_all
+from penguin_neighbors import similar_penguins_panel
 
 # ===================== 全局配置（适配实际数据集列名） =====================
 DATA_PATH = "penguins-chinese.csv"  # 中文数据集路径
@@ -121,37 +124,25 @@ def load_preprocess_data():
 
 def train_model(force_retrain=False):
     """
-    训练随机森林模型并保存
-    :param force_retrain: 是否强制重新训练（删除旧模型）
+    训练随机森林模型并保存（原子写入+文件锁，并发请求只训练一次）
+    :param force_retrain: 是否强制重新训练（等锁期间其他会话已训练完成则直接复用）
     """
-    # 强制删除旧模型
-    if force_retrain:
-        if os.path.exists(MODEL_PATH):
-            os.remove(MODEL_PATH)
-        if os.path.exists(MAP_PATH):
-            os.remove(MAP_PATH)
+    def fit():
+        # 加载预处理数据
+        X, y, species_map, _, _ = load_preprocess_data()
     
-    # 已有模型且不强制重训则直接返回
-    if os.path.exists(MODEL_PATH) and os.path.exists(MAP_PATH) and not force_retrain:
-        return
+        # 划分训练集
+        X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
     
-    # 加载预处理数据
-    X, y, species_map, _, _ = load_preprocess_data()
+        # 训练模型
+        # 超参数优先取penguin_tuning.py写入登记表的最优配置
+        rfc = RandomForestClassifier(**get_params("penguin", {"n_estimators": 100, "random_state": 42}))
+        rfc.fit(X_train, y_train)
+        return [rfc, species_map]
     
-    # 划分训练集
-    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # 训练模型
-    rfc = RandomForestClassifier(n_estimators=100, random_state=42)
-    rfc.fit(X_train, y_train)
-    
-    # 保存模型和物种映射
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump(rfc, f)
-    with open(MAP_PATH, 'wb') as f:
-        pickle.dump(species_map, f)
-    
-    st.success("✅ 模型训练完成！已生成rfc_model.pkl和output_uniques.pkl")
+    # 不再先删除旧模型：新模型写临时文件后rename覆盖，其他会话读到的始终是完整文件
+    if ensure_trained([MODEL_PATH, MAP_PATH], fit, force=force_retrain):
+        st.success("✅ 模型训练完成！已生成rfc_model.pkl和output_uniques.pkl")
 
 # ===================== 页面功能 =====================
 def intro_page():
@@ -214,10 +205,7 @@ def predict_page():
                     train_model(force_retrain=True)
 
                     # 加载模型和物种映射
-                    with open(MODEL_PATH, 'rb') as f:
-                        rfc_model = pickle.load(f)
-                    with open(MAP_PATH, 'rb') as f:
-                        species_map = pickle.load(f)
+                    rfc_model, species_map = load_all([MODEL_PATH, MAP_PATH])
 
                     # 格式化输入数据（确保列名、类型匹配）
                     input_df = pd.DataFrame(
@@ -274,6 +262,10 @@ def predict_page():
             else:
                 st.info("⚠️ 暂无有效预测结果，无法加载物种图片")
 
+    # 预测后展示训练集中最相似的企鹅（KD树近邻检索）
+    if submitted and pred_species and pred_species != "未知物种":
+        similar_penguins_panel([bill_length, bill_depth, flipper_length, body_mass])
+
 # ===================== 主程序 =====================
 def main():
     # 页面基础配置
@@ -292,13 +284,15 @@ def main():
         st.title('功能导航')
         page = st.selectbox(
             "选择页面", 
-            ["简介页面", "预测分类页面"], 
+            ["简介页面", "预测分类页面", "批量预测页面"], 
             label_visibility='collapsed'
         )
 
     # 页面路由
     if page == "简介页面":
         intro_page()
+    elif page == "批量预测页面":
+        batch_page()
     else:
         predict_page()
 
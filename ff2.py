@@ -1,6 +1,5 @@
 # 第8章/streamlit_predict_v2.py - 直接读取根目录图片（适配你的文件结构）
 import streamlit as st
-import pickle
 import pandas as pd
 import os
 import chardet
@@ -8,6 +7,8 @@ from PIL import Image
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder, LabelEncoder
+from model_registry import get_params
+from model_store import ensure_trained, load_all
 
 # ===================== 全局配置（适配根目录图片） =====================
 DATA_PATH = "penguins-chinese.csv"  # 中文数据集路径
@@ -106,31 +107,19 @@ def load_preprocess_data():
     return X_processed, y_encoded, species_map, cat_encoder, label_encoder
 
 def train_model(force_retrain=False):
-    """训练并保存模型"""
-    if force_retrain:
-        # 强制删除旧模型
-        if os.path.exists(MODEL_PATH):
-            os.remove(MODEL_PATH)
-        if os.path.exists(MAP_PATH):
-            os.remove(MAP_PATH)
-    
-    # 已有模型则跳过
-    if os.path.exists(MODEL_PATH) and os.path.exists(MAP_PATH) and not force_retrain:
-        return
-    
-    # 加载数据并训练
-    X, y, species_map, _, _ = load_preprocess_data()
-    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
-    rfc = RandomForestClassifier(n_estimators=100, random_state=42)
-    rfc.fit(X_train, y_train)
-    
-    # 保存模型
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump(rfc, f)
-    with open(MAP_PATH, 'wb') as f:
-        pickle.dump(species_map, f)
-    
-    st.success("✅ 模型训练完成！")
+    """训练并保存模型（原子写入+文件锁，并发请求只训练一次）"""
+    def fit():
+        # 加载数据并训练
+        X, y, species_map, _, _ = load_preprocess_data()
+        X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
+        # 超参数优先取penguin_tuning.py写入登记表的最优配置
+        rfc = RandomForestClassifier(**get_params("penguin", {"n_estimators": 100, "random_state": 42}))
+        rfc.fit(X_train, y_train)
+        return [rfc, species_map]
+    
+    # 不再先删除旧模型：新模型写临时文件后rename覆盖，其他会话读到的始终是完整文件
+    if ensure_trained([MODEL_PATH, MAP_PATH], fit, force=force_retrain):
+        st.success("✅ 模型训练完成！")
 
 # ===================== 页面功能（直接读取根目录图片） =====================
 def intro_page():
@@ -191,10 +180,7 @@ def predict_page():
                     train_model(force_retrain=True)
 
                     # 加载模型
-                    with open(MODEL_PATH, 'rb') as f:
-                        rfc_model = pickle.load(f)
-                    with open(MAP_PATH, 'rb') as f:
-                        species_map = pickle.load(f)
+                    rfc_model, species_map = load_all([MODEL_PATH, MAP_PATH])
 
                     # 预测
                     input_df = pd.DataFrame([feature_vec], columns=FEATURE_NAMES, dtype=float)
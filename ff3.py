@@ -1,32 +1,17 @@
 # 第8章/streamlit_predict_v2.py - 适配GitHub图片文件名+修复所有路径问题
 import streamlit as st
-import pickle
 import pandas as pd
 import os
-import chardet
 import zipfile
 import io
 from PIL import Image
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder, LabelEncoder
+from penguin_batch import batch_page
+import model_warmup
+import penguin_model as pm
+from penguin_neighbors import similar_penguins_panel
 
 # ===================== 全局配置（完全适配GitHub文件） =====================
-DATA_PATH = "penguins-chinese.csv"  # 中文数据集路径
-MODEL_PATH = "rfc_model.pkl"        # 模型保存路径
-MAP_PATH = "output_uniques.pkl"     # 物种映射文件路径
 ZIP_IMAGE_PATH = "images.zip"       # 图片压缩包路径（与代码同目录）
-# 实际数据集必要列名
-REQUIRED_COLS = [
-    "企鹅栖息的岛屿", "性别", "喙的长度", "喙的深度", 
-    "翅膀的长度", "身体质量", "企鹅的种类"
-]
-# 模型输入特征列名
-FEATURE_NAMES = [
-    "喙的长度", "喙的深度", "翅膀的长度", "身体质量",
-    "企鹅栖息的岛屿_托托尔森岛", "企鹅栖息的岛屿_比斯科岛", "企鹅栖息的岛屿_德里姆岛",
-    "性别_雌性", "性别_雄性"
-]
 
 # ===================== 核心辅助函数：读取ZIP内图片（适配GitHub图片名） =====================
 def load_image_from_zip(zip_file_path, image_filename):
@@ -71,99 +56,6 @@ def load_image_from_zip(zip_file_path, image_filename):
         st.warning(f"⚠️ 读取图片失败：{str(e)}")
         return None
 
-# ===================== 辅助函数：检测文件编码 =====================
-def detect_encoding(file_path):
-    """检测CSV文件编码"""
-    with open(file_path, 'rb') as f:
-        raw_data = f.read(10000)
-    return chardet.detect(raw_data)['encoding']
-
-# ===================== 数据预处理与模型训练 =====================
-def load_preprocess_data():
-    """加载数据集并预处理"""
-    if not os.path.exists(DATA_PATH):
-        st.error(f"❌ 未找到数据集：{DATA_PATH}")
-        st.stop()
-    
-    # 读取中文CSV（适配编码）
-    try:
-        df = pd.read_csv(DATA_PATH, encoding='gbk')
-    except UnicodeDecodeError:
-        enc = detect_encoding(DATA_PATH)
-        st.warning(f"⚠️ 用编码{enc}读取文件")
-        df = pd.read_csv(DATA_PATH, encoding=enc)
-    
-    # 检查必要列
-    missing_cols = [col for col in REQUIRED_COLS if col not in df.columns]
-    if missing_cols:
-        st.error(f"❌ 数据集缺少列：{missing_cols}")
-        st.stop()
-    
-    # 处理缺失值
-    df = df.dropna(subset=REQUIRED_COLS)
-    if len(df) == 0:
-        st.error("❌ 数据集无有效数据")
-        st.stop()
-    
-    # 分离特征和标签
-    X = df[["企鹅栖息的岛屿", "性别", "喙的长度", "喙的深度", "翅膀的长度", "身体质量"]]
-    y = df["企鹅的种类"]
-    
-    # 标签编码
-    label_encoder = LabelEncoder()
-    y_encoded = label_encoder.fit_transform(y)
-    species_map = {i: sp for i, sp in enumerate(label_encoder.classes_)}
-    
-    # 独热编码分类特征
-    cat_encoder = OneHotEncoder(sparse_output=False, drop=None)
-    encoded_cats = cat_encoder.fit_transform(X[["企鹅栖息的岛屿", "性别"]])
-    
-    # 构造编码特征名
-    encoded_names = []
-    for i, feat in enumerate(["企鹅栖息的岛屿", "性别"]):
-        for cat in cat_encoder.categories_[i]:
-            encoded_names.append(f"{feat}_{cat}")
-    
-    # 合并特征
-    numeric_feat = X[["喙的长度", "喙的深度", "翅膀的长度", "身体质量"]].reset_index(drop=True)
-    encoded_df = pd.DataFrame(encoded_cats, columns=encoded_names)
-    X_processed = pd.concat([numeric_feat, encoded_df], axis=1)
-    
-    # 补全特征列
-    for col in FEATURE_NAMES:
-        if col not in X_processed.columns:
-            X_processed[col] = 0.0
-    X_processed = X_processed[FEATURE_NAMES]
-    
-    return X_processed, y_encoded, species_map, cat_encoder, label_encoder
-
-def train_model(force_retrain=False):
-    """训练并保存模型"""
-    if force_retrain:
-        # 强制删除旧模型
-        if os.path.exists(MODEL_PATH):
-            os.remove(MODEL_PATH)
-        if os.path.exists(MAP_PATH):
-            os.remove(MAP_PATH)
-    
-    # 已有模型则跳过
-    if os.path.exists(MODEL_PATH) and os.path.exists(MAP_PATH) and not force_retrain:
-        return
-    
-    # 加载数据并训练
-    X, y, species_map, _, _ = load_preprocess_data()
-    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
-    rfc = RandomForestClassifier(n_estimators=100, random_state=42)
-    rfc.fit(X_train, y_train)
-    
-    # 保存模型
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump(rfc, f)
-    with open(MAP_PATH, 'wb') as f:
-        pickle.dump(species_map, f)
-    
-    st.success("✅ 模型训练完成！")
-
 # ===================== 页面功能（适配GitHub图片名） =====================
 def intro_page():
     """简介页面"""
@@ -205,33 +97,25 @@ def predict_page():
             body_mass = st.number_input('身体质量(克)', min_value=2700.0, max_value=6300.0, value=4000.0)
             submitted = st.form_submit_button('预测物种', type='primary')
 
-            # 初始化特征向量
-            feature_vec = [0.0] * len(FEATURE_NAMES)
-            # 填充数值特征
-            feature_vec[FEATURE_NAMES.index("喙的长度")] = bill_length
-            feature_vec[FEATURE_NAMES.index("喙的深度")] = bill_depth
-            feature_vec[FEATURE_NAMES.index("翅膀的长度")] = flipper_length
-            feature_vec[FEATURE_NAMES.index("身体质量")] = body_mass
-            # 填充分类特征
-            feature_vec[FEATURE_NAMES.index(f"企鹅栖息的岛屿_{island}")] = 1.0
-            feature_vec[FEATURE_NAMES.index(f"性别_{sex}")] = 1.0
+            # 按penguin_model的列名组织输入（与后台预热的模型使用同一套编码和特征名）
+            raw_row = pd.DataFrame([{
+                pm.ISLAND_COL: island, pm.SEX_COL: sex,
+                "喙的长度": bill_length, "喙的深度": bill_depth,
+                "翅膀的长度": flipper_length, "身体质量": body_mass,
+            }])
 
             # 预测逻辑
             pred_species = ""
             if submitted:
                 try:
-                    train_model(force_retrain=True)
-
-                    # 加载模型
-                    with open(MODEL_PATH, 'rb') as f:
-                        rfc_model = pickle.load(f)
-                    with open(MAP_PATH, 'rb') as f:
-                        species_map = pickle.load(f)
+                    # 取出后台预热好的模型和物种映射（进程内只加载/训练一次，未就绪则等待）
+                    with st.spinner("模型正在后台预热，请稍候..."):
+                        rfc_model, species_map = model_warmup.wait_for("penguin")
 
                     # 预测
-                    input_df = pd.DataFrame([feature_vec], columns=FEATURE_NAMES, dtype=float)
+                    input_df = pm.to_frame(pm.encode_features(raw_row)[0])
                     pred_idx = rfc_model.predict(input_df)[0]
-                    pred_species = species_map.get(int(pred_idx), "未知物种")
+                    pred_species = species_map.get(pred_idx, "未知物种")
 
                     # 显示结果
                     if pred_species != "未知物种":
@@ -241,8 +125,7 @@ def predict_page():
 
                 except Exception as e:
                     st.error(f"❌ 预测出错：{str(e)}")
-                    st.info("已自动重新训练模型，请再次点击预测")
-                    train_model(force_retrain=True)
+                    st.info(f"建议：删除{pm.MODEL_PATH}和{pm.MAP_PATH}后重新运行，重新训练模型")
 
     # 右侧图片区域（完全适配GitHub图片名）
     with col_logo:
@@ -265,8 +148,14 @@ def predict_page():
             else:
                 st.info("⚠️ 暂无有效预测结果")
 
+    # 预测后展示训练集中最相似的企鹅（KD树近邻检索）
+    if submitted and pred_species and pred_species != "未知物种":
+        similar_penguins_panel([bill_length, bill_depth, flipper_length, body_mass])
+
 # ===================== 主程序 =====================
 def main():
+    # 启动模型后台预热（用serve.py启动时已在服务启动时开始，这里重复调用无副作用）
+    model_warmup.start_warmup(["penguin"])
     st.set_page_config(
         page_title="企鹅分类器（中文数据集版）",
         page_icon="🐧",
@@ -282,13 +171,15 @@ def main():
         st.title('功能导航')
         page = st.selectbox(
             "选择页面", 
-            ["简介页面", "预测分类页面"], 
+            ["简介页面", "预测分类页面", "批量预测页面"], 
             label_visibility='collapsed'
         )
 
     # 页面路由
     if page == "简介页面":
         intro_page()
+    elif page == "批量预测页面":
+        batch_page()
     else:
         predict_page()
 
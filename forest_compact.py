@@ -0,0 +1,202 @@
+# 紧凑森林文件 - 把扁平化的随机森林按紧凑类型写成单个二进制文件，读取时np.frombuffer直接得到数组（不反序列化Python对象）
+# 文件结构：8字节头长度 + JSON头（各数组的类型/形状/偏移与元信息）+ 按8字节对齐的原始数组
+#   特征下标 int16 | 阈值 float32（向下取整，比较结果与sklearn一致） | 左右孩子 int32交错存于同一缓冲区
+#   叶子值 float64，或可选量化为 uint16/uint8（记录缩放系数与偏移）
+# 用法：
+#   python forest_compact.py export rf_insurance_model.pkl rf_insurance_model.rfc [--quantize 16]
+#   python forest_compact.py bench     对比pickle的文件大小、读取耗时与预测误差
+import argparse
+import io
+import json
+import os
+import pickle
+import struct
+import time
+import numpy as np
+import forest_engine
+
+# ===================== 全局配置 =====================
+MAGIC = b"RFC1"   # 文件标识
+ALIGN = 8         # 数组起始偏移按8字节对齐
+QUANT_DTYPES = {8: np.uint8, 16: np.uint16}
+
+# ===================== 编码 =====================
+def _threshold_float32(threshold):
+    """
+    float64阈值转float32并向下取整：样本特征本身是float32，
+    对任意float32的x，x <= t64 与 x <= floor32(t64) 等价，所以决策路径完全不变
+    """
+    t32 = threshold.astype(np.float32)
+    above = t32.astype(np.float64) > threshold
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    return t32
+
+def _quantize(value, bits):
+    """把叶子值线性量化为无符号整数，返回 (整数数组, 缩放系数, 偏移)"""
+    low, high = float(value.min()), float(value.max())
+    levels = (1 << bits) - 1
+    scale = (high - low) / levels if high > low else 1.0
+    q = np.rint((value - low) / scale).astype(QUANT_DTYPES[bits])
+    return q, scale, low
+
+def encode(forest, quantize_bits=None):
+    """
+    把forest_engine.export_forest的结果编码成紧凑文件内容
+    :param quantize_bits: None（叶子值保持float64）或 8/16（量化位数）
+    :return: bytes
+    """
+    n_nodes = len(forest["feature"])
+    if forest["feature"].max() > np.iinfo(np.int16).max:
+        raise ValueError("特征数超过int16范围")
+    children = np.empty(2 * n_nodes, dtype=np.int32)
+    children[0::2] = forest["left"]
+    children[1::2] = forest["right"]
+    arrays = {
+        "feature": forest["feature"].astype(np.int16),
+        "threshold": _threshold_float32(forest["threshold"]),
+        "children": children,
+        "roots": forest["roots"].astype(np.int32),
+    }
+    meta = {
+        "max_depth": forest["max_depth"],
+        "kind": forest["kind"],
+        "classes": np.asarray(forest["classes"]).tolist(),
+        "value_shape": list(forest["value"].shape),
+    }
+    if quantize_bits:
+        arrays["value"], meta["value_scale"], meta["value_offset"] = _quantize(forest["value"], quantize_bits)
+    else:
+        arrays["value"] = forest["value"].astype(np.float64)
+
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        offset = (offset + ALIGN - 1) // ALIGN * ALIGN
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += arr.nbytes
+    header = json.dumps({"meta": meta, "arrays": layout}).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGN)  # 数据区从8字节边界开始
+
+    out = io.BytesIO()
+    out.write(MAGIC + struct.pack("<Q", len(header)) + header)
+    base = out.tell()
+    for name, arr in arrays.items():
+        out.write(b"\0" * (base + layout[name]["offset"] - out.tell()))
+        out.write(np.ascontiguousarray(arr).tobytes())
+    return out.getvalue()
+
+# ===================== 解码 =====================
+def decode(buffer):
+    """从紧凑文件内容还原forest_engine可直接使用的森林（各数组是buffer上的视图，叶子值量化时才复制）"""
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError("不是紧凑森林文件")
+    (header_len,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+    base = len(MAGIC) + 8 + header_len
+    header = json.loads(bytes(buffer[len(MAGIC) + 8:base]))
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                     offset=base + spec["offset"]).reshape(spec["shape"])
+    meta = header["meta"]
+    value = arrays["value"]
+    if "value_scale" in meta:
+        value = value * meta["value_scale"] + meta["value_offset"]
+    return {
+        "feature": arrays["feature"],
+        "threshold": arrays["threshold"],
+        "left": arrays["children"][0::2],
+        "right": arrays["children"][1::2],
+        "value": value.reshape(meta["value_shape"]),
+        "roots": arrays["roots"].astype(np.intp),
+        "max_depth": meta["max_depth"],
+        "kind": meta["kind"],
+        "classes": np.asarray(meta["classes"]),
+    }
+
+def save_compact(forest, path, quantize_bits=None):
+    """原子写入紧凑森林文件"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode(forest, quantize_bits))
+    os.replace(tmp_path, path)
+
+def load_compact(path):
+    """读取紧凑森林文件（一次read，之后全部是np.frombuffer视图）"""
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+# ===================== 对比测试 =====================
+def _median_seconds(fn, repeat=20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def run_benchmark():
+    """对比pickle与紧凑文件（不量化/16位/8位）的大小、读取耗时与预测误差"""
+    import tempfile
+    workdir = tempfile.mkdtemp(prefix="forest_compact_")
+    for name, model, X in forest_engine.bench_models():
+        pkl_path = os.path.join(workdir, "model.pkl")
+        with open(pkl_path, "wb") as f:
+            pickle.dump(model, f)
+        forest = forest_engine.export_forest(model)
+        if forest["kind"] == "classifier":
+            reference = model.predict_proba(X)
+            score = lambda f: forest_engine.predict_proba(f, X)
+        else:
+            reference = model.predict(X)
+            score = lambda f: forest_engine.predict(f, X)
+
+        def load_pickle():
+            with open(pkl_path, "rb") as f:
+                return pickle.load(f)
+
+        pkl_size = os.path.getsize(pkl_path)
+        pkl_seconds = _median_seconds(load_pickle)
+        print(f"== {name}（{len(forest['roots'])}棵树，{len(forest['feature']):,}个节点）")
+        print(f"   pickle：{pkl_size / 1024:,.0f} KB，读取 {pkl_seconds * 1e3:.2f} ms")
+        for bits in (None, 16, 8):
+            path = os.path.join(workdir, f"model_{bits}.rfc")
+            save_compact(forest, path, bits)
+            size = os.path.getsize(path)
+            seconds = _median_seconds(lambda: load_compact(path))
+            pred = score(load_compact(path))
+            max_err = float(np.max(np.abs(pred - reference)))
+            label = "不量化" if bits is None else f"叶子值{bits}位量化"
+            extra = ""
+            if forest["kind"] == "classifier":
+                agree = np.mean(pred.argmax(axis=1) == reference.argmax(axis=1))
+                extra = f"，类别一致率 {agree:.2%}"
+            print(f"   紧凑（{label}）：{size / 1024:,.0f} KB（{size / pkl_size:.0%}），"
+                  f"读取 {seconds * 1e3:.2f} ms（{pkl_seconds / seconds:.1f}x），"
+                  f"预测最大误差 {max_err:.3g}{extra}")
+    for name in os.listdir(workdir):
+        os.remove(os.path.join(workdir, name))
+    os.rmdir(workdir)
+
+# ===================== 命令行入口 =====================
+def main():
+    parser = argparse.ArgumentParser(description="紧凑森林文件")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="把pickle模型导出为紧凑文件")
+    p_export.add_argument("model_path")
+    p_export.add_argument("out_path")
+    p_export.add_argument("--quantize", type=int, choices=sorted(QUANT_DTYPES), default=None,
+                          help="叶子值量化位数（默认不量化）")
+    sub.add_parser("bench", help="与pickle对比大小、读取耗时、预测误差")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        with open(args.model_path, "rb") as f:
+            model = pickle.load(f)
+        save_compact(forest_engine.export_forest(model), args.out_path, args.quantize)
+        print(f"✅ 已导出：{args.out_path}（{os.path.getsize(args.out_path) / 1024:,.0f} KB）")
+    else:
+        run_benchmark()
+
+if __name__ == "__main__":
+    main()
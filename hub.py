@@ -0,0 +1,78 @@
+# 多应用宿主 - 用st.navigation在同一个Streamlit进程内提供企鹅/医疗费用/成绩/销售四个应用
+# 用法：streamlit run hub.py   （或 python serve.py hub.py，启动时即后台预热模型）
+# 各页面的重依赖（sklearn、plotly、scipy等）在首次打开该页面时才导入；
+# 模型由model_warmup在进程内只加载一次，数据集用st.cache_resource在所有会话间共享
+import streamlit as st
+
+# ===================== 页面函数（函数体内再导入对应应用模块） =====================
+def penguin_intro():
+    import ff3
+    ff3.intro_page()
+
+def penguin_predict():
+    import ff3
+    ff3.predict_page()
+
+def penguin_batch():
+    from penguin_batch import batch_page
+    batch_page()
+
+def insurance_intro():
+    import third
+    third.introduce_page()
+
+def insurance_predict():
+    import third
+    third.predict_page()
+
+def insurance_explorer():
+    from insurance_explorer import explorer_page
+    explorer_page()
+
+def insurance_batch():
+    from insurance_batch import batch_page
+    batch_page()
+
+def sales_dashboard():
+    # 指标与图表来自预聚合立方体，筛选只是切片求和
+    from sales_cube import cube_page
+    cube_page()
+
+def sales_periods():
+    from sales_store import period_page
+    period_page()
+
+def sales_live():
+    # 只有指标与图表所在的片段定时刷新
+    from sales_live import live_page
+    live_page()
+
+# ===================== 导航 =====================
+PAGES = {
+    "企鹅分类": [
+        st.Page(penguin_intro, title="简介", icon="🐧", url_path="penguin", default=True),
+        st.Page(penguin_predict, title="预测分类", icon="🔮", url_path="penguin_predict"),
+        st.Page(penguin_batch, title="批量预测", icon="📦", url_path="penguin_batch"),
+    ],
+    "医疗费用": [
+        st.Page(insurance_intro, title="应用简介", icon="🩺", url_path="insurance"),
+        st.Page(insurance_predict, title="预测医疗费用", icon="💰", url_path="insurance_predict"),
+        st.Page(insurance_explorer, title="影响因素探索", icon="📈", url_path="insurance_explorer"),
+        st.Page(insurance_batch, title="批量费用评估", icon="📦", url_path="insurance_batch"),
+    ],
+    "学生成绩": [
+        # app.py为整页脚本，直接作为文件页面运行
+        st.Page("app.py", title="成绩分析与预测", icon="📊", url_path="score"),
+    ],
+    "销售数据": [
+        st.Page(sales_dashboard, title="销售仪表板", icon="🛒", url_path="sales"),
+        st.Page(sales_periods, title="多期销售", icon="📅", url_path="sales_periods"),
+        st.Page(sales_live, title="实时销售", icon="⚡", url_path="sales_live"),
+    ],
+}
+
+def main():
+    st.set_page_config(page_title="预测应用合集", page_icon="🧰", layout="wide")
+    st.navigation(PAGES).run()
+
+main()
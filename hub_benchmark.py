@@ -0,0 +1,65 @@
+# 多应用宿主对比 - 分别冷启动4个独立应用 vs 一个hub.py进程，比较常驻内存与启动耗时
+# 用法：python hub_benchmark.py
+# 每个应用在独立子进程中用streamlit的AppTest跑一遍首屏（导入依赖、读数据、加载模型），
+# 记录子进程的峰值常驻内存(ru_maxrss)与从进程启动到首屏渲染完成的耗时
+import json
+import resource
+import subprocess
+import sys
+import time
+
+# ===================== 全局配置 =====================
+SEPARATE_APPS = ["ff3.py", "third.py", "app.py", "sales_data2.py"]  # 原来各自单独启动的应用
+HUB_SCRIPT = "hub.py"
+HUB_PAGES = ["penguin", "insurance", "score", "sales"]  # hub内依次打开的页面（url_path）
+RENDER_TIMEOUT = 300  # 单个页面渲染的最长秒数
+
+# ===================== 子进程：渲染应用并报告资源占用 =====================
+def run_child(script, pages, started_at):
+    """在当前进程中渲染script（以及hub内的pages），输出JSON结果"""
+    from streamlit.testing.v1 import AppTest
+    from streamlit.util import calc_md5
+    at = AppTest.from_file(script, default_timeout=RENDER_TIMEOUT).run()
+    errors = [e.value for e in at.exception]
+    for url_path in pages[1:]:
+        # AppTest.switch_page只支持文件页面，函数页面按url_path的md5切换
+        at._page_hash = calc_md5(url_path)
+        at.run()
+        errors += [e.value for e in at.exception]
+    result = {
+        "启动耗时(秒)": round(time.time() - started_at, 2),
+        "常驻内存(MB)": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "错误": errors,
+    }
+    print(json.dumps(result, ensure_ascii=False))
+
+def measure(script, pages=()):
+    """启动子进程冷启动一个应用，返回其结果dict"""
+    cmd = [sys.executable, __file__, "--child", script, str(time.time())] + list(pages)
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+# ===================== 汇总 =====================
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[4:], float(sys.argv[3]))
+        return
+
+    rows = []
+    for script in SEPARATE_APPS:
+        rows.append({"应用": script, **measure(script)})
+        print(rows[-1])
+    separate_mem = sum(r["常驻内存(MB)"] for r in rows)
+    separate_time = sum(r["启动耗时(秒)"] for r in rows)
+    hub = measure(HUB_SCRIPT, HUB_PAGES)
+    print({"应用": f"{HUB_SCRIPT}（{'/'.join(HUB_PAGES)}）", **hub})
+
+    print(f"\n独立部署：{len(rows)}个进程，合计常驻内存 {separate_mem:.1f} MB，"
+          f"合计启动耗时 {separate_time:.2f} 秒")
+    print(f"hub.py：1个进程，常驻内存 {hub['常驻内存(MB)']:.1f} MB，"
+          f"打开全部页面耗时 {hub['启动耗时(秒)']:.2f} 秒")
+    print(f"内存节省 {separate_mem - hub['常驻内存(MB)']:.1f} MB"
+          f"（{(1 - hub['常驻内存(MB)'] / separate_mem) * 100:.0f}%）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# 医疗费用批量评估 - 对整批投保人（CSV/Parquet）分块编码、多进程预测，结果逐块写出
+# 用法：
+#   python insurance_batch.py score 投保人.csv 结果.csv --jobs 4       批量评估（输入输出可为.csv/.parquet）
+#   python insurance_batch.py gen 投保人.parquet --rows 10000000      生成模拟投保人数据
+#   python insurance_batch.py bench --rows 1000000 --jobs 1 2 4       各核数下的吞吐量(行/秒)
+#   streamlit run insurance_batch.py                                 上传文件的批量评估页面
+import argparse
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from csv_encoding import detect_encoding
+from insurance_intervals import predict_interval
+
+# ===================== 全局配置 =====================
+CHUNK_SIZE = 100_000   # 每块读取的行数
+MAX_IN_FLIGHT = 2      # 每个工作进程最多排队的块数（限制内存占用）
+NUMERIC_COLS = ["年龄", "BMI", "子女数量"]
+CAT_COLS = ["性别", "是否吸烟", "区域"]
+INPUT_COLS = ["年龄", "性别", "BMI", "子女数量", "是否吸烟", "区域"]
+RESULT_COLS = ["预测医疗费用", "预测下界", "预测上界"]
+
+# ===================== 训练时的特征布局 =====================
+def _feature_layout():
+    """
+    按insurance_model.FEATURE_NAMES（训练时的列顺序）求出每个分类列的取值及独热列起始位置
+    :return: (数值列位置列表, {分类列: (起始位置, 取值列表)})
+    """
+    import insurance_model
+    names = insurance_model.FEATURE_NAMES
+    numeric_pos = [names.index(col) for col in NUMERIC_COLS]
+    cat_layout = {}
+    for col in CAT_COLS:
+        positions = [i for i, name in enumerate(names) if name.startswith(f"{col}_")]
+        cat_layout[col] = (positions[0], [names[i].split("_", 1)[1] for i in positions])
+    return numeric_pos, cat_layout
+
+# ===================== 向量化编码 =====================
+def encode_chunk(chunk, layout):
+    """
+    把一块原始数据编码成模型输入矩阵（分类列用pd.Categorical取编码，再按编码直接置1）
+    :return: (float32矩阵（仅有效行）, 有效行布尔数组, 每行的拒绝原因数组)
+    """
+    numeric_pos, cat_layout = layout
+    n = len(chunk)
+    n_features = len(numeric_pos) + sum(len(values) for _, values in cat_layout.values())
+    X = np.zeros((n, n_features), dtype=np.float32)
+    reasons = np.full(n, "", dtype=object)
+
+    missing = [col for col in INPUT_COLS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"缺少必要列：{missing}")
+    for col, pos in zip(NUMERIC_COLS, numeric_pos):
+        values = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64)
+        bad = np.isnan(values)
+        reasons[bad] += f"{col}缺失或非数值；"
+        X[:, pos] = values
+    rows = np.arange(n)
+    for col, (offset, values) in cat_layout.items():
+        codes = pd.Categorical(chunk[col], categories=values).codes
+        bad = codes < 0
+        reasons[bad] += f"{col}取值非法；"
+        X[rows[~bad], offset + codes[~bad]] = 1.0
+
+    valid = reasons == ""
+    return X[valid], valid, reasons
+
+# ===================== 工作进程 =====================
+_WORKER = {}
+
+def _init_worker(forest):
+    """工作进程初始化：只接收一次扁平化的森林数组"""
+    _WORKER["forest"] = forest
+
+def _score_matrix(X):
+    """在工作进程中预测一块矩阵，返回 (点预测, 下界, 上界)"""
+    return predict_interval(_WORKER["forest"], X)
+
+def load_forest():
+    """insurance_model缓存中的扁平数组（必要时先训练；同一模型版本在进程内只读取、导出一次）"""
+    import insurance_model
+    return insurance_model.ensure_model()["forest"]
+
+# ===================== 分块读取与逐块写出 =====================
+def _is_parquet(path_or_name):
+    return str(path_or_name).lower().endswith(".parquet")
+
+def read_chunks(source, chunk_size=CHUNK_SIZE, parquet=None):
+    """按块读取CSV或Parquet（source可为路径或文件对象），逐块产出DataFrame"""
+    if parquet is None:
+        parquet = _is_parquet(source)
+    if parquet:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+    yield from pd.read_csv(source, encoding=detect_encoding(source), chunksize=chunk_size)
+
+def chunk_writer(target, parquet):
+    """
+    逐块追加写出结果（CSV或Parquet），不在内存中累积全部结果
+    :return: (write(df), close()) 两个函数
+    """
+    state = {"parquet_writer": None, "first": True}
+
+    def write(df):
+        if parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if state["parquet_writer"] is None:
+                state["parquet_writer"] = pq.ParquetWriter(target, table.schema)
+            state["parquet_writer"].write_table(table.cast(state["parquet_writer"].schema))
+        else:
+            df.to_csv(target, index=False, header=state["first"])
+        state["first"] = False
+
+    def close():
+        if state["parquet_writer"] is not None:
+            state["parquet_writer"].close()
+
+    return write, close
+
+def score_stream(chunks, forest, writer, jobs=1, progress=None, max_rejected=1000):
+    """
+    逐块编码→预测→按原顺序写出；jobs>1时预测分发到进程池，排队块数有上限，内存占用与总行数无关
+    :param writer: chunk_writer返回的 (write, close)
+    :return: (被拒绝行样例DataFrame, 统计信息dict)
+    """
+    write, close = writer
+    layout = _feature_layout()
+    rejected_parts, n_rejected_kept = [], 0
+    n_total = n_ok = 0
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                               initargs=(forest,)) if jobs > 1 else None
+    pending = deque()
+
+    def flush_one():
+        nonlocal n_total, n_ok, n_rejected_kept
+        chunk, valid, reasons, scored = pending.popleft()
+        point, low, high = scored.result() if pool else scored
+        result = chunk.loc[valid].copy()
+        for col, values in zip(RESULT_COLS, (point, low, high)):
+            result[col] = values.round(2)
+        write(result)
+        if n_rejected_kept < max_rejected and not valid.all():
+            rejected = chunk.loc[~valid].copy()
+            rejected["拒绝原因"] = reasons[~valid]
+            rejected_parts.append(rejected.head(max_rejected - n_rejected_kept))
+            n_rejected_kept += len(rejected_parts[-1])
+        n_total += len(chunk)
+        n_ok += int(valid.sum())
+        if progress is not None:
+            progress(n_total)
+
+    try:
+        for chunk in chunks:
+            chunk = chunk.reset_index(drop=True)
+            X, valid, reasons = encode_chunk(chunk, layout)
+            scored = pool.submit(_score_matrix, X) if pool else predict_interval(forest, X)
+            pending.append((chunk, valid, reasons, scored))
+            while len(pending) > (MAX_IN_FLIGHT * jobs if pool else 0):
+                flush_one()
+        while pending:
+            flush_one()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        close()
+
+    elapsed = time.perf_counter() - start
+    rejected_df = pd.concat(rejected_parts) if rejected_parts else pd.DataFrame()
+    stats = {
+        "进程数": jobs,
+        "总行数": n_total,
+        "成功行数": n_ok,
+        "拒绝行数": n_total - n_ok,
+        "耗时(秒)": round(elapsed, 3),
+        "吞吐量(行/秒)": int(n_total / elapsed) if elapsed > 0 else 0,
+    }
+    return rejected_df, stats
+
+def score_file(in_path, out_path, jobs=1, chunk_size=CHUNK_SIZE, forest=None):
+    """命令行批量评估：输入/输出按扩展名识别CSV或Parquet"""
+    forest = forest if forest is not None else load_forest()
+    parquet_out = _is_parquet(out_path)
+    with open(out_path, "wb" if parquet_out else "w", **({} if parquet_out else
+              {"encoding": "utf-8-sig", "newline": ""})) as f:
+        return score_stream(read_chunks(in_path, chunk_size), forest, chunk_writer(f, parquet_out), jobs,
+                            progress=lambda n: print(f"\r已处理 {n:,} 行", end="", flush=True))
+
+# ===================== 模拟数据与吞吐量测试 =====================
+def generate_policyholders(path, rows, chunk_size=1_000_000, seed=0):
+    """按数据集的取值范围随机生成投保人数据（逐块写出，可生成上千万行）"""
+    import insurance_model
+    rng = np.random.default_rng(seed)
+    parquet = _is_parquet(path)
+    with open(path, "wb" if parquet else "w", **({} if parquet else
+              {"encoding": "utf-8-sig", "newline": ""})) as f:
+        write, close = chunk_writer(f, parquet)
+        for start in range(0, rows, chunk_size):
+            n = min(chunk_size, rows - start)
+            write(pd.DataFrame({
+                "保单号": np.arange(start, start + n),
+                "年龄": rng.integers(18, 65, n),
+                "性别": rng.choice(insurance_model.SEX_VALUES, n),
+                "BMI": rng.normal(30.7, 6.1, n).clip(15, 54).round(2),
+                "子女数量": rng.integers(0, 6, n),
+                "是否吸烟": rng.choice(insurance_model.SMOKER_VALUES, n, p=[0.2, 0.8]),
+                "区域": rng.choice(insurance_model.REGION_VALUES, n),
+            }))
+        close()
+
+def run_benchmark(rows, jobs_list, chunk_size=CHUNK_SIZE):
+    """生成rows行Parquet，分别用不同进程数评估，报告吞吐量"""
+    import tempfile
+    workdir = tempfile.mkdtemp(prefix="insurance_batch_")
+    in_path = os.path.join(workdir, "投保人.parquet")
+    generate_policyholders(in_path, rows)
+    forest = load_forest()
+    print(f"CPU核数：{os.cpu_count()}，数据：{rows:,}行")
+    for jobs in jobs_list:
+        _, stats = score_file(in_path, os.path.join(workdir, f"结果_{jobs}.parquet"),
+                              jobs, chunk_size, forest)
+        print(f"\r进程数 {jobs}：{stats['耗时(秒)']} 秒，{stats['吞吐量(行/秒)']:,} 行/秒")
+    for name in os.listdir(workdir):
+        os.remove(os.path.join(workdir, name))
+    os.rmdir(workdir)
+    import resource
+    peak_mb = max(resource.getrusage(who).ru_maxrss for who in
+                  (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) / 1024
+    print(f"峰值常驻内存（单个进程）：{peak_mb:.0f} MB")
+
+# ===================== 页面功能 =====================
+def batch_page():
+    """批量保费评估页面"""
+    import streamlit as st
+    st.header("投保人批量费用评估")
+    st.markdown(f"""上传投保人名单（CSV或Parquet，至少包含：{"、".join(INPUT_COLS)}），
+    系统分块读取并输出每位投保人的预测医疗费用及90%预测区间：
+    - 注：数值缺失或分类取值非法的行会被拒绝，并单独列出原因""")
+
+    uploaded = st.file_uploader("上传投保人名单", type=["csv", "parquet"])
+    jobs = st.number_input("并行进程数", min_value=1, max_value=os.cpu_count() or 1, value=1)
+    if uploaded is None:
+        return
+
+    with st.spinner("正在加载模型..."):
+        forest = load_forest()
+    parquet_in = _is_parquet(uploaded.name)
+    out = io.BytesIO() if parquet_in else io.StringIO()
+    progress_text = st.empty()
+    try:
+        rejected_df, stats = score_stream(
+            read_chunks(io.BytesIO(uploaded.getvalue()), CHUNK_SIZE, parquet_in), forest,
+            chunk_writer(out, parquet_in), int(jobs),
+            progress=lambda n: progress_text.text(f"已处理 {n:,} 行..."),
+        )
+    except ValueError as e:
+        st.error(f"❌ 文件格式错误：{str(e)}")
+        return
+
+    st.success(f"🎉 完成！共 {stats['总行数']:,} 行，吞吐量 {stats['吞吐量(行/秒)']:,} 行/秒")
+    st.json(stats)
+    if parquet_in:
+        data, file_name, mime = out.getvalue(), "医疗费用批量评估结果.parquet", "application/octet-stream"
+    else:
+        data, file_name, mime = out.getvalue().encode("utf-8-sig"), "医疗费用批量评估结果.csv", "text/csv"
+    st.download_button("下载评估结果", data=data, file_name=file_name, mime=mime, type="primary")
+    if len(rejected_df) > 0:
+        st.warning(f"⚠️ {stats['拒绝行数']:,} 行被拒绝（下方最多列出1000行）")
+        st.dataframe(rejected_df.head(200), use_container_width=True)
+
+# ===================== 命令行入口 =====================
+def main():
+    parser = argparse.ArgumentParser(description="医疗费用批量评估")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_score = sub.add_parser("score", help="批量评估CSV/Parquet文件")
+    p_score.add_argument("in_path")
+    p_score.add_argument("out_path")
+    p_score.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    p_score.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    p_gen = sub.add_parser("gen", help="生成模拟投保人数据")
+    p_gen.add_argument("out_path")
+    p_gen.add_argument("--rows", type=int, default=10_000_000)
+    p_bench = sub.add_parser("bench", help="各进程数下的吞吐量")
+    p_bench.add_argument("--rows", type=int, default=1_000_000)
+    p_bench.add_argument("--jobs", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    if args.command == "score":
+        rejected_df, stats = score_file(args.in_path, args.out_path, args.jobs, args.chunk)
+        print()
+        for key, value in stats.items():
+            print(f"{key}：{value}")
+    elif args.command == "gen":
+        generate_policyholders(args.out_path, args.rows)
+        print(f"✅ 已生成 {args.rows:,} 行：{args.out_path}")
+    else:
+        run_benchmark(args.rows, sorted(set(args.jobs)))
+
+if __name__ == "__main__":
+    # streamlit run insurance_batch.py 时进入页面，python insurance_batch.py ... 时为命令行
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        in_streamlit = get_script_run_ctx() is not None
+    except ImportError:
+        in_streamlit = False
+    if in_streamlit:
+        import streamlit as st
+        st.set_page_config(page_title="医疗费用批量评估", page_icon="🩺", layout="wide")
+        batch_page()
+    else:
+        main()
@@ -0,0 +1,140 @@
+# 医疗费用影响因素探索 - 预先批量计算部分依赖(PD)与个体条件期望(ICE)曲线，页面交互只读内存
+# 每个数值特征 × 每种“是否吸烟 × 区域”组合一次性拼成大矩阵，用扁平森林一次预测完，按模型版本缓存
+# 用法：streamlit run insurance_explorer.py   （或在third.py / hub.py中打开“影响因素探索”页面）
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+import plotly.graph_objects as go
+import forest_engine
+
+# ===================== 全局配置 =====================
+N_BACKGROUND = 200    # 参与计算的背景样本数（ICE曲线条数）
+MAX_GRID_POINTS = 30  # 连续特征的取值网格点数（取1%~99%分位数之间）
+N_ICE_SHOWN = 40      # 图中展示的ICE曲线条数
+RANDOM_STATE = 42
+NUMERIC_FEATURES = ["年龄", "BMI", "子女数量"]
+
+# ===================== 批量计算 =====================
+def feature_grid(values, max_points=MAX_GRID_POINTS):
+    """取值较少的特征用全部取值，否则在1%~99%分位数之间等距取点"""
+    unique = np.unique(values)
+    if len(unique) <= max_points * 2:
+        return unique.astype(np.float64)
+    low, high = np.percentile(values, [1, 99])
+    return np.linspace(low, high, max_points)
+
+def compute_curves(forest, X_background, smoker_values, region_values, feature_names):
+    """
+    计算所有组合的ICE与PD曲线（每个特征只做一次批量预测）
+    :param X_background: 背景样本（DataFrame，列与feature_names一致）
+    :return: {"grid": {特征: 网格}, "ice": {(特征, 吸烟, 区域): (样本数, 网格点数)},
+              "pd": {(特征, 吸烟, 区域): (网格点数,)}, "rows": 预测总行数}
+    """
+    base = X_background[feature_names].to_numpy(dtype=np.float64)
+    n = len(base)
+    smoker_cols = [feature_names.index(f"是否吸烟_{v}") for v in smoker_values]
+    region_cols = [feature_names.index(f"区域_{v}") for v in region_values]
+    combos = [(s, r) for s in range(len(smoker_values)) for r in range(len(region_values))]
+    curves = {"grid": {}, "ice": {}, "pd": {}, "rows": 0}
+
+    for feat in NUMERIC_FEATURES:
+        grid = feature_grid(X_background[feat].to_numpy())
+        g = len(grid)
+        # 堆叠顺序：组合 × 网格点 × 背景样本
+        stacked = np.tile(base, (len(combos) * g, 1))
+        stacked[:, feature_names.index(feat)] = np.tile(np.repeat(grid, n), len(combos))
+        stacked[:, smoker_cols + region_cols] = 0.0
+        combo_rows = np.repeat(np.arange(len(combos)), g * n)
+        combo_smoker = np.array([smoker_cols[s] for s, _ in combos])
+        combo_region = np.array([region_cols[r] for _, r in combos])
+        rows = np.arange(len(stacked))
+        stacked[rows, combo_smoker[combo_rows]] = 1.0
+        stacked[rows, combo_region[combo_rows]] = 1.0
+
+        preds = forest_engine.predict(forest, stacked).reshape(len(combos), g, n)
+        curves["grid"][feat] = grid
+        for c, (s, r) in enumerate(combos):
+            key = (feat, smoker_values[s], region_values[r])
+            ice = np.ascontiguousarray(preds[c].T)  # (样本数, 网格点数)
+            curves["ice"][key] = ice
+            curves["pd"][key] = ice.mean(axis=0)
+        curves["rows"] += len(stacked)
+    return curves
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_curves(version, _forest):
+    """
+    每个模型版本只计算一次，所有会话共用
+    :param version: 模型文件SHA-256（缓存键）
+    :param _forest: 该版本的扁平森林（下划线开头，不参与缓存键计算）
+    """
+    import insurance_model
+    start = time.perf_counter()
+    X, _, _ = insurance_model.load_and_preprocess_data()
+    background = X.sample(min(N_BACKGROUND, len(X)), random_state=RANDOM_STATE)
+    curves = compute_curves(_forest, background, insurance_model.SMOKER_VALUES, insurance_model.REGION_VALUES,
+                            insurance_model.FEATURE_NAMES)
+    curves["version"] = version
+    curves["seconds"] = time.perf_counter() - start
+    return curves
+
+def current_curves():
+    """当前模型版本的曲线（模型由insurance_model的缓存提供）"""
+    import insurance_model
+    cached = insurance_model.get_model()
+    return load_curves(cached["version"], cached["forest"])
+
+# ===================== 页面功能 =====================
+def explorer_page():
+    """影响因素探索页面：选择特征与区域，对比吸烟/不吸烟的费用曲线"""
+    import insurance_model
+    import model_warmup
+    st.markdown("# 医疗费用影响因素探索")
+    st.markdown("查看年龄、BMI、子女数量变化时，吸烟与不吸烟人群的预测费用如何变化（无需反复提交表单）：")
+
+    with st.spinner("正在准备部分依赖曲线（每个模型版本只计算一次）..."):
+        curves = model_warmup.wait_for("insurance_pd")
+        if curves["version"] != insurance_model.get_model()["version"]:
+            curves = current_curves()  # 模型文件已更新
+
+    col1, col2 = st.columns(2)
+    with col1:
+        feat = st.selectbox("数值特征", NUMERIC_FEATURES)
+    with col2:
+        region = st.selectbox("居住区域", insurance_model.REGION_VALUES)
+    show_ice = st.checkbox("显示个体曲线（ICE）", value=True)
+
+    start = time.perf_counter()
+    grid = curves["grid"][feat]
+    fig = go.Figure()
+    colors = {"是": "#d62728", "否": "#1f77b4"}
+    for smoker in insurance_model.SMOKER_VALUES:
+        key = (feat, smoker, region)
+        if show_ice:
+            for curve in curves["ice"][key][:N_ICE_SHOWN]:
+                fig.add_trace(go.Scatter(x=grid, y=curve, mode="lines", opacity=0.15,
+                                         line={"color": colors[smoker], "width": 1},
+                                         hoverinfo="skip", showlegend=False))
+        fig.add_trace(go.Scatter(x=grid, y=curves["pd"][key], mode="lines+markers",
+                                 name=f"吸烟：{smoker}（平均）",
+                                 line={"color": colors[smoker], "width": 3}))
+    fig.update_layout(xaxis_title=feat, yaxis_title="预测医疗费用（元）",
+                      title=f"{region}：{feat}对医疗费用的影响")
+    st.plotly_chart(fig, use_container_width=True)
+
+    pd_table = pd.DataFrame({feat: grid})
+    for smoker in insurance_model.SMOKER_VALUES:
+        pd_table[f"吸烟：{smoker}"] = curves["pd"][(feat, smoker, region)].round(2)
+    with st.expander("查看曲线数据"):
+        st.dataframe(pd_table, use_container_width=True, hide_index=True)
+    st.caption(
+        f"⏱️ 本次交互取曲线并作图 {(time.perf_counter() - start) * 1000:.1f} 毫秒；"
+        f"模型版本 {curves['version'][:8]} 的全部曲线一次性预测 {curves['rows']:,} 行，"
+        f"耗时 {curves['seconds']:.2f} 秒"
+    )
+
+# ===================== 主程序 =====================
+if __name__ == "__main__":
+    st.set_page_config(page_title="医疗费用影响因素探索", page_icon="🩺", layout="wide")
+    explorer_page()
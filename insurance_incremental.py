@@ -0,0 +1,171 @@
+# 医疗费用模型增量更新 - 检测insurance-chinese.csv末尾新增的理赔记录，用warm_start追加新树，超过上限时淘汰最老的树
+# 用法：
+#   python insurance_incremental.py update            检测新增行并增量更新rf_insurance_model.pkl
+#   python insurance_incremental.py update --compare  同时做一次全量重训，对比耗时与误差（不保存全量模型）
+#   python insurance_incremental.py bench --new-rows 100   模拟末尾新增100行，对比增量更新与全量重训
+import argparse
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+import model_registry
+from model_store import ensure_trained, file_lock, load_pickle, save_all
+
+# ===================== 全局配置 =====================
+TREES_PER_UPDATE = 20   # 每次增量更新追加的树数量
+MAX_TREES = 200         # 森林树数量上限，超过时淘汰最老的树
+RECENT_WINDOW = 300     # 新树使用的最近记录数（始终包含全部新增行）
+REGISTRY_NAME = "insurance_updates"  # 登记表中记录更新历史的条目名
+HISTORY_LIMIT = 50      # 登记表保留的更新记录条数
+SEED_BASE = 42          # 增量更新随机种子的基数（与第几次更新一起生成每次的种子）
+
+# ===================== 训练数据指纹（随模型一起保存） =====================
+def data_fingerprint(X, y, n_rows):
+    """前n_rows行特征与标签的SHA-256，用于判断已训练部分是否被改动"""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X.iloc[:n_rows], index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y)[:n_rows]), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def stamp_training_data(model, X, y):
+    """在模型对象上记录训练时的数据行数与指纹（随pickle一起保存）"""
+    model.n_rows_seen_ = len(X)
+    model.data_fingerprint_ = data_fingerprint(X, y, len(X))
+
+def detect_new_rows(model, X, y):
+    """
+    判断数据集相对模型训练时的变化
+    :return: ("无新增" | "新增" | "需要全量重训", 模型已见过的行数)
+    """
+    n_old = getattr(model, "n_rows_seen_", None)
+    if n_old is None or len(X) < n_old:
+        return "需要全量重训", 0
+    if data_fingerprint(X, y, n_old) != model.data_fingerprint_:
+        return "需要全量重训", 0  # 已训练过的记录被修改，不是单纯追加
+    return ("无新增" if len(X) == n_old else "新增"), n_old
+
+# ===================== 增量更新 =====================
+def grow_forest(model, X, y, n_old, n_trees=TREES_PER_UPDATE, max_trees=MAX_TREES, window=RECENT_WINDOW):
+    """
+    warm_start追加n_trees棵树（只在最近的记录上训练），超过max_trees时淘汰最老的树
+    :return: (追加的树数量, 淘汰的树数量)
+    """
+    start = max(0, min(n_old, len(X) - window))
+    # 每次更新换一个随机种子：warm_start按已有树数跳过种子序列，淘汰老树后树数变小，
+    # 沿用同一个random_state会重复使用之前的种子段，新树与被淘汰前的树完全相同
+    model.n_updates_ = getattr(model, "n_updates_", 0) + 1
+    seed = int(np.random.SeedSequence([SEED_BASE, model.n_updates_]).generate_state(1)[0])
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees, random_state=seed)
+    model.fit(X.iloc[start:], np.asarray(y)[start:])
+    retired = max(0, len(model.estimators_) - max_trees)
+    if retired:
+        model.estimators_ = model.estimators_[retired:]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    stamp_training_data(model, X, y)
+    return n_trees, retired
+
+def _record(entry):
+    """把本次更新结果追加到登记表的历史记录"""
+    history = (model_registry.get_entry(REGISTRY_NAME) or {}).get("history", [])
+    history = (history + [entry])[-HISTORY_LIMIT:]
+    model_registry.register(REGISTRY_NAME, last=entry, history=history)
+
+def update_model(compare=False):
+    """
+    检测新增行并更新rf_insurance_model.pkl（持有训练锁，与全量训练互斥）
+    :param compare: 是否同时全量重训一次，对比耗时与误差（全量模型不保存）
+    :return: 本次更新的统计dict
+    """
+    import insurance_model
+    X, y, _ = insurance_model.load_and_preprocess_data()
+    ensure_trained([insurance_model.MODEL_PATH], lambda: [insurance_model.fit_model()])
+    with file_lock(insurance_model.MODEL_PATH):
+        model = load_pickle(insurance_model.MODEL_PATH)
+        status, n_old = detect_new_rows(model, X, y)
+        entry = {"状态": status, "数据行数": len(X)}
+        if status == "无新增":
+            return entry
+        if status == "需要全量重训":
+            start = time.perf_counter()
+            model = insurance_model.fit_model()
+            entry["全量重训耗时(秒)"] = round(time.perf_counter() - start, 3)
+            save_all([model], [insurance_model.MODEL_PATH])
+            _record(entry)
+            return entry
+
+        X_new, y_new = X.iloc[n_old:], np.asarray(y)[n_old:]
+        mae_before = mean_absolute_error(y_new, model.predict(X_new))
+        start = time.perf_counter()
+        added, retired = grow_forest(model, X, y, n_old)
+        entry.update({
+            "新增行数": len(X) - n_old,
+            "追加树数": added,
+            "淘汰树数": retired,
+            "当前树数": len(model.estimators_),
+            "增量更新耗时(秒)": round(time.perf_counter() - start, 3),
+            "新增行MAE(更新前)": round(mae_before, 2),
+            "新增行MAE(更新后)": round(mean_absolute_error(y_new, model.predict(X_new)), 2),
+            "全体MAE(增量)": round(mean_absolute_error(y, model.predict(X)), 2),
+        })
+        if compare:
+            start = time.perf_counter()
+            full = insurance_model.fit_model()
+            entry["全量重训耗时(秒)"] = round(time.perf_counter() - start, 3)
+            entry["新增行MAE(全量)"] = round(mean_absolute_error(y_new, full.predict(X_new)), 2)
+            entry["全体MAE(全量)"] = round(mean_absolute_error(y, full.predict(X)), 2)
+        save_all([model], [insurance_model.MODEL_PATH])
+    _record(entry)
+    return entry
+
+# ===================== 模拟新增数据的对比测试 =====================
+def run_benchmark(new_rows, updates=1):
+    """
+    不改动数据文件：用前(N-new_rows)行训练初始模型，把末尾new_rows行分updates批追加，
+    对比每批增量更新与全量重训的耗时，以及在新增行与全体数据上的MAE
+    """
+    import insurance_model
+    X, y, _ = insurance_model.load_and_preprocess_data()
+    y = np.asarray(y)
+    n_base = len(X) - new_rows
+    model = insurance_model.build_regressor().fit(X.iloc[:n_base], y[:n_base])
+    stamp_training_data(model, X.iloc[:n_base], y[:n_base])
+    print(f"初始模型：{n_base}行，{len(model.estimators_)}棵树")
+    for stop in np.linspace(n_base, len(X), updates + 1).astype(int)[1:]:
+        X_now, y_now = X.iloc[:stop], y[:stop]
+        status, n_old = detect_new_rows(model, X_now, y_now)
+        X_new, y_new = X_now.iloc[n_old:], y_now[n_old:]
+        mae_before = mean_absolute_error(y_new, model.predict(X_new))
+        start = time.perf_counter()
+        grow_forest(model, X_now, y_now, n_old)
+        inc_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        full = insurance_model.build_regressor().fit(X_now, y_now)
+        full_seconds = time.perf_counter() - start
+        print(f"== {status}{len(X_new)}行 → 共{stop}行，当前{len(model.estimators_)}棵树")
+        print(f"   耗时：增量 {inc_seconds:.3f} 秒 | 全量重训 {full_seconds:.3f} 秒"
+              f"（{full_seconds / inc_seconds:.1f}x）")
+        print(f"   新增行MAE：更新前 {mae_before:,.0f} | 增量 {mean_absolute_error(y_new, model.predict(X_new)):,.0f}"
+              f" | 全量 {mean_absolute_error(y_new, full.predict(X_new)):,.0f}")
+        print(f"   全体MAE：增量 {mean_absolute_error(y_now, model.predict(X_now)):,.0f}"
+              f" | 全量 {mean_absolute_error(y_now, full.predict(X_now)):,.0f}")
+
+# ===================== 命令行入口 =====================
+def main():
+    parser = argparse.ArgumentParser(description="医疗费用模型增量更新")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_update = sub.add_parser("update", help="检测新增行并增量更新模型文件")
+    p_update.add_argument("--compare", action="store_true", help="同时全量重训一次做对比")
+    p_bench = sub.add_parser("bench", help="模拟末尾新增数据，对比增量与全量")
+    p_bench.add_argument("--new-rows", type=int, default=100)
+    p_bench.add_argument("--updates", type=int, default=1, help="新增行分几批追加")
+    args = parser.parse_args()
+
+    if args.command == "update":
+        for key, value in update_model(args.compare).items():
+            print(f"{key}：{value}")
+    else:
+        run_benchmark(args.new_rows, args.updates)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# 医疗费用模型公共模块 - 数据读取/预处理、模型训练、进程内模型缓存
+# 缓存放在可导入的独立模块中：streamlit run third.py 时页面模块是__main__，缓存若定义在页面里，
+# 后台预热（model_warmup）导入third得到的是另一份缓存，预热不到页面上
+# 用法：
+#   import insurance_model
+#   cached = insurance_model.get_model()      {"model", "forest", "version", ...}
+import os
+import time
+from collections import deque
+import pandas as pd
+import streamlit as st
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder
+import forest_engine
+from csv_encoding import detect_encoding
+from model_store import ensure_trained, file_signature, load_versioned
+
+# ===================== 全局配置（适配中文列名/分类值） =====================
+DATA_PATH = "insurance-chinese.csv"  # 与上传文件一致
+MODEL_PATH = "rf_insurance_model.pkl"  # 模型保存路径
+PREDICT_TIMING_WINDOW = 200  # 保留最近多少次推理耗时用于统计
+# 实际数据集分类特征的中文唯一值（适配CSV实际内容）
+SEX_VALUES = ["女性", "男性"]  # 性别列实际值
+SMOKER_VALUES = ["是", "否"]    # 是否吸烟列实际值
+REGION_VALUES = ["东南部", "东北部", "西北部", "西南部"]  # 区域列实际值
+# 最终模型输入特征列名（中文编码后，与预处理严格对齐）
+FEATURE_NAMES = [
+    "年龄", "BMI", "子女数量",
+    "性别_女性", "性别_男性",
+    "是否吸烟_否", "是否吸烟_是",
+    "区域_东南部", "区域_东北部", "区域_西北部", "区域_西南部"
+]
+
+# ===================== 数据预处理与模型训练（全中文适配） =====================
+def load_and_preprocess_data():
+    """加载并预处理中文列名的insurance-chinese.csv数据"""
+    # 1. 检查文件是否存在
+    if not os.path.exists(DATA_PATH):
+        st.error(f"❌ 未找到数据集文件：{DATA_PATH}")
+        st.error("请确认文件是否放在代码同一目录下，且文件名正确！")
+        st.stop()
+    
+    # 2. 检测编码并读取CSV（解决UnicodeDecodeError）
+    try:
+        # 先尝试GBK（中文Windows默认编码）
+        df = pd.read_csv(DATA_PATH, encoding='gbk')
+    except UnicodeDecodeError:
+        try:
+            # 尝试UTF-8-SIG（带BOM的UTF-8）
+            df = pd.read_csv(DATA_PATH, encoding='utf-8-sig')
+        except UnicodeDecodeError:
+            # 自动检测编码
+            enc = detect_encoding(DATA_PATH)
+            st.warning(f"⚠️ 自动检测到文件编码：{enc}，尝试用该编码读取")
+            df = pd.read_csv(DATA_PATH, encoding=enc)
+    
+    # 3. 检查必要列是否存在（中文列名）
+    required_cols = ["年龄", "性别", "BMI", "子女数量", "是否吸烟", "区域", "医疗费用"]
+    missing_cols = [col for col in required_cols if col not in df.columns]
+    if missing_cols:
+        st.error(f"❌ 数据集缺少必要列：{missing_cols}")
+        st.error(f"当前数据集列名：{list(df.columns)}")
+        st.stop()
+    
+    # 4. 数据清洗：处理可能的缺失值
+    df = df.dropna(subset=required_cols)
+    if len(df) == 0:
+        st.error("❌ 数据集清洗后无有效数据（可能全是缺失值）")
+        st.stop()
+    
+    # 5. 分离特征（X）和标签（y）（中文列名）
+    X = df[["年龄", "性别", "BMI", "子女数量", "是否吸烟", "区域"]]
+    y = df["医疗费用"]
+    
+    # 6. 对分类特征进行独热编码（中文分类值）
+    cat_features = ["性别", "是否吸烟", "区域"]  # 中文分类特征列名
+    cat_encoder = OneHotEncoder(sparse_output=False, drop=None)
+    encoded_cat_data = cat_encoder.fit_transform(X[cat_features])
+    
+    # 7. 构造编码后的中文特征名（与FEATURE_NAMES对齐）
+    encoded_feature_names = []
+    for i, feat in enumerate(cat_features):
+        for cat in cat_encoder.categories_[i]:
+            encoded_feature_names.append(f"{feat}_{cat}")
+    
+    # 8. 合并数值特征与编码后的分类特征
+    numeric_features = X[["年龄", "BMI", "子女数量"]].reset_index(drop=True)
+    encoded_features_df = pd.DataFrame(encoded_cat_data, columns=encoded_feature_names)
+    X_processed = pd.concat([numeric_features, encoded_features_df], axis=1)
+    
+    # 9. 确保特征列顺序与预设FEATURE_NAMES完全一致
+    # 补充缺失的特征列（防止编码后列名不匹配）
+    for col in FEATURE_NAMES:
+        if col not in X_processed.columns:
+            X_processed[col] = 0
+    X_processed = X_processed[FEATURE_NAMES]
+    
+    return X_processed, y, cat_encoder
+
+def build_regressor():
+    """随机森林回归模型（参数适配医疗费用预测场景）"""
+    return RandomForestRegressor(
+        n_estimators=120,  # 树数量优化
+        max_depth=10,      # 限制树深度避免过拟合
+        random_state=42
+    )
+
+def fit_model():
+    """训练随机森林回归模型并返回（不含页面提示，后台预热线程也可调用）"""
+    # 加载预处理后的数据
+    X_processed, y, _ = load_and_preprocess_data()
+    
+    # 划分训练集与测试集（8:2分割）
+    X_train, _, y_train, _ = train_test_split(
+        X_processed, y, test_size=0.2, random_state=42
+    )
+    
+    # 训练随机森林回归模型
+    rf_model = build_regressor()
+    rf_model.fit(X_train, y_train)
+    # 记录训练时的数据行数与指纹，之后可只对新增行做增量更新
+    from insurance_incremental import stamp_training_data
+    stamp_training_data(rf_model, X_processed, y)
+    
+    return rf_model
+
+# ===================== 模型缓存（进程内所有会话共用，模型文件变化后自动重新加载） =====================
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_cached_model(signature):
+    """
+    读取模型文件，每个模型文件版本在进程内只读取一次（在替换锁内读一次文件，同时得到模型与内容哈希）
+    :param signature: 模型文件的 (mtime_ns, 大小)（只用于缓存键，重新训练后自动失效）
+    :return: {"model": 模型, "forest": 扁平数组, "version": 文件SHA-256, "load_seconds": 读取耗时, "predict_seconds": 最近推理耗时}
+    """
+    start = time.perf_counter()
+    model, version = load_versioned(MODEL_PATH)
+    return {
+        "model": model,
+        "forest": forest_engine.export_forest(model),  # 用于一次性取出所有树的预测值
+        "version": version,
+        "load_seconds": time.perf_counter() - start,
+        "predict_seconds": deque(maxlen=PREDICT_TIMING_WINDOW),
+    }
+
+def ensure_model():
+    """模型文件不存在时训练一次（多会话/多进程并发时只训练一次），返回缓存的模型"""
+    ensure_trained([MODEL_PATH], lambda: [fit_model()])
+    return get_model()
+
+def get_model():
+    """返回当前模型文件版本对应的缓存模型（每次调用只需一次os.stat）"""
+    return load_cached_model(file_signature(MODEL_PATH))
@@ -0,0 +1,46 @@
+# 模型登记表 - 记录各预测应用的最优超参数、交叉验证得分与搜索耗时（JSON文件）
+import json
+import os
+import time
+
+# ===================== 全局配置 =====================
+REGISTRY_PATH = "model_registry.json"  # 登记表路径（与代码同目录）
+
+# ===================== 读写登记表 =====================
+def load_registry(path=REGISTRY_PATH):
+    """读取整个登记表；文件不存在或损坏时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def get_entry(name, path=REGISTRY_PATH):
+    """读取某个模型的登记记录（没有则返回None）"""
+    return load_registry(path).get(name)
+
+def get_params(name, default, path=REGISTRY_PATH):
+    """读取某个模型登记的最优超参数；没有登记时返回默认参数"""
+    entry = get_entry(name, path)
+    if not entry or "params" not in entry:
+        return dict(default)
+    params = dict(default)
+    params.update(entry["params"])
+    return params
+
+def register(name, path=REGISTRY_PATH, **fields):
+    """
+    写入（覆盖）某个模型的登记记录
+    先写临时文件再rename，避免其他进程读到写了一半的JSON
+    """
+    registry = load_registry(path)
+    entry = dict(fields)
+    entry["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    registry[name] = entry
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return entry
@@ -0,0 +1,153 @@
+# 模型文件存储 - 原子写入（临时文件+rename）、跨进程文件锁、并发请求只训练一次
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl  # Linux/macOS
+except ImportError:
+    fcntl = None
+    import msvcrt  # Windows
+
+# ===================== 全局配置 =====================
+LOCK_SUFFIX = ".lock"        # 训练锁：整个训练期间持有，保证并发请求只训练一次
+SWAP_LOCK_SUFFIX = ".swap.lock"  # 替换锁：只在rename整组文件时持有，读者加共享锁
+LOCK_POLL_SECONDS = 0.05  # Windows下重试加锁的间隔
+
+# ===================== 原子读写 =====================
+def save_atomic(obj, path):
+    """先写同目录的临时文件并fsync，再os.replace覆盖，读者只会看到旧文件或完整的新文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def load_pickle(path):
+    """读取pickle文件（写入是原子的，读时无需加锁）"""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+# ===================== 模型文件版本（内容哈希） =====================
+_hash_memo = {}  # {绝对路径: ((mtime_ns, size), sha256)}
+_hash_memo_guard = threading.Lock()
+
+def file_signature(path):
+    """文件的 (mtime_ns, 大小)，只需一次os.stat"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def artifact_hash(path):
+    """
+    模型文件内容的SHA-256，用作缓存键；文件未变化（mtime/大小相同）时直接返回上次结果，
+    每次调用只需一次os.stat
+    """
+    key = os.path.abspath(path)
+    signature = file_signature(key)
+    with _hash_memo_guard:
+        memo = _hash_memo.get(key)
+    if memo and memo[0] == signature:
+        return memo[1]
+    digest = hashlib.sha256()
+    with open(key, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    with _hash_memo_guard:
+        _hash_memo[key] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+# ===================== 文件锁（进程间）+ 线程锁（进程内） =====================
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+def _thread_lock(path):
+    """同一路径在进程内共用一把线程锁"""
+    key = os.path.abspath(path)
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(key, threading.Lock())
+
+@contextmanager
+def file_lock(path, shared=False, suffix=LOCK_SUFFIX):
+    """
+    对 path+suffix 加锁，阻塞直到拿到锁（同进程的其他线程与其他进程都会排队）
+    :param shared: 共享锁（多个读者可同时持有）；Windows不支持共享锁时退化为排他锁
+    """
+    lock_path = path + suffix
+    thread_lock = _thread_lock(lock_path) if not shared else threading.Lock()
+    with thread_lock:
+        with open(lock_path, "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(LOCK_POLL_SECONDS)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def save_all(objs, paths):
+    """在替换锁内依次原子替换整组文件（主模型文件paths[0]最后写入）"""
+    with file_lock(paths[0], suffix=SWAP_LOCK_SUFFIX):
+        for path, obj in reversed(list(zip(paths, objs))):
+            save_atomic(obj, path)
+
+def load_all(paths):
+    """在共享替换锁内读取整组文件，不会读到“新模型+旧映射”的混合版本"""
+    with file_lock(paths[0], shared=True, suffix=SWAP_LOCK_SUFFIX):
+        return [load_pickle(path) for path in paths]
+
+def load_versioned(path):
+    """
+    在共享替换锁内只读一次文件，同时得到对象与内容的SHA-256（并记入artifact_hash的缓存）
+    :return: (对象, sha256)
+    """
+    key = os.path.abspath(path)
+    with file_lock(path, shared=True, suffix=SWAP_LOCK_SUFFIX):
+        with open(key, "rb") as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    with _hash_memo_guard:
+        _hash_memo[key] = ((stat.st_mtime_ns, stat.st_size), digest)
+    return pickle.loads(data), digest
+
+# ===================== 单飞训练（single-flight） =====================
+def ensure_trained(paths, train_fn, force=False):
+    """
+    保证模型文件存在；并发请求只会触发一次训练
+    :param paths: 模型相关文件路径列表，paths[0]为主模型文件（最后写入）
+    :param train_fn: 训练函数，返回与paths一一对应的对象列表
+    :param force: 是否要求重新训练；若等锁期间别的请求已完成了一次训练，则直接复用
+    :return: True表示本次调用执行了训练，False表示复用了已有/他人刚训练好的模型
+    """
+    requested_at = time.time_ns()
+    with file_lock(paths[0]):
+        if all(os.path.exists(p) for p in paths):
+            # 不强制重训，或在本请求发起之后已有人训练完成 → 复用
+            if not force or os.stat(paths[0]).st_mtime_ns >= requested_at:
+                return False
+        # 训练期间只持有训练锁，读者仍可读取旧模型；主模型文件最后写入，
+        # 它的mtime新于请求时间即代表整组文件都已更新
+        save_all(train_fn(), paths)
+        return True
@@ -0,0 +1,125 @@
+# model_store压力测试 - 多进程×多线程模拟大量会话同时点击“预测”（强制重训+读取模型）
+# 用法：
+#   python model_store_stress.py                      默认 4进程×8会话，每会话点击5次
+#   python model_store_stress.py --legacy             对照：旧写法（先os.remove再pickle.dump）
+#   python model_store_stress.py --procs 8 --sessions 16 --clicks 10
+import argparse
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import model_store
+
+# ===================== 全局配置 =====================
+TRAIN_SECONDS = 0.3    # 模拟一次训练的耗时
+PAYLOAD_SIZE = 500_000  # 模拟模型大小（float64个数，约4MB，放大“写了一半”的窗口）
+
+# ===================== 模拟训练与两种保存方式 =====================
+def _fake_train(workdir):
+    """模拟训练：记录一次训练，返回 [模型, 物种映射]（两者带相同的代号用于一致性校验）"""
+    time.sleep(TRAIN_SECONDS)
+    generation = time.time_ns()
+    with open(os.path.join(workdir, "train_log.txt"), "a") as f:
+        f.write(f"{generation}\n")
+    model = {"generation": generation, "weights": np.random.rand(PAYLOAD_SIZE)}
+    species_map = {"generation": generation, 0: "阿德利企鹅", 1: "巴布亚企鹅", 2: "帽带企鹅"}
+    return [model, species_map]
+
+def _click_store(model_path, map_path, workdir):
+    """新写法：单飞训练 + 原子替换"""
+    model_store.ensure_trained([model_path, map_path], lambda: _fake_train(workdir), force=True)
+
+def _click_legacy(model_path, map_path, workdir):
+    """旧写法（ff1.py原train_model）：先删除旧文件，再直接pickle.dump"""
+    for path in (model_path, map_path):
+        if os.path.exists(path):
+            os.remove(path)
+    model, species_map = _fake_train(workdir)
+    with open(model_path, "wb") as f:
+        pickle.dump(model, f)
+    with open(map_path, "wb") as f:
+        pickle.dump(species_map, f)
+
+# ===================== 单个进程：多个会话线程 =====================
+def _run_process(args):
+    """一个服务进程：sessions个会话线程各点击clicks次，每次点击后读取模型并校验"""
+    workdir, sessions, clicks, legacy = args
+    model_path = os.path.join(workdir, "rfc_model.pkl")
+    map_path = os.path.join(workdir, "output_uniques.pkl")
+    click = _click_legacy if legacy else _click_store
+    stats = {"requests": 0, "errors": 0, "inconsistent": 0}
+    stats_lock = threading.Lock()
+
+    def session():
+        for _ in range(clicks):
+            error = inconsistent = 0
+            try:
+                click(model_path, map_path, workdir)
+                if legacy:
+                    model = model_store.load_pickle(model_path)
+                    species_map = model_store.load_pickle(map_path)
+                else:
+                    model, species_map = model_store.load_all([model_path, map_path])
+                if model["generation"] != species_map["generation"]:
+                    inconsistent = 1
+            except Exception:
+                error = 1  # 文件缺失/读到半个文件 → 原应用会进入“已自动修复模型”重训循环
+            with stats_lock:
+                stats["requests"] += 1
+                stats["errors"] += error
+                stats["inconsistent"] += inconsistent
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return stats
+
+# ===================== 汇总 =====================
+def run_stress(procs, sessions, clicks, legacy=False):
+    """启动多个进程并汇总结果，返回统计dict"""
+    workdir = tempfile.mkdtemp(prefix="model_store_stress_")
+    try:
+        start = time.perf_counter()
+        with multiprocessing.Pool(procs) as pool:
+            results = pool.map(_run_process, [(workdir, sessions, clicks, legacy)] * procs)
+        elapsed = time.perf_counter() - start
+        with open(os.path.join(workdir, "train_log.txt")) as f:
+            trainings = sum(1 for _ in f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "写法": "旧写法(os.remove+pickle.dump)" if legacy else "model_store",
+        "并发会话数": procs * sessions,
+        "请求数": sum(r["requests"] for r in results),
+        "实际训练次数": trainings,
+        "读取失败数": sum(r["errors"] for r in results),
+        "模型/映射不一致数": sum(r["inconsistent"] for r in results),
+        "总耗时(秒)": round(elapsed, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="model_store并发压力测试")
+    parser.add_argument("--procs", type=int, default=4, help="模拟的服务进程数")
+    parser.add_argument("--sessions", type=int, default=8, help="每个进程的并发会话数")
+    parser.add_argument("--clicks", type=int, default=5, help="每个会话点击预测的次数")
+    parser.add_argument("--legacy", action="store_true", help="改用旧写法做对照")
+    args = parser.parse_args()
+
+    stats = run_stress(args.procs, args.sessions, args.clicks, args.legacy)
+    for key, value in stats.items():
+        print(f"{key}：{value}")
+    if args.legacy:
+        return
+    ok = stats["读取失败数"] == 0 and stats["模型/映射不一致数"] == 0 \
+        and stats["实际训练次数"] < stats["请求数"]
+    print("✅ 通过：无读取失败，并发请求合并训练" if ok else "❌ 未通过")
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
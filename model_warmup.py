@@ -0,0 +1,96 @@
+# 模型后台预热 - 服务进程启动时在后台线程加载/训练企鹅、医疗费用、成绩三个模型（以及医疗费用的部分依赖曲线）
+# 请求先等待就绪状态，不会在请求内重复训练
+import threading
+import time
+import joblib
+import penguin_model as pm
+
+# ===================== 全局配置 =====================
+SCORE_MODEL_PATH = "score_prediction_model.pkl"  # 成绩预测模型（app.py使用）
+WAIT_TIMEOUT = 120  # 请求等待模型就绪的最长秒数
+
+# ===================== 各模型的加载方式（有文件就读，没有就训练） =====================
+def _load_penguin():
+    """企鹅分类模型：返回 (model, species_map)"""
+    return pm.ensure_model()
+
+def _load_insurance():
+    """医疗费用回归模型：预热insurance_model的模型缓存（third.py与批量评估等页面共用），返回缓存项"""
+    import insurance_model
+    return insurance_model.ensure_model()
+
+def _load_insurance_pd():
+    """医疗费用部分依赖/ICE曲线：医疗费用模型就绪后按模型版本批量预计算"""
+    wait_for("insurance")
+    import insurance_explorer
+    return insurance_explorer.current_curves()
+
+def _load_score():
+    """期末成绩预测模型"""
+    return joblib.load(SCORE_MODEL_PATH)
+
+LOADERS = {
+    "penguin": _load_penguin,
+    "insurance": _load_insurance,
+    "insurance_pd": _load_insurance_pd,
+    "score": _load_score,
+}
+
+# ===================== 就绪状态（进程内共享） =====================
+_lock = threading.Lock()
+_started = set()  # 已启动预热的模型名
+_states = {
+    name: {"event": threading.Event(), "model": None, "error": None, "seconds": None}
+    for name in LOADERS
+}
+
+def _warm(name):
+    """后台线程：加载一个模型并设置就绪事件"""
+    state = _states[name]
+    start = time.perf_counter()
+    try:
+        state["model"] = LOADERS[name]()
+    except BaseException as e:  # st.stop()抛出的也要记录，不能让线程静默退出
+        state["error"] = f"{type(e).__name__}: {e}"
+    state["seconds"] = round(time.perf_counter() - start, 3)
+    state["event"].set()
+
+def start_warmup(names=None):
+    """
+    启动后台预热（每个模型一个线程，互不等待；同一模型在进程内只启动一次）
+    :param names: 要预热的模型名列表，默认全部
+    """
+    with _lock:
+        pending = [name for name in (names or LOADERS) if name not in _started]
+        _started.update(pending)
+    for name in pending:
+        threading.Thread(target=_warm, args=(name,), name=f"warmup-{name}", daemon=True).start()
+
+def is_ready(name):
+    """模型是否已加载完成（成功或失败都算完成）"""
+    return _states[name]["event"].is_set()
+
+def wait_for(name, timeout=WAIT_TIMEOUT):
+    """
+    等待某个模型就绪并返回它；预热尚未启动时先启动
+    :raises TimeoutError: 超时仍未就绪
+    :raises RuntimeError: 预热过程中加载/训练失败
+    """
+    start_warmup([name])
+    state = _states[name]
+    if not state["event"].wait(timeout):
+        raise TimeoutError(f"模型{name}在{timeout}秒内未就绪")
+    if state["error"]:
+        raise RuntimeError(f"模型{name}预热失败：{state['error']}")
+    return state["model"]
+
+def readiness():
+    """返回各模型的就绪状态，例如 {"penguin": {"状态": "就绪", "耗时(秒)": 1.2}}"""
+    status = {}
+    for name, state in _states.items():
+        if not state["event"].is_set():
+            label = "加载中" if name in _started else "未启动"
+        else:
+            label = "失败" if state["error"] else "就绪"
+        status[name] = {"状态": label, "耗时(秒)": state["seconds"], "错误": state["error"]}
+    return status
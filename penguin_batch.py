@@ -0,0 +1,103 @@
+# 企鹅批量分类页面 - 上传野外调查CSV，分块预测三种企鹅的概率
+import io
+import time
+import streamlit as st
+import pandas as pd
+import numpy as np
+import penguin_model as pm
+from csv_encoding import detect_encoding
+
+# ===================== 全局配置 =====================
+CHUNK_SIZE = 5000  # 每块读取的行数
+
+# ===================== 分块预测 =====================
+def predict_chunk(model, species_map, chunk):
+    """
+    对一块数据做向量化校验+预测
+    :return: (结果DataFrame, 被拒绝行DataFrame)
+    """
+    X, valid, reasons = pm.encode_features(chunk)
+    result = chunk.loc[valid].copy()
+    if len(result) > 0:
+        proba = model.predict_proba(pm.to_frame(X))
+        for j, cls in enumerate(model.classes_):
+            result[f"概率_{species_map[int(cls)]}"] = proba[:, j].round(4)
+        names = np.array([species_map[int(c)] for c in model.classes_])
+        result["预测物种"] = names[proba.argmax(axis=1)]
+    rejected = chunk.loc[~valid].copy()
+    rejected["拒绝原因"] = reasons[~valid]
+    return result, rejected
+
+def stream_predict(model, species_map, file_obj, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    分块读取CSV并预测，结果逐块写入CSV缓冲区
+    :return: (结果CSV字节, 被拒绝行DataFrame, 统计信息dict)
+    """
+    encoding = detect_encoding(file_obj)
+    out = io.StringIO()
+    rejected_parts = []
+    n_total = n_ok = 0
+    start = time.perf_counter()
+    reader = pd.read_csv(file_obj, encoding=encoding, chunksize=chunk_size)
+    for i, chunk in enumerate(reader):
+        result, rejected = predict_chunk(model, species_map, chunk)
+        result.to_csv(out, index=False, header=(i == 0))
+        if len(rejected) > 0:
+            rejected_parts.append(rejected)
+        n_total += len(chunk)
+        n_ok += len(result)
+        if progress is not None:
+            progress(n_total)
+    elapsed = time.perf_counter() - start
+    rejected_df = pd.concat(rejected_parts) if rejected_parts else pd.DataFrame()
+    stats = {
+        "总行数": n_total,
+        "成功行数": n_ok,
+        "拒绝行数": n_total - n_ok,
+        "耗时(秒)": round(elapsed, 3),
+        "吞吐量(行/秒)": int(n_total / elapsed) if elapsed > 0 else 0,
+    }
+    return out.getvalue().encode("utf-8-sig"), rejected_df, stats
+
+# ===================== 页面功能 =====================
+def batch_page():
+    """批量预测页面"""
+    st.header("企鹅物种批量预测")
+    st.markdown(f"""上传与penguins-chinese.csv同结构的调查表（至少包含：{"、".join(pm.INPUT_COLS)}），
+    系统分块读取并输出每条记录属于三种企鹅的概率：
+    - 注：岛屿/性别取值非法或数值缺失的行会被拒绝，并单独列出原因""")
+
+    uploaded = st.file_uploader("上传调查CSV", type=["csv"])
+    chunk_size = st.number_input("每块行数", min_value=500, max_value=100000, value=CHUNK_SIZE, step=500)
+    if uploaded is None:
+        return
+
+    rfc_model, species_map = pm.load_model()
+    if rfc_model is None:
+        with st.spinner("首次使用，正在训练模型...（约5秒）"):
+            rfc_model, species_map = pm.train_and_save()
+
+    progress_text = st.empty()
+    try:
+        csv_bytes, rejected_df, stats = stream_predict(
+            rfc_model, species_map, io.BytesIO(uploaded.getvalue()), int(chunk_size),
+            progress=lambda n: progress_text.text(f"已处理 {n:,} 行..."),
+        )
+    except ValueError as e:
+        st.error(f"❌ 文件格式错误：{str(e)}")
+        return
+
+    st.success(f"🎉 完成！共 {stats['总行数']:,} 行，吞吐量 {stats['吞吐量(行/秒)']:,} 行/秒")
+    st.json(stats)
+    st.download_button(
+        "下载预测结果CSV", data=csv_bytes,
+        file_name="企鹅批量预测结果.csv", mime="text/csv", type="primary",
+    )
+    if len(rejected_df) > 0:
+        st.warning(f"⚠️ {len(rejected_df):,} 行被拒绝")
+        st.dataframe(rejected_df.head(200), use_container_width=True)
+
+# ===================== 主程序 =====================
+if __name__ == "__main__":
+    st.set_page_config(page_title="企鹅批量分类", page_icon="🐧", layout="wide")
+    batch_page()
@@ -0,0 +1,123 @@
+# 企鹅分类模型公共模块 - 数据读取/向量化特征编码/模型读写（不依赖Streamlit界面）
+import os
+import pandas as pd
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+import model_registry
+import model_store
+from csv_encoding import detect_encoding
+
+# ===================== 全局配置 =====================
+DATA_PATH = "penguins-chinese.csv"  # 中文数据集路径
+# 模型保存路径：与ff1.py/ff2.py的rfc_model.pkl分开（它们不做岛屿写法映射，特征编码不同）
+MODEL_PATH = "penguin_rfc_model.pkl"
+MAP_PATH = "penguin_output_uniques.pkl"  # 物种映射文件路径
+LABEL_COL = "企鹅的种类"             # 标签列
+ISLAND_COL = "企鹅栖息的岛屿"         # 岛屿列
+SEX_COL = "性别"                     # 性别列
+NUMERIC_COLS = ["喙的长度", "喙的深度", "翅膀的长度", "身体质量"]
+INPUT_COLS = [ISLAND_COL, SEX_COL] + NUMERIC_COLS
+# 分类特征取值（与预测表单选项一致）
+ISLAND_OPTIONS = ["托托尔森岛", "比斯科岛", "德里姆岛"]
+SEX_OPTIONS = ["雌性", "雄性"]
+# 数据集中的岛屿写法 → 表单写法（CSV里是“托尔森岛/比斯科群岛”）
+ISLAND_ALIASES = {"托尔森岛": "托托尔森岛", "比斯科群岛": "比斯科岛"}
+# 默认超参数（penguin_tuning.py搜索后会写入model_registry.json覆盖）
+DEFAULT_PARAMS = {"n_estimators": 100, "random_state": 42}
+# 模型输入特征列名（顺序：数值特征 + 岛屿独热 + 性别独热）
+FEATURE_NAMES = (
+    NUMERIC_COLS
+    + [f"{ISLAND_COL}_{v}" for v in ISLAND_OPTIONS]
+    + [f"{SEX_COL}_{v}" for v in SEX_OPTIONS]
+)
+
+# ===================== 数据读取 =====================
+def read_dataset(path=DATA_PATH):
+    """读取企鹅数据集（先试GBK，失败再自动检测编码）"""
+    try:
+        return pd.read_csv(path, encoding='gbk')
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding=detect_encoding(path))
+
+# ===================== 向量化特征编码 =====================
+def encode_features(df):
+    """
+    将原始列（岛屿/性别/四项数值）整体编码为模型输入矩阵
+    :return: (X, valid, reasons) X为float64矩阵（只含合法行），valid为布尔掩码，
+             reasons为每行的拒绝原因（合法行为空字符串）
+    """
+    missing_cols = [col for col in INPUT_COLS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"缺少必要列：{missing_cols}")
+
+    island = df[ISLAND_COL].astype("string").str.strip().replace(ISLAND_ALIASES)
+    sex = df[SEX_COL].astype("string").str.strip()
+    numeric = df[NUMERIC_COLS].apply(pd.to_numeric, errors="coerce")
+
+    # 分类值查表得到编码（非法值编码为-1）
+    island_codes = pd.Categorical(island, categories=ISLAND_OPTIONS).codes
+    sex_codes = pd.Categorical(sex, categories=SEX_OPTIONS).codes
+    bad_island = island_codes < 0
+    bad_sex = sex_codes < 0
+    bad_numeric = numeric.isna().any(axis=1).to_numpy()
+    valid = ~(bad_island | bad_sex | bad_numeric)
+
+    # 拒绝原因（按列拼接，全程无逐行循环）
+    reasons = np.full(len(df), "", dtype=object)
+    reasons[bad_island] = "岛屿取值非法;"
+    reasons[bad_sex] = reasons[bad_sex] + "性别取值非法;"
+    reasons[bad_numeric] = reasons[bad_numeric] + "数值缺失或非数字;"
+
+    n_valid = int(valid.sum())
+    X = np.zeros((n_valid, len(FEATURE_NAMES)), dtype=np.float64)
+    X[:, :len(NUMERIC_COLS)] = numeric.to_numpy(dtype=np.float64)[valid]
+    rows = np.arange(n_valid)
+    X[rows, len(NUMERIC_COLS) + island_codes[valid]] = 1.0
+    X[rows, len(NUMERIC_COLS) + len(ISLAND_OPTIONS) + sex_codes[valid]] = 1.0
+    return X, valid, reasons
+
+def to_frame(X):
+    """包装成带特征名的DataFrame（模型按特征名训练）"""
+    return pd.DataFrame(X, columns=FEATURE_NAMES)
+
+# ===================== 模型训练与读写 =====================
+def load_training_data(path=DATA_PATH):
+    """读取数据集并返回 (X, y_encoded, species_map)"""
+    df = read_dataset(path).dropna(subset=INPUT_COLS + [LABEL_COL])
+    X, valid, _ = encode_features(df)
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(df[LABEL_COL].to_numpy()[valid])
+    species_map = {i: sp for i, sp in enumerate(label_encoder.classes_)}
+    return X, y, species_map
+
+def fit_model(params=None):
+    """训练随机森林，返回 [model, species_map]"""
+    X, y, species_map = load_training_data()
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
+    params = params or model_registry.get_params("penguin", DEFAULT_PARAMS)
+    rfc = RandomForestClassifier(**params)
+    rfc.fit(to_frame(X_train), y_train)
+    return [rfc, species_map]
+
+def train_and_save(params=None):
+    """训练随机森林并保存模型与物种映射，返回 (model, species_map)
+    :param params: 超参数；不传时使用登记表中的最优参数（没有则用默认值）
+    """
+    rfc, species_map = fit_model(params)
+    with model_store.file_lock(MODEL_PATH):
+        model_store.save_all([rfc, species_map], [MODEL_PATH, MAP_PATH])
+    return rfc, species_map
+
+def ensure_model():
+    """模型文件不存在时训练一次（多会话/多进程并发时只训练一次），返回 (model, species_map)"""
+    model_store.ensure_trained([MODEL_PATH, MAP_PATH], fit_model)
+    return load_model()
+
+def load_model():
+    """读取已保存的模型与物种映射；不存在时返回 (None, None)"""
+    if not (os.path.exists(MODEL_PATH) and os.path.exists(MAP_PATH)):
+        return None, None
+    rfc_model, species_map = model_store.load_all([MODEL_PATH, MAP_PATH])
+    return rfc_model, species_map
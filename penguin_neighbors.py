@@ -0,0 +1,58 @@
+# 相似企鹅检索 - 在标准化数值特征上建KD树，预测后展示最近的k条训练观测
+import time
+import streamlit as st
+import numpy as np
+from sklearn.neighbors import KDTree
+from sklearn.preprocessing import StandardScaler
+import penguin_model as pm
+from model_store import artifact_hash
+
+# ===================== 全局配置 =====================
+K_NEIGHBORS = 5  # 默认展示的相似企鹅数量
+DISPLAY_COLS = [pm.LABEL_COL, pm.ISLAND_COL, pm.SEX_COL] + pm.NUMERIC_COLS
+
+# ===================== 索引构建（每个数据集版本只建一次） =====================
+def dataset_version(path=pm.DATA_PATH):
+    """用文件内容的SHA-256作为数据集版本号（文件未变化时只需一次os.stat，与insurance_model的模型版本相同）"""
+    return artifact_hash(path)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def build_index(version, path=pm.DATA_PATH):
+    """
+    读取数据集、标准化四项数值特征并建KD树
+    :param version: 数据集版本号（只用于缓存键，版本变化时自动重建）
+    """
+    df = pm.read_dataset(path).dropna(subset=pm.NUMERIC_COLS).reset_index(drop=True)
+    scaler = StandardScaler()
+    scaled = scaler.fit_transform(df[pm.NUMERIC_COLS].to_numpy(dtype=np.float64))
+    return {"tree": KDTree(scaled), "scaler": scaler, "frame": df[DISPLAY_COLS]}
+
+def nearest_penguins(values, k=K_NEIGHBORS, path=pm.DATA_PATH):
+    """
+    查询与给定数值特征最相似的k条观测
+    :param values: [喙的长度, 喙的深度, 翅膀的长度, 身体质量]
+    :return: (带“距离”列的DataFrame, 查询耗时秒)
+    """
+    index = build_index(dataset_version(path), path)
+    start = time.perf_counter()
+    # 直接用均值/标准差换算，避开transform的输入校验开销
+    scaler = index["scaler"]
+    query = (np.asarray([values], dtype=np.float64) - scaler.mean_) / scaler.scale_
+    dist, ind = index["tree"].query(query, k=k)
+    elapsed = time.perf_counter() - start
+    result = index["frame"].iloc[ind[0]].copy()
+    result.insert(0, "距离", dist[0].round(3))
+    return result.reset_index(drop=True), elapsed
+
+# ===================== 页面组件 =====================
+def similar_penguins_panel(values, k=K_NEIGHBORS):
+    """在预测结果下方展示“相似企鹅”面板"""
+    st.subheader("🔍 相似企鹅")
+    try:
+        neighbors, elapsed = nearest_penguins(values, k)
+    except Exception as e:
+        st.info(f"⚠️ 无法检索相似企鹅：{str(e)}")
+        return
+    st.caption(f"训练集中与输入最接近的{k}只企鹅（标准化数值特征上的欧氏距离，"
+               f"KD树检索耗时 {elapsed * 1e6:.0f} 微秒）")
+    st.dataframe(neighbors, use_container_width=True, hide_index=True)
@@ -0,0 +1,142 @@
+# 企鹅随机森林超参数搜索 - 逐次减半（successive halving）+ 进程池并行
+# 用法：
+#   python penguin_tuning.py                  用全部CPU核搜索并写入model_registry.json
+#   python penguin_tuning.py --compare-cores  分别用1核与N核搜索，报告耗时对比
+import argparse
+import itertools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, train_test_split
+import penguin_model as pm
+import model_registry
+
+# ===================== 全局配置 =====================
+REGISTRY_NAME = "penguin"  # 登记表中的模型名
+# 搜索空间：树数量 × 最大深度 × 每次分裂的候选特征数
+PARAM_GRID = {
+    "n_estimators": [50, 100, 200, 400],
+    "max_depth": [None, 4, 6, 8, 12],
+    "max_features": ["sqrt", "log2", 0.5, None],
+}
+FACTOR = 3       # 每轮保留 1/FACTOR 的候选
+N_SPLITS = 5     # 交叉验证折数
+RANDOM_STATE = 42
+
+# ===================== 进程内缓存（每个工作进程只初始化一次） =====================
+_CACHE = {}
+
+def _init_worker(X, y, folds):
+    """工作进程初始化：缓存预处理后的矩阵与各轮的折划分，候选之间复用"""
+    _CACHE["X"] = X
+    _CACHE["y"] = y
+    _CACHE["folds"] = folds
+
+def _score_candidate(task):
+    """在前n_samples条样本上计算某组参数的交叉验证准确率"""
+    params, n_samples = task
+    X, y = _CACHE["X"][:n_samples], _CACHE["y"][:n_samples]
+    scores = []
+    for train_idx, test_idx in _CACHE["folds"][n_samples]:
+        rfc = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **params)
+        rfc.fit(X[train_idx], y[train_idx])
+        scores.append(rfc.score(X[test_idx], y[test_idx]))
+    return float(np.mean(scores))
+
+# ===================== 逐次减半 =====================
+def candidate_list(grid=PARAM_GRID):
+    """展开参数网格"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def resource_schedule(n_candidates, max_resources, min_resources, factor=FACTOR):
+    """与sklearn HalvingGridSearchCV相同的轮次规划，返回每轮使用的样本数"""
+    n_required = math.ceil(math.log(n_candidates, factor)) + 1
+    n_possible = int(math.log(max_resources / min_resources, factor)) + 1
+    n_rounds = max(1, min(n_required, n_possible))
+    return [min(max_resources, min_resources * factor ** i) for i in range(n_rounds)]
+
+def cached_folds(y, schedule):
+    """提前为每轮的样本规模生成分层折划分（只算一次，所有候选共用）"""
+    splitter = StratifiedKFold(n_splits=N_SPLITS, shuffle=True, random_state=RANDOM_STATE)
+    return {n: list(splitter.split(np.zeros(n), y[:n])) for n in schedule}
+
+def successive_halving(X, y, n_jobs, grid=PARAM_GRID, factor=FACTOR):
+    """
+    逐次减半搜索
+    :return: (最优参数, 最优CV得分, 每轮记录列表)
+    """
+    # 打乱一次样本顺序，各轮取前n条即为分层近似的子样本
+    order = np.random.default_rng(RANDOM_STATE).permutation(len(y))
+    X, y = X[order], y[order]
+    candidates = candidate_list(grid)
+    min_resources = 5 * len(np.unique(y)) * N_SPLITS
+    schedule = resource_schedule(len(candidates), len(y), min_resources, factor)
+    folds = cached_folds(y, schedule)
+
+    history = []
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                             initargs=(X, y, folds)) as pool:
+        for round_idx, n_samples in enumerate(schedule):
+            tasks = [(params, n_samples) for params in candidates]
+            scores = list(pool.map(_score_candidate, tasks))
+            ranked = sorted(zip(scores, range(len(candidates))), key=lambda s: (-s[0], s[1]))
+            history.append({"轮次": round_idx, "样本数": n_samples,
+                            "候选数": len(candidates), "最高得分": round(ranked[0][0], 4)})
+            if round_idx == len(schedule) - 1:
+                best_score, best_i = ranked[0]
+                return candidates[best_i], best_score, history
+            n_keep = max(1, math.ceil(len(candidates) / factor))
+            candidates = [candidates[i] for _, i in ranked[:n_keep]]
+
+def tune(n_jobs):
+    """在训练集上搜索并返回 (最优参数, CV得分, 轮次记录, 搜索耗时秒, 测试集准确率)"""
+    X, y, _ = pm.load_training_data()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    start = time.perf_counter()
+    best_params, best_score, history = successive_halving(X_train, y_train, n_jobs)
+    wall_time = time.perf_counter() - start
+    rfc = RandomForestClassifier(random_state=RANDOM_STATE, **best_params).fit(X_train, y_train)
+    return best_params, best_score, history, wall_time, float(rfc.score(X_test, y_test))
+
+# ===================== 命令行入口 =====================
+def main():
+    parser = argparse.ArgumentParser(description="企鹅随机森林超参数搜索（逐次减半）")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="进程数")
+    parser.add_argument("--compare-cores", action="store_true", help="额外用1核跑一次并对比耗时")
+    args = parser.parse_args()
+
+    timings = {}
+    if args.compare_cores and args.jobs > 1:
+        timings["1核耗时(秒)"] = round(tune(1)[3], 2)
+    best_params, best_score, history, wall_time, test_acc = tune(args.jobs)
+    timings[f"{args.jobs}核耗时(秒)"] = round(wall_time, 2)
+
+    for row in history:
+        print(row)
+    print(f"✅ 最优参数：{best_params}")
+    print(f"   交叉验证准确率：{best_score:.4f} | 测试集准确率：{test_acc:.4f}")
+    for label, seconds in timings.items():
+        print(f"   {label}：{seconds}")
+    if "1核耗时(秒)" in timings:
+        print(f"   加速比：{timings['1核耗时(秒)'] / wall_time:.2f}x")
+
+    model_registry.register(
+        REGISTRY_NAME,
+        params={**best_params, "random_state": RANDOM_STATE},
+        cv_score=round(best_score, 4),
+        test_score=round(test_acc, 4),
+        search_seconds=round(wall_time, 2),
+        n_jobs=args.jobs,
+        timings=timings,
+        rounds=history,
+    )
+    # 用最优参数重新训练并覆盖应用使用的模型文件
+    pm.train_and_save()
+    print(f"✅ 已写入{model_registry.REGISTRY_PATH}并重新训练{pm.MODEL_PATH}")
+
+if __name__ == "__main__":
+    main()
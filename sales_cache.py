@@ -0,0 +1,72 @@
+# 销售数据缓存 - 把supermarket_sales.xlsx的“销售数据”表一次性转成带类型的Parquet列式文件
+# 预先算好“小时数”，城市/顾客类型/性别/产品类型存为分类类型；工作簿内容变化（按哈希）时自动重建
+# 进程内用st.cache_resource共享同一份DataFrame，筛选时不会重新解析Excel
+import os
+import pandas as pd
+import streamlit as st
+from model_store import artifact_hash
+
+# ===================== 全局配置 =====================
+EXCEL_PATH = "supermarket_sales.xlsx"
+SHEET_NAME = "销售数据"
+CACHE_DIR = ".sales_cache"   # Parquet缓存目录（与代码同目录）
+CATEGORY_COLS = ["分店", "城市", "顾客类型", "性别", "产品类型"]
+# type_sales_frame之后（维度列未转分类时）各列的列式类型；sales_ingest的所有批次、所有工作表都按这一份写入
+COLUMN_TYPES = {
+    "订单号": "string", "分店": "string", "城市": "string", "顾客类型": "string", "性别": "string",
+    "产品类型": "string", "单价": "double", "数量": "int64", "总价": "double",
+    "日期": "timestamp[ns]", "时间": "string", "评分": "double", "小时数": "int8",
+}
+
+# ===================== Excel → Parquet =====================
+def type_sales_frame(df, categorical=True):
+    """补充“小时数”列、“时间”转为字符串，可选把维度列转为分类类型（sales_ingest按批写入时不转分类）"""
+    times, missing = df["时间"].astype(str), df["时间"].isna()
+    if missing.any():
+        times = times.where(~missing)   # 空值保持为空，不变成"None"
+    hours = pd.to_datetime(times, format="%H:%M:%S", errors="coerce").dt.hour
+    df["小时数"] = hours.astype("int8") if hours.notna().all() else hours.astype("Int8")
+    df["时间"] = times
+    if categorical:
+        for col in CATEGORY_COLS:
+            df[col] = df[col].astype("category")
+    return df
+
+def read_excel_typed(path=EXCEL_PATH):
+    """解析工作簿（sheet“销售数据”，跳过标题行，以订单号为索引），并转换为紧凑类型"""
+    return type_sales_frame(pd.read_excel(path, sheet_name=SHEET_NAME, skiprows=1, index_col="订单号"))
+
+def cache_path(version):
+    """某个工作簿版本对应的Parquet文件路径"""
+    return os.path.join(CACHE_DIR, f"{SHEET_NAME}_{version[:16]}.parquet")
+
+def build_cache(path=EXCEL_PATH, version=None):
+    """
+    转换并写入Parquet（先写临时文件再rename），同时清理旧版本的缓存文件
+    :return: Parquet文件路径
+    """
+    version = version or artifact_hash(path)
+    target = cache_path(version)
+    if os.path.exists(target):
+        return target
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    read_excel_typed(path).to_parquet(tmp_path)
+    os.replace(tmp_path, target)
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".parquet") and os.path.join(CACHE_DIR, name) != target:
+            os.remove(os.path.join(CACHE_DIR, name))
+    return target
+
+# ===================== 进程内共享 =====================
+@st.cache_resource(show_spinner="正在读取销售数据...", max_entries=2)
+def load_sales(version, path=EXCEL_PATH):
+    """
+    读取某个工作簿版本的销售数据（进程内所有会话共用，调用方不要原地修改）
+    :param version: 工作簿内容的SHA-256（缓存键，工作簿变化后自动失效）
+    """
+    return pd.read_parquet(build_cache(path, version))
+
+def get_sales_dataframe(path=EXCEL_PATH):
+    """当前工作簿版本的销售数据（工作簿未变化时每次调用只需一次os.stat）"""
+    return load_sales(artifact_hash(path), path)
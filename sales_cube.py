@@ -0,0 +1,246 @@
+# 销售数据立方体 - 把总价、订单数、评分总和按 城市×顾客类型×性别×产品类型×小时数 预聚合成稠密NumPy数组
+# 任意筛选组合都只是在立方体上切片求和，指标与图表的耗时与原始交易行数无关
+# 用法：
+#   streamlit run sales_cube.py          基于立方体的销售仪表板
+#   python sales_cube.py bench           不同交易行数下，df.query+groupby 与 立方体切片 的耗时对比
+#   python sales_cube.py check           含空值（时间/维度）的交易：立方体只跳过这些行，指标与query+groupby一致
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+import plotly.express as px
+import sales_cache
+
+# ===================== 全局配置 =====================
+DIMS = ["城市", "顾客类型", "性别", "产品类型", "小时数"]   # 立方体的维度（顺序即数组轴顺序）
+FILTER_DIMS = ["城市", "顾客类型", "性别"]                  # 侧边栏可筛选的维度
+MEASURES = {"总价": "总价", "订单数": None, "评分总和": "评分"}  # 度量名 → 求和的列（None表示计数）
+
+# ===================== 构建立方体 =====================
+def build_cube(df, dims=DIMS):
+    """
+    一次遍历原始交易，按各维度编码求出扁平下标，用np.bincount聚合三个度量
+    :param dims: 维度列（分类列的类别即该轴的取值，可预先设定类别来得到连续的日历轴）
+    :return: {"dims": 维度列表, "labels": {维度: 取值数组}, "总价"/"订单数"/"评分总和": 形状为各维度取值数的数组,
+              "rows": 计入立方体的交易行数, "skipped": 因维度为空（如时间为空时小时数为空）而跳过的行数}
+    """
+    labels, codes = {}, []
+    for dim in dims:
+        col = df[dim]
+        categorical = col if isinstance(col.dtype, pd.CategoricalDtype) else col.astype("category")
+        labels[dim] = np.asarray(categorical.cat.categories)
+        codes.append(categorical.cat.codes.to_numpy())
+    # 任一维度为空（编码-1）的行无法落到任何格子里，不计入立方体
+    keep = np.logical_and.reduce([code >= 0 for code in codes])
+    if not keep.all():
+        codes = [code[keep] for code in codes]
+    shape = tuple(len(labels[dim]) for dim in dims)
+    flat = np.ravel_multi_index(codes, shape)
+    size = int(np.prod(shape))
+    cube = {"dims": list(dims), "labels": labels, "rows": int(keep.sum()), "skipped": int((~keep).sum())}
+    for name, col in MEASURES.items():
+        weights = None if col is None else df[col].to_numpy(dtype=np.float64)
+        if weights is not None and not keep.all():
+            weights = weights[keep]
+        cube[name] = np.bincount(flat, weights=weights, minlength=size).astype(np.float64).reshape(shape)
+    return cube
+
+@st.cache_resource(show_spinner="正在构建销售数据立方体...", max_entries=2)
+def load_cube(version):
+    """每个工作簿版本只构建一次，所有会话共用（记录版本，供sales_delta判断会话中的增量状态是否过期）"""
+    cube = build_cube(sales_cache.load_sales(version))
+    cube["version"] = version
+    return cube
+
+def get_cube():
+    """当前工作簿版本的立方体"""
+    return load_cube(sales_cache.artifact_hash(sales_cache.EXCEL_PATH))
+
+# ===================== 切片查询 =====================
+def slice_cube(cube, selections):
+    """
+    按筛选条件切片并把筛选维度求和掉
+    :param selections: {维度: 选中的取值列表}，未给出的维度视为全选
+    :return: {度量: 形状为(产品类型数, 小时数)的数组}
+    """
+    index = []
+    for dim in FILTER_DIMS:
+        chosen = selections.get(dim)
+        index.append(np.arange(len(cube["labels"][dim])) if chosen is None
+                     else np.flatnonzero(np.isin(cube["labels"][dim], list(chosen))))
+    axes = tuple(range(len(FILTER_DIMS)))
+    return {name: cube[name][np.ix_(*index)].sum(axis=axes) for name in MEASURES}
+
+def summarize(cube, selections, sliced=None, scales=None):
+    """
+    计算指标与两张图所需的聚合结果
+    :param sliced: 已有的切片结果（如sales_delta增量维护的结果），给出时不再切片
+    :param scales: sliced为定点整数时各度量的倍数（先按整数求和，最后才除以倍数）
+    :return: (指标dict, 按产品类型的销售额Series, 按小时数的销售额Series)
+    """
+    sliced = slice_cube(cube, selections) if sliced is None else sliced
+    scales = scales or {}
+    sales, count, rating = sliced["总价"], sliced["订单数"], sliced["评分总和"]
+    sales_scale, rating_scale = scales.get("总价", 1), scales.get("评分总和", 1)
+    total_count = count.sum() / scales.get("订单数", 1)
+    total_sales = sales.sum() / sales_scale
+    kpis = {
+        "订单数": int(total_count),
+        "总销售额": float(total_sales),
+        "平均评分": float(rating.sum() / rating_scale / total_count) if total_count else None,
+        "每单平均销售额": float(total_sales / total_count) if total_count else None,
+    }
+    by_product = pd.Series(sales.sum(axis=1) / sales_scale,
+                           index=pd.Index(cube["labels"]["产品类型"], name="产品类型"), name="总价")
+    by_hour = pd.Series(sales.sum(axis=0) / sales_scale,
+                        index=pd.Index(cube["labels"]["小时数"], name="小时数"), name="总价")
+    # 与原仪表板一致：只展示筛选后出现过的产品类型/小时
+    by_product = by_product[count.sum(axis=1) > 0].sort_values()
+    by_hour = by_hour[count.sum(axis=0) > 0]
+    return kpis, by_product, by_hour
+
+# ===================== 页面功能 =====================
+def cube_sidebar(cube):
+    """侧边栏筛选（与sales_data2.add_sidebar_func相同的三个多选框）"""
+    with st.sidebar:
+        st.header("请筛选数据：")
+        selections = {}
+        for dim, label in zip(FILTER_DIMS, ["请选择城市：", "请选择顾客类型：", "请选择性别："]):
+            options = list(cube["labels"][dim])
+            selections[dim] = st.multiselect(label, options=options, default=options)
+    return selections
+
+def cube_page():
+    """基于立方体的销售仪表板（切片结果按增删的取值增量更新），下方为分时段客流"""
+    from sales_delta import SCALES, session_slice
+    from sales_rollup import get_rollups, staffing_section
+    cube = get_cube()
+    selections = cube_sidebar(cube)
+    start = time.perf_counter()
+    sliced, mode = session_slice(cube, selections)
+    kpis, by_product, by_hour = summarize(cube, selections, sliced, SCALES)
+    elapsed = time.perf_counter() - start
+
+    st.title('📊销售仪表板')
+    if kpis["订单数"] == 0:
+        st.warning("⚠️ 当前筛选条件下没有交易记录")
+        return
+    left_key_col, middle_key_col, right_key_col = st.columns(3)
+    average_rating = round(kpis["平均评分"], 1)
+    with left_key_col:
+        st.subheader("总销售额：")
+        st.subheader(f"RMB ¥ {int(kpis['总销售额']):,}")
+    with middle_key_col:
+        st.subheader("顾客评分的平均值：")
+        st.subheader(f"{average_rating} {':star:' * int(round(average_rating, 0))}")
+    with right_key_col:
+        st.subheader("每单的平均销售额：")
+        st.subheader(f"RMB ¥ {round(kpis['每单平均销售额'], 2)}")
+
+    st.divider()
+    left_chart_col, right_chart_col = st.columns(2)
+    with left_chart_col:
+        hour_fig = px.bar(by_hour.to_frame(), x=by_hour.index, y="总价",
+                          title="<b>按小时数划分的销售额</b>")
+        st.plotly_chart(hour_fig, use_container_width=True)
+    with right_chart_col:
+        product_fig = px.bar(by_product.to_frame(), x="总价", y=by_product.index, orientation="h",
+                             title="<b>按产品类型划分的销售额</b>")
+        st.plotly_chart(product_fig, use_container_width=True)
+    skipped = f"，跳过 {cube['skipped']:,} 条维度为空的交易" if cube.get("skipped") else ""
+    st.caption(f"⏱️ 立方体切片+聚合 {elapsed * 1000:.2f} 毫秒（{mode}，预聚合自 {cube['rows']:,} 条交易{skipped}）")
+    st.divider()
+    staffing_section(get_rollups(), selections)
+
+# ===================== 基准测试 =====================
+def _query_groupby(df, selections):
+    """原仪表板的做法：df.query筛选后分别groupby"""
+    city, customer_type, gender = (selections[d] for d in FILTER_DIMS)
+    sel = df.query("城市 == @city & 顾客类型 == @customer_type & 性别 == @gender")
+    sel.groupby(by=["产品类型"], observed=True)[["总价"]].sum().sort_values(by="总价")
+    sel.groupby(by=["小时数"])[["总价"]].sum()
+    return int(sel["总价"].sum()), round(sel["评分"].mean(), 1), round(sel["总价"].mean(), 2)
+
+def run_benchmark(sizes, repeat=20):
+    """用模拟销售数据对比两种做法在不同交易行数下的单次筛选耗时"""
+    import synthetic_data
+    for rows in sizes:
+        df = synthetic_data.generate("sales", rows)
+        df["小时数"] = pd.to_datetime(df["时间"], format="%H:%M:%S").dt.hour.astype("int8")
+        for col in sales_cache.CATEGORY_COLS:
+            df[col] = df[col].astype("category")
+        build_start = time.perf_counter()
+        cube = build_cube(df)
+        build_seconds = time.perf_counter() - build_start
+        selections = {"城市": ["太原", "大同"], "顾客类型": ["会员用户"], "性别": ["女性", "男性"]}
+        kpis, _, _ = summarize(cube, selections)
+        baseline = _query_groupby(df, selections)
+        same = (int(kpis["总销售额"]) == baseline[0] and round(kpis["平均评分"], 1) == baseline[1]
+                and round(kpis["每单平均销售额"], 2) == baseline[2])
+        timings = {}
+        for name, fn in (("query+groupby", lambda: _query_groupby(df, selections)),
+                         ("立方体", lambda: summarize(cube, selections))):
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - start)
+            timings[name] = float(np.median(samples))
+        print(f"{rows:>12,}行：query+groupby {timings['query+groupby'] * 1e3:9.2f} ms | "
+              f"立方体 {timings['立方体'] * 1e3:6.3f} ms | 构建立方体 {build_seconds:.2f} 秒 | 指标一致：{same}")
+
+def run_check(rows=10_000, seed=0):
+    """
+    把部分交易的时间、城市、日期置空后构建立方体（含sales_trends按天的立方体）：
+    不报错、跳过的行数正确，指标与对非空行做query+groupby的结果一致
+    :return: 不通过的检查项数
+    """
+    import synthetic_data
+    from sales_trends import build_daily_cube
+    df = synthetic_data.generate("sales", rows)
+    rng = np.random.default_rng(seed)
+    blank = rng.choice(rows, 30, replace=False)
+    df["时间"] = df["时间"].astype(object)
+    df.loc[df.index[blank[:10]], "时间"] = None
+    df.loc[df.index[blank[10:20]], "城市"] = None
+    df = sales_cache.type_sales_frame(df)
+    df["日期"] = pd.to_datetime(df["日期"])
+    df.loc[df.index[blank[20:]], "日期"] = pd.NaT
+    failures = 0
+    cube = build_cube(df)
+    selections = {"城市": ["太原", "大同"], "顾客类型": ["会员用户"], "性别": ["女性", "男性"]}
+    kpis, _, _ = summarize(cube, selections)
+    expected = _query_groupby(df.dropna(subset=DIMS), selections)
+    checks = {
+        "立方体跳过空值行": cube["skipped"] == 20 and cube["rows"] == rows - 20,
+        "指标与query+groupby一致": (int(kpis["总销售额"]) == expected[0] and round(kpis["平均评分"], 1) == expected[1]
+                                  and round(kpis["每单平均销售额"], 2) == expected[2]),
+        "按天的立方体跳过空值行": build_daily_cube(df)["skipped"] == 20,   # 城市为空10行 + 日期为空10行
+    }
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+        failures += not ok
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="销售数据立方体")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="不同交易行数下的筛选耗时对比")
+    p_bench.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000, 5_000_000])
+    p_check = sub.add_parser("check", help="含空值交易的回归检查")
+    p_check.add_argument("--rows", type=int, default=10_000)
+    args = parser.parse_args()
+    if args.command == "check":
+        sys.exit(1 if run_check(args.rows) else 0)
+    run_benchmark(args.sizes)
+
+# ===================== 主程序 =====================
+if __name__ == "__main__":
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    if get_script_run_ctx() is not None:
+        st.set_page_config(page_title="销售仪表板", page_icon="📊", layout="wide")
+        cube_page()
+    else:
+        main()
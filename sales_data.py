@@ -1,27 +1,8 @@
 #第10章/final_app.PY
-import pandas as pd
 import streamlit as st
 import plotly.express as px
-
-def get_dataframe_from_excel():
-    #pd.read_excel()函数用于读取Excel文件的数据
-    #*supermarket_sales.xlsx'表示Excel文件的路径及名称
-    #*sheet_name='销售数据'表示读取Excel中名为"销售数据"的工作表的数据
-    #*skiprows=1表示跳过Excel表中的第1行，因为第1行是标题
-    #*index_col='订单号'表示将"订单号"这一列作为返回的数据框的索引
-    #最后将读取到的数据框赋值给变量df
-    df = pd.read_excel('supermarket_sales.xlsx',
-                       sheet_name='销售数据',
-                       skiprows=1,
-                       index_col='订单号'
-                       )
-    #df['时间']取出原有的'时间'这一列，其中包含交易的完整时间字符串，如'10:25:30'
-    #pd.to_datetime将'时间'列转换成datetime类型
-    #*format="%H:%M:%S"指定原有时间字符串的格式
-    #*.dt.hour表示从转换后的数据框取出小时数作为新列
-    #最后赋值给sale_df['小时数']，得到包含交易小时的新列
-    df['小时数'] = pd.to_datetime(df["时间"], format="%H:%M:%S").dt.hour
-    return df
+from sales_cache import get_sales_dataframe
+from sales_filter import filter_frame
 
 def add_sidebar_func(df):
     #创建侧边栏
@@ -49,16 +30,16 @@ def add_sidebar_func(df):
             options=gender_unique,  #选项为gender_unique
             default=gender_unique,  #默认选中所有性别
         )
-        #通过query筛选数据（@变量表示引用Streamlit组件的值）
-        df_selection = df.query(
-            "城市 == @city & 顾客类型 == @customer_type & 性别 == @gender"
+        #通过位图索引筛选数据（维度内取并集、维度间取交集，与原query条件等价）
+        df_selection = filter_frame(
+            df, {"城市": city, "顾客类型": customer_type, "性别": gender}
         )
     return df_selection
 
 def product_line_chart(df):
     #按"产品类型"分组，计算"总价"列的和并按总价排序
     sales_by_product_line = (
-        df.groupby(by=["产品类型"])[["总价"]].sum().sort_values(by="总价")
+        df.groupby(by=["产品类型"], observed=True)[["总价"]].sum().sort_values(by="总价")
     )
     #生成横向条形图（按产品类型的销售额）
     fig_product_sales = px.bar(
@@ -127,8 +108,8 @@ def run_app():
                        page_icon="📊",
                        layout="wide"
                        )
-    #读取Excel数据
-    sale_df = get_dataframe_from_excel()
+    #读取销售数据（首次把Excel转为Parquet缓存，工作簿变化时自动重建，所有会话共用）
+    sale_df = get_sales_dataframe()
     #通过侧边栏筛选数据
     df_selection = add_sidebar_func(sale_df)
     #渲染主界面
@@ -0,0 +1,211 @@
+# 增量指标更新 - 在session_state里保存当前筛选状态下的聚合结果（产品类型×小时数的销售额/订单数/评分总和）
+# 侧边栏只增删某一个维度的取值时，只加上/减去这些取值对应切片的局部聚合（来自预聚合立方体），不再整体重算
+# 聚合用定点整数（金额以分、评分以0.1计），加减是精确的，增量结果与全量重算逐位相同，不会累积浮点误差
+# 同时改动多个维度或数据版本变化时做一次全量重算
+# 用法：
+#   totals, mode = session_slice(cube, selections)      # 页面中使用，mode为 "全量"/"增量"/"不变"
+#   python sales_delta.py check --steps 5000            回归检查：随机增删筛选值，每一步与全量重算比对
+#   python sales_delta.py bench                         增量更新与全量重算的耗时对比
+import argparse
+import sys
+import time
+import numpy as np
+import streamlit as st
+from sales_cube import FILTER_DIMS, MEASURES, slice_cube
+
+# ===================== 全局配置 =====================
+STATE_KEY = "sales_cube_delta"   # session_state中的键
+SCALES = {"总价": 100, "订单数": 1, "评分总和": 10}   # 定点倍数：总价保留2位小数、评分保留1位小数
+
+# ===================== 定点立方体 =====================
+def exact_cube(cube):
+    """
+    立方体各度量转为定点整数（结果存回cube，每个立方体只转换一次）
+    每格的浮点和误差远小于0.5个最小单位，四舍五入即得到精确的整数和
+    """
+    exact = cube.get("exact")
+    if exact is None:
+        exact = dict(cube)
+        for name in MEASURES:
+            exact[name] = np.rint(cube[name] * SCALES[name]).astype(np.int64)
+        cube["exact"] = exact
+    return exact
+
+# ===================== 状态与增量 =====================
+def normalize_selection(cube, selections):
+    """每个筛选维度的选中取值集合（未给出视为全选，数据中不存在的取值忽略，与slice_cube一致）"""
+    result = {}
+    for dim in FILTER_DIMS:
+        labels = set(cube["labels"][dim].tolist())
+        chosen = selections.get(dim)
+        result[dim] = frozenset(labels if chosen is None else set(chosen) & labels)
+    return result
+
+def full_state(cube, selection):
+    """全量重算得到的状态（定点整数）"""
+    return {"version": cube.get("version"), "selection": selection,
+            "totals": slice_cube(exact_cube(cube), selection)}
+
+def _partial(cube, selection, dim, values):
+    """维度dim取values、其余筛选维度取selection时的局部聚合（定点整数）"""
+    sub = dict(selection)
+    sub[dim] = values
+    return slice_cube(exact_cube(cube), sub)
+
+def apply_selection(state, cube, selections):
+    """
+    从上一次的状态推进到新的筛选
+    :return: (新状态, 方式："全量"/"增量"/"不变")
+    """
+    selection = normalize_selection(cube, selections)
+    if state is None or state["version"] != cube.get("version"):
+        return full_state(cube, selection), "全量"
+    changed = [dim for dim in FILTER_DIMS if selection[dim] != state["selection"][dim]]
+    if not changed:
+        return state, "不变"
+    if len(changed) > 1:
+        return full_state(cube, selection), "全量"
+    dim = changed[0]
+    removed = state["selection"][dim] - selection[dim]
+    added = selection[dim] - state["selection"][dim]
+    totals = {name: arr.copy() for name, arr in state["totals"].items()}
+    if removed:
+        part = _partial(cube, state["selection"], dim, removed)
+        for name in MEASURES:
+            totals[name] -= part[name]
+    if added:
+        part = _partial(cube, selection, dim, added)
+        for name in MEASURES:
+            totals[name] += part[name]
+    return {"version": state["version"], "selection": selection, "totals": totals}, "增量"
+
+def session_slice(cube, selections):
+    """
+    在当前会话中按增量方式得到切片聚合（连同SCALES传给sales_cube.summarize）
+    :return: ({度量: (产品类型数, 小时数)的定点整数数组}, 方式)
+    """
+    state, mode = apply_selection(st.session_state.get(STATE_KEY), cube, selections)
+    st.session_state[STATE_KEY] = state
+    return state["totals"], mode
+
+# ===================== 回归检查 =====================
+def _random_step(rng, cube, selection):
+    """随机生成下一次筛选：大多数是单个取值的增删，偶尔整维全选/清空或同时改两个维度"""
+    new = {dim: set(values) for dim, values in selection.items()}
+    kind = rng.random()
+    dims = list(FILTER_DIMS)
+    if kind < 0.8:
+        dim = dims[rng.integers(len(dims))]
+        value = cube["labels"][dim][rng.integers(len(cube["labels"][dim]))]
+        new[dim] ^= {value}
+    elif kind < 0.9:
+        dim = dims[rng.integers(len(dims))]
+        new[dim] = set() if new[dim] else set(cube["labels"][dim].tolist())
+    else:
+        for dim in rng.choice(dims, size=2, replace=False):
+            value = cube["labels"][dim][rng.integers(len(cube["labels"][dim]))]
+            new[dim] ^= {value}
+    return {dim: sorted(values) for dim, values in new.items()}
+
+def _kpi_text(cube, totals):
+    """页面上显示的三个指标（与cube_page相同的取整方式）"""
+    from sales_cube import summarize
+    kpis, by_product, by_hour = summarize(cube, {}, totals, SCALES)
+    if kpis["订单数"] == 0:
+        return ("无交易",), by_product, by_hour
+    return ((int(kpis["总销售额"]), round(kpis["平均评分"], 1), round(kpis["每单平均销售额"], 2)),
+            by_product, by_hour)
+
+def run_check(cube, steps, seed=0, log=print):
+    """
+    随机增删筛选值，每一步把增量结果与全量重算比对：
+    定点数组逐格相等、显示的指标与两张图的数据相同，并且与浮点立方体的切片结果在误差范围内一致
+    :return: 不一致的步数
+    """
+    rng = np.random.default_rng(seed)
+    state, selection = None, {dim: cube["labels"][dim].tolist() for dim in FILTER_DIMS}
+    failures, modes = 0, {"全量": 0, "增量": 0, "不变": 0}
+    for step in range(steps):
+        state, mode = apply_selection(state, cube, selection)
+        modes[mode] += 1
+        expected = full_state(cube, normalize_selection(cube, selection))["totals"]
+        floating = slice_cube(cube, selection)
+        ok = all(np.array_equal(state["totals"][name], expected[name]) for name in MEASURES)
+        ok = ok and all(np.allclose(state["totals"][name] / SCALES[name], floating[name], rtol=1e-9, atol=1e-6)
+                        for name in MEASURES)
+        got_kpi, got_product, got_hour = _kpi_text(cube, state["totals"])
+        exp_kpi, exp_product, exp_hour = _kpi_text(cube, expected)
+        ok = ok and got_kpi == exp_kpi and got_product.equals(exp_product) and got_hour.equals(exp_hour)
+        if not ok:
+            failures += 1
+            log(f"❌ 第{step}步（{mode}）不一致：{selection} 增量 {got_kpi} / 全量 {exp_kpi}")
+        selection = _random_step(rng, cube, state["selection"])
+    log(f"{steps}步：全量 {modes['全量']} / 增量 {modes['增量']} / 不变 {modes['不变']}，不一致 {failures}")
+    return failures
+
+# ===================== 基准测试 =====================
+def run_benchmark(cube, df, repeat=200):
+    """单个城市的增删：增量更新 vs 立方体全量切片 vs 按筛选后DataFrame重算指标与两张图"""
+    from sales_filter import build_index, filter_frame
+    everything = {dim: cube["labels"][dim].tolist() for dim in FILTER_DIMS}
+    city = cube["labels"]["城市"][0]
+    toggled = dict(everything, 城市=[c for c in everything["城市"] if c != city])
+    index = build_index(df)
+
+    def frame_recompute(selection):
+        sel = filter_frame(df, selection, index)
+        sel.groupby(by=["产品类型"], observed=True)[["总价"]].sum().sort_values(by="总价")
+        sel.groupby(by=["小时数"])[["总价"]].sum()
+        return sel["总价"].sum(), sel["评分"].mean(), sel["总价"].mean()
+
+    def timed(fn):
+        samples = []
+        for i in range(repeat):
+            selection = toggled if i % 2 == 0 else everything
+            t = time.perf_counter()
+            fn(selection)
+            samples.append(time.perf_counter() - t)
+        return float(np.median(samples)) * 1e3
+
+    state = {"s": full_state(cube, normalize_selection(cube, everything))}
+
+    def delta(selection):
+        state["s"], _ = apply_selection(state["s"], cube, selection)
+
+    print(f"{len(df):,}行，每次增删一个城市（取{repeat}次中位数）：")
+    print(f"  增量更新（加/减一个切片）   {timed(delta):8.3f} ms")
+    print(f"  立方体全量切片              {timed(lambda s: slice_cube(cube, s)):8.3f} ms")
+    print(f"  筛选后DataFrame全量重算     {timed(frame_recompute):8.3f} ms")
+
+# ===================== 命令行入口 =====================
+def _load(rows):
+    """rows为0时使用supermarket_sales.xlsx，否则生成rows行模拟销售数据"""
+    import sales_cache
+    from sales_cube import build_cube
+    if rows:
+        import synthetic_data
+        df = synthetic_data.generate("sales", rows)
+        df = sales_cache.type_sales_frame(df)
+    else:
+        df = sales_cache.read_excel_typed()
+    return build_cube(df), df
+
+def main():
+    parser = argparse.ArgumentParser(description="增量指标更新")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_check = sub.add_parser("check", help="回归检查：增量结果与全量重算比对")
+    p_check.add_argument("--steps", type=int, default=5000)
+    p_check.add_argument("--seed", type=int, default=0)
+    p_check.add_argument("--rows", type=int, default=0, help="使用的模拟数据行数（默认原始工作簿）")
+    p_bench = sub.add_parser("bench", help="增量更新与全量重算的耗时对比")
+    p_bench.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    cube, df = _load(args.rows)
+    if args.command == "check":
+        failures = run_check(cube, args.steps, args.seed)
+        sys.exit(1 if failures else 0)
+    run_benchmark(cube, df)
+
+if __name__ == "__main__":
+    main()
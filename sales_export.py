@@ -0,0 +1,290 @@
+# 筛选结果导出 - 把df_selection按块流式写成CSV或Parquet（生成器逐块产出字节），不在内存中拼出完整的导出内容
+# 行掩码直接取sales_filter按选择元组缓存的压缩位图，每块只解压该块对应的位；内存只与块大小有关
+# 页面中：导出文件写到 static/exports/ 下，由Streamlit静态文件服务（.streamlit/config.toml 中 enableStaticServing）从磁盘分块发送；
+# 静态文件服务对超过200MB的文件返回404，超过时按大小切分成多个完整的文件（每个CSV都带表头）
+# 用法：
+#   from sales_export import export_section, iter_export, write_parts
+#   python sales_export.py export out.csv --city 太原 --gender 女性      导出当前工作簿的筛选结果（.csv/.parquet）
+#   python sales_export.py bench --rows 1000000 4000000                    与 df_selection.to_csv() 的耗时和内存峰值对比
+import argparse
+import os
+import tempfile
+import time
+import uuid
+import numpy as np
+import streamlit as st
+from sales_filter import check_index, select_bits
+
+# ===================== 全局配置 =====================
+CHUNK_ROWS = 100_000     # 每块的原始行数（8的倍数，保证块边界落在位图的字节边界上）
+READ_BYTES = 1 << 20     # Parquet临时文件每次读出的字节数
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "exports")
+EXPORT_URL = "app/static/exports"
+EXPORT_TTL = 3600        # 导出文件保留的秒数
+STATIC_MAX_BYTES = 200 * 2**20           # Streamlit静态文件服务的单文件上限（MAX_APP_STATIC_FILE_SIZE）
+PART_BYTES = STATIC_MAX_BYTES - 2**20    # 每个导出文件的大小上限（留出余量）
+FORMATS = {"CSV": ".csv", "Parquet": ".parquet"}
+
+# ===================== 按块取出筛选结果 =====================
+def iter_frames(df, index, selections, chunk_rows=CHUNK_ROWS):
+    """
+    按原始行顺序逐块产出筛选后的DataFrame
+    :param index: df对应的位图索引（sales_filter.build_index / get_index）
+    """
+    check_index(index, df)
+    bits = select_bits(index, selections)
+    chunk_rows = max(8, chunk_rows // 8 * 8)
+    for start in range(0, len(df), chunk_rows):
+        piece = df.iloc[start:start + chunk_rows]
+        if bits is not None:
+            piece = piece[np.unpackbits(bits[start // 8:(start + chunk_rows) // 8], count=len(piece)).view(bool)]
+        if len(piece):
+            yield piece
+
+def _keep_index(df):
+    """有名字的索引（如sales_cache数据的“订单号”）一并导出"""
+    return df.index.name is not None
+
+def iter_csv(df, index, selections, chunk_rows=CHUNK_ROWS):
+    """逐块产出CSV字节（utf-8-sig，Excel可直接打开中文）；没有匹配行时只有表头"""
+    keep_index = _keep_index(df)
+    yield df.iloc[:0].to_csv(index=keep_index).encode("utf-8-sig")
+    for piece in iter_frames(df, index, selections, chunk_rows):
+        yield piece.to_csv(index=keep_index, header=False).encode("utf-8")
+
+def iter_parquet(df, index, selections, chunk_rows=CHUNK_ROWS):
+    """每块写成一个行组（Parquet的文件尾要在最后才能写出，先写入临时文件，再按块读出并删除）"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    keep_index = _keep_index(df)
+    schema = pa.Schema.from_pandas(df.iloc[:1], preserve_index=keep_index)   # 空表推断不出object列的类型
+    fd, tmp_path = tempfile.mkstemp(prefix="sales_export_", suffix=".parquet")
+    os.close(fd)
+    try:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for piece in iter_frames(df, index, selections, chunk_rows):
+                writer.write_table(pa.Table.from_pandas(piece, schema=schema, preserve_index=keep_index))
+        with open(tmp_path, "rb") as f:
+            while True:
+                block = f.read(READ_BYTES)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(tmp_path)
+
+def iter_export(df, index, selections, fmt="CSV", chunk_rows=CHUNK_ROWS):
+    """按格式（"CSV"/"Parquet"）逐块产出导出内容"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式：{fmt}（可选：{'/'.join(FORMATS)}）")
+    return (iter_csv if fmt == "CSV" else iter_parquet)(df, index, selections, chunk_rows)
+
+def write_export(chunks, path):
+    """把生成器的输出逐块写入文件（先写临时文件再rename）"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    size = 0
+    with open(tmp_path, "wb") as f:
+        for block in chunks:
+            f.write(block)
+            size += len(block)
+    os.replace(tmp_path, path)
+    return size
+
+def clean_exports(export_dir=EXPORT_DIR, ttl=EXPORT_TTL):
+    """删除过期的导出文件"""
+    if not os.path.isdir(export_dir):
+        return
+    now = time.time()
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        if os.path.isfile(path) and now - os.path.getmtime(path) > ttl:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def write_parts(df, index, selections, part_path, fmt="CSV", max_bytes=PART_BYTES, chunk_rows=CHUNK_ROWS):
+    """
+    按大小把导出内容切分写入多个文件，每个都是完整的CSV（带表头）或Parquet文件
+    :param part_path: part_path(序号) → 该部分的文件路径，序号从1开始
+    :param max_bytes: 每个文件的大小上限（Parquet按未压缩的Arrow大小估算，实际文件只会更小）
+    :return: [(路径, 字节数)]
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式：{fmt}（可选：{'/'.join(FORMATS)}）")
+    keep_index = _keep_index(df)
+    if fmt == "CSV":
+        header = df.iloc[:0].to_csv(index=keep_index).encode("utf-8-sig")
+        open_part = lambda path: open(path, "wb")
+        encode = lambda piece: piece.to_csv(index=keep_index, header=False).encode("utf-8")
+        measure = len
+        write = lambda handle, block: handle.write(block)
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        header = b""
+        schema = pa.Schema.from_pandas(df.iloc[:1], preserve_index=keep_index)   # 空表推断不出object列的类型
+        open_part = lambda path: pq.ParquetWriter(path, schema)
+        encode = lambda piece: pa.Table.from_pandas(piece, schema=schema, preserve_index=keep_index)
+        measure = lambda table: table.nbytes
+        write = lambda handle, table: handle.write_table(table)
+
+    parts = []
+
+    def start_part():
+        path = part_path(len(parts) + 1)
+        handle = open_part(f"{path}.{os.getpid()}.tmp")
+        if header:
+            handle.write(header)
+        parts.append([path, len(header), handle])
+
+    def finish_part():
+        path, size, handle = parts[-1]
+        handle.close()
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+        if fmt != "CSV":
+            parts[-1][1] = os.path.getsize(path)
+
+    start_part()
+    for piece in iter_frames(df, index, selections, chunk_rows):
+        block = encode(piece)
+        if parts[-1][1] + measure(block) > max_bytes and parts[-1][1] > len(header):
+            finish_part()
+            start_part()
+        write(parts[-1][2], block)
+        parts[-1][1] += measure(block)
+    finish_part()
+    return [(path, size) for path, size, _ in parts]
+
+# ===================== 页面组件 =====================
+def _show_links(right):
+    """显示本会话最近一次生成的下载链接（重跑页面后仍保留，文件过期删除后不再显示）"""
+    export = st.session_state.get("export_links")
+    if not export:
+        return
+    if not all(os.path.exists(os.path.join(EXPORT_DIR, stored)) for stored, _, _ in export["files"]):
+        del st.session_state["export_links"]
+        return
+    links = "<br>".join(f'<a href="{EXPORT_URL}/{stored}" download="{download}">⬇️ 下载 {download}</a>（{size / 2**20:.1f} MB）'
+                        for stored, download, size in export["files"])
+    note = f"，超过{STATIC_MAX_BYTES // 2**20} MB已切分为 {len(export['files'])} 个文件" if len(export["files"]) > 1 else ""
+    right.markdown(f"{links}<br>{export['rows']:,} 行，用时 {export['seconds']:.1f} 秒{note}，"
+                   f"{EXPORT_TTL // 60}分钟内有效", unsafe_allow_html=True)
+
+def export_section(df, index, selections, rows, name="销售数据"):
+    """
+    导出当前筛选结果
+    :param rows: 筛选后的行数（显示在按钮上）
+    :param name: 导出文件名前缀
+    """
+    st.subheader("导出筛选结果")
+    left, right = st.columns([1, 3])
+    fmt = left.radio("格式：", list(FORMATS), horizontal=True, key="export_format")
+    ext = FORMATS[fmt]
+    prefix = f"{name}_{time.strftime('%Y%m%d_%H%M%S')}"
+    if not st.get_option("server.enableStaticServing"):
+        # 未开启静态文件服务时退回download_button：点击时才生成，但内容会整体放在服务器内存中
+        right.download_button(f"⬇️ 下载 {rows:,} 行（{fmt}）", data=lambda: b"".join(iter_export(df, index, selections, fmt)),
+                              file_name=f"{prefix}{ext}")
+        st.caption("大批量导出请在 .streamlit/config.toml 中开启 server.enableStaticServing，改为从磁盘流式发送")
+        return
+    if right.button(f"生成导出文件：{rows:,} 行（{fmt}）"):
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        clean_exports()
+        stem = uuid.uuid4().hex
+        start = time.perf_counter()
+        with st.spinner("正在导出..."):
+            parts = write_parts(df, index, selections, lambda i: os.path.join(EXPORT_DIR, f"{stem}_{i}{ext}"), fmt)
+        files = [(os.path.basename(path), f"{prefix}{ext}" if len(parts) == 1 else f"{prefix}_part{i}{ext}", size)
+                 for i, (path, size) in enumerate(parts, 1)]
+        st.session_state["export_links"] = {"files": files, "rows": rows, "seconds": time.perf_counter() - start}
+    _show_links(right)
+
+# ===================== 基准测试 =====================
+def _rss_mb():
+    """当前常驻内存（MB，读取/proc/self/statm）"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def _measure(method, rows, out_dir, result_queue):
+    """子进程中：生成数据并建立索引后，以导出开始时的内存为基准，后台线程每5毫秒采样，得到导出期间新增的峰值"""
+    import gc
+    import threading
+    import synthetic_data
+    from sales_cache import type_sales_frame
+    from sales_filter import build_index, filter_frame
+    df = type_sales_frame(synthetic_data.generate("sales", rows)).set_index("订单号")
+    index = build_index(df)
+    selections = {"城市": ["太原", "大同"], "顾客类型": ["会员用户"], "性别": ["女性", "男性"]}
+    select_bits(index, selections)
+    gc.collect()
+    baseline = _rss_mb()
+    samples, done = [baseline], threading.Event()
+
+    def sample():
+        while not done.wait(0.005):
+            samples.append(_rss_mb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    path = os.path.join(out_dir, f"{method}.out")
+    if method == "to_csv字符串":
+        data = filter_frame(df, selections, index).to_csv().encode("utf-8-sig")
+        size = len(data)
+        with open(path, "wb") as f:
+            f.write(data)
+        del data
+    else:
+        size = write_export(iter_export(df, index, selections, "Parquet" if "Parquet" in method else "CSV"), path)
+    seconds = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    result_queue.put((seconds, size, baseline, max(samples)))
+
+def run_benchmark(sizes):
+    """每种做法在单独的子进程中运行，比较耗时与导出期间新增的内存峰值"""
+    import multiprocessing as mp
+    import shutil
+    ctx = mp.get_context("spawn")
+    workdir = tempfile.mkdtemp(prefix="sales_export_bench_")
+    try:
+        for rows in sizes:
+            print(f"== {rows:,}行，筛选 城市∈{{太原,大同}} 且 顾客类型=会员用户")
+            for method in ("to_csv字符串", "流式CSV", "流式Parquet"):
+                result_queue = ctx.Queue()
+                proc = ctx.Process(target=_measure, args=(method, rows, workdir, result_queue))
+                proc.start()
+                seconds, size, baseline, peak = result_queue.get()
+                proc.join()
+                print(f"   {method:<12} {seconds:6.2f} 秒  {size / 2**20:7.1f} MB  "
+                      f"数据与索引 {baseline:6.0f} MB → 峰值 {peak:6.0f} MB（导出新增 {peak - baseline:6.0f} MB）")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# ===================== 命令行入口 =====================
+def main():
+    parser = argparse.ArgumentParser(description="筛选结果导出")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="导出当前工作簿的筛选结果")
+    p_export.add_argument("out_path", help="输出文件（.csv或.parquet）")
+    p_export.add_argument("--city", nargs="+")
+    p_export.add_argument("--customer-type", nargs="+")
+    p_export.add_argument("--gender", nargs="+")
+    p_bench = sub.add_parser("bench", help="与 df_selection.to_csv() 的耗时和内存峰值对比")
+    p_bench.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 4_000_000])
+    args = parser.parse_args()
+
+    if args.command == "export":
+        import sales_cache
+        from sales_filter import build_index
+        df = sales_cache.read_excel_typed()
+        selections = {"城市": args.city, "顾客类型": args.customer_type, "性别": args.gender}
+        fmt = "Parquet" if args.out_path.lower().endswith(".parquet") else "CSV"
+        size = write_export(iter_export(df, build_index(df), selections, fmt), args.out_path)
+        print(f"✅ {args.out_path}（{size / 2**10:.1f} KB）")
+    else:
+        run_benchmark(args.rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# 位图筛选引擎 - 替代 df.query("城市 == @city & 顾客类型 == @customer_type & 性别 == @gender")
+# 预先为每个维度的每个取值保存一份压缩位图（np.packbits，每行1位），
+# 多选框的选择 = 维度内按位或、维度间按位与；组合结果按选择元组缓存（LRU），重复的筛选直接复用
+# 用法：
+#   from sales_filter import filter_frame
+#   df_selection = filter_frame(df, {"城市": city, "顾客类型": customer_type, "性别": gender})
+#   python sales_filter.py bench --sizes 1000 1000000 20000000    与df.query的耗时对比
+import argparse
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+import sales_cache
+from sales_cube import FILTER_DIMS   # 建立位图的维度
+
+# ===================== 全局配置 =====================
+MAX_CACHED_MASKS = 32                         # 按选择元组缓存的组合位图个数
+
+# ===================== 建立位图索引 =====================
+def build_index(df, dims=FILTER_DIMS):
+    """
+    为每个维度的每个取值生成一份压缩位图
+    :return: {"rows": 行数, "labels": 行标签（df.index，不复制）, "bitmaps": {维度: {取值: 压缩位图}},
+              "cache": 组合位图LRU, "lock": 线程锁}
+    """
+    bitmaps = {}
+    for dim in dims:
+        col = df[dim]
+        categorical = col if isinstance(col.dtype, pd.CategoricalDtype) else col.astype("category")
+        codes = categorical.cat.codes.to_numpy()
+        bitmaps[dim] = {value: np.packbits(codes == i)
+                        for i, value in enumerate(categorical.cat.categories)}
+    return {"rows": len(df), "labels": df.index, "bitmaps": bitmaps, "cache": OrderedDict(), "lock": threading.Lock()}
+
+@st.cache_resource(show_spinner="正在建立筛选索引...", max_entries=2)
+def load_index(version):
+    """每个工作簿版本只建立一次（与sales_cache.load_sales返回的是同一份数据），所有会话共用"""
+    return build_index(sales_cache.load_sales(version))
+
+def get_index():
+    """当前工作簿版本的位图索引"""
+    return load_index(sales_cache.artifact_hash(sales_cache.EXCEL_PATH))
+
+# ===================== 筛选 =====================
+def _selection_key(index, selections):
+    """选择元组：每个维度选中取值的有序元组（未给出的维度记为None，表示不筛选）"""
+    return tuple(None if selections.get(dim) is None else tuple(sorted(set(selections[dim])))
+                 for dim in index["bitmaps"])
+
+def _combine(index, key):
+    """维度内按位或、维度间按位与，返回压缩位图（全部维度都不筛选时返回None）"""
+    result = None
+    for dim, chosen in zip(index["bitmaps"], key):
+        if chosen is None:
+            continue
+        bitmaps = index["bitmaps"][dim]
+        dim_bits = np.zeros((index["rows"] + 7) // 8, dtype=np.uint8)
+        for value in chosen:
+            if value in bitmaps:   # 数据中不存在的取值不匹配任何行（与query一致）
+                np.bitwise_or(dim_bits, bitmaps[value], out=dim_bits)
+        result = dim_bits if result is None else np.bitwise_and(result, dim_bits, out=result)
+    return result
+
+def select_bits(index, selections):
+    """
+    多选结果对应的压缩位图（按选择元组缓存）
+    :param selections: {维度: 选中的取值列表}，未给出的维度视为全选
+    :return: np.packbits格式的位图，全部维度都不筛选时为None
+    """
+    key = _selection_key(index, selections)
+    with index["lock"]:
+        bits = index["cache"].get(key)
+        if bits is not None:
+            index["cache"].move_to_end(key)
+    if bits is None:
+        bits = _combine(index, key)
+        if bits is None:
+            return None
+        with index["lock"]:
+            index["cache"][key] = bits
+            while len(index["cache"]) > MAX_CACHED_MASKS:
+                index["cache"].popitem(last=False)
+    return bits
+
+def select_mask(index, selections):
+    """
+    把多选结果转成行掩码
+    :return: 长度为行数的bool数组
+    """
+    bits = select_bits(index, selections)
+    if bits is None:
+        return np.ones(index["rows"], dtype=bool)
+    return np.unpackbits(bits, count=index["rows"]).view(bool)
+
+def check_index(index, df):
+    """
+    位图索引必须是为这份数据建立的：行数相同、行标签相同
+    （与建立索引时是同一个Index对象时不用逐个比较；行数相同但数据已换成另一版本时也能发现）
+    """
+    if index["rows"] != len(df):
+        raise ValueError(f"位图索引行数（{index['rows']}）与数据行数（{len(df)}）不一致")
+    if index["labels"] is not df.index and not index["labels"].equals(df.index):
+        raise ValueError("位图索引与数据的行标签不一致（数据已更新或行顺序不同），请重新建立索引")
+
+def filter_frame(df, selections, index=None):
+    """
+    按多选结果筛选DataFrame（替代df.query）
+    :param index: 位图索引，默认使用当前工作簿版本的共享索引（df须为get_sales_dataframe的返回值）
+    """
+    index = index or get_index()
+    check_index(index, df)
+    return df[select_mask(index, selections)]
+
+# ===================== 基准测试 =====================
+def _bench_frame(rows):
+    """模拟销售数据，只保留筛选维度（分类类型，与Parquet缓存一致）与总价，控制千万行级别的内存"""
+    import synthetic_data
+    parts = []
+    for chunk in synthetic_data.iter_chunks("sales", rows):
+        parts.append(chunk[FILTER_DIMS + ["总价"]])
+    df = pd.concat(parts, ignore_index=True)
+    for col in FILTER_DIMS:
+        df[col] = df[col].astype("category")
+    return df
+
+def _median_seconds(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def _query(df, city, customer_type, gender):
+    """原仪表板的写法（@变量从本函数的局部变量中解析）"""
+    return df.query("城市 == @city & 顾客类型 == @customer_type & 性别 == @gender")
+
+def run_benchmark(sizes, repeat=10):
+    """对比df.query与位图筛选（首次组合/缓存命中）得到筛选后DataFrame的耗时"""
+    city, customer_type, gender = ["太原", "大同"], ["会员用户"], ["女性", "男性"]
+    selections = {"城市": city, "顾客类型": customer_type, "性别": gender}
+    for rows in sizes:
+        df = _bench_frame(rows)
+        start = time.perf_counter()
+        index = build_index(df)
+        build_seconds = time.perf_counter() - start
+        query = lambda: _query(df, city, customer_type, gender)
+        same = query().index.equals(filter_frame(df, selections, index).index)
+
+        def cold():
+            index["cache"].clear()
+            return filter_frame(df, selections, index)
+
+        t_query = _median_seconds(query, repeat)
+        t_cold = _median_seconds(cold, repeat)
+        t_warm = _median_seconds(lambda: filter_frame(df, selections, index), repeat)
+        t_mask = _median_seconds(lambda: select_mask(index, selections), repeat)
+        print(f"{rows:>12,}行：df.query {t_query * 1e3:9.2f} ms | 位图（首次）{t_cold * 1e3:8.2f} ms | "
+              f"位图（缓存命中）{t_warm * 1e3:8.2f} ms（其中掩码 {t_mask * 1e3:.2f} ms）| "
+              f"建索引 {build_seconds:.2f} 秒 | 结果一致：{same}")
+        del df, index
+
+def main():
+    parser = argparse.ArgumentParser(description="位图筛选引擎")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="与df.query的耗时对比")
+    p_bench.add_argument("--sizes", type=int, nargs="+", default=[1_000, 1_000_000, 20_000_000])
+    args = parser.parse_args()
+    run_benchmark(args.sizes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# 大工作簿流式导入 - 用openpyxl只读模式逐行读取（不加载整个工作簿DOM），多个工作表由多个进程并行转换
+# 每个工作表写成分区列式存储中的一个分区：<存储目录>/sheet=<工作表名>/part-0.parquet，按批写入行组
+# 内存峰值只与 批大小 × 进程数 有关，与工作簿总行数无关
+# 用法：
+#   python sales_ingest.py ingest supermarket_sales.xlsx .sales_store [--jobs 4]
+#   python sales_ingest.py gen monthly.xlsx --sheets 12 --rows 50000      生成多工作表的模拟月度导出
+#   python sales_ingest.py bench                                           与pd.read_excel的内存峰值/耗时对比
+import argparse
+import os
+import queue
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing as mp
+import pandas as pd
+import sales_cache
+
+# ===================== 全局配置 =====================
+BATCH_ROWS = 20_000      # 每批（即每个Parquet行组）的行数
+SKIPROWS = 1             # 表头之前的标题行数（与read_excel的skiprows=1一致）
+STORE_DIR = ".sales_store"
+PART_NAME = "part-0.parquet"
+
+# ===================== 单个工作表的流式转换（在工作进程中执行） =====================
+def sales_schema():
+    """
+    由sales_cache.COLUMN_TYPES得到的显式schema，所有批次、所有工作表共用
+    （不按某一批的取值推断：整列为空的批次会被推断成null类型，各工作表的schema也会不一致）
+    """
+    import pyarrow as pa
+    return pa.schema([(col, pa.type_for_alias(arrow_type)) for col, arrow_type in sales_cache.COLUMN_TYPES.items()])
+
+def _write_batch(writer, rows, header, path, schema):
+    """把一批行按schema转成带类型的表并追加为一个行组（缺少的列为空，多出的列不写入），返回（可能新建的）writer"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    df = pd.DataFrame.from_records(rows, columns=header)
+    df = df.reindex(columns=[col for col in schema.names if col != "小时数"])
+    df = sales_cache.type_sales_frame(df, categorical=False)
+    table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+    if writer is None:
+        writer = pq.ParquetWriter(path, schema)
+    writer.write_table(table)
+    return writer
+
+def convert_sheet(path, sheet, out_dir, batch_rows=BATCH_ROWS, skiprows=SKIPROWS, progress_queue=None):
+    """
+    逐行读取一个工作表并写成Parquet分区（先写临时文件再rename）
+    :param progress_queue: 每写完一批放入 (工作表名, 本批行数)
+    :return: (工作表名, 行数)
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    writer, total, schema = None, 0, sales_schema()
+    part_dir = os.path.join(out_dir, f"sheet={sheet}")
+    os.makedirs(part_dir, exist_ok=True)
+    tmp_path = os.path.join(part_dir, f"{PART_NAME}.{os.getpid()}.tmp")
+    try:
+        rows = wb[sheet].iter_rows(values_only=True)
+        for _ in range(skiprows):
+            next(rows, None)
+        header = next(rows, None)
+        if header is None:
+            return sheet, 0
+        while header and header[-1] is None:   # 去掉表头右侧的空列
+            header = header[:-1]
+        width, batch = len(header), []
+        for row in rows:
+            row = row[:width]
+            if all(v is None for v in row):    # 跳过空行
+                continue
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                writer = _write_batch(writer, batch, header, tmp_path, schema)
+                total += len(batch)
+                if progress_queue is not None:
+                    progress_queue.put((sheet, len(batch)))
+                batch = []
+        if batch:
+            writer = _write_batch(writer, batch, header, tmp_path, schema)
+            total += len(batch)
+            if progress_queue is not None:
+                progress_queue.put((sheet, len(batch)))
+    finally:
+        wb.close()
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        os.rmdir(part_dir)
+        return sheet, 0
+    os.replace(tmp_path, os.path.join(part_dir, PART_NAME))
+    return sheet, total
+
+# ===================== 整个工作簿 =====================
+def list_sheets(path, skiprows=SKIPROWS):
+    """工作表名及其数据行数的估计（来自工作表的dimension信息，不读取单元格）"""
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return {ws.title: max((ws.max_row or 0) - skiprows - 1, 0) for ws in wb.worksheets}
+    finally:
+        wb.close()
+
+def _swap_dir(new_dir, target):
+    """用新生成的存储目录替换旧目录"""
+    old_dir = f"{target}.old"
+    if os.path.exists(target):
+        os.replace(target, old_dir)
+    os.replace(new_dir, target)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def ingest_workbook(path, out_dir=STORE_DIR, jobs=None, batch_rows=BATCH_ROWS, skiprows=SKIPROWS, progress=None):
+    """
+    把工作簿的所有工作表并行转换为分区列式存储（全部完成后整体替换out_dir）
+    :param progress: 回调 progress(已写行数, 估计总行数, 说明文字)
+    :return: {工作表名: 行数}
+    """
+    estimates = list_sheets(path, skiprows)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(estimates)))
+    total_estimate = sum(estimates.values())
+    build_dir = f"{out_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    done_rows, results = 0, {}
+    try:
+        with mp.Manager() as manager, ProcessPoolExecutor(max_workers=jobs) as pool:
+            progress_queue = manager.Queue()
+            pending = {pool.submit(convert_sheet, path, sheet, build_dir, batch_rows, skiprows, progress_queue)
+                       for sheet in estimates}
+            while pending:
+                finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    sheet, rows = future.result()
+                    results[sheet] = rows
+                while True:
+                    try:
+                        sheet, rows = progress_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    done_rows += rows
+                if progress:
+                    progress(done_rows, total_estimate, f"已完成 {len(results)}/{len(estimates)} 个工作表")
+        _swap_dir(build_dir, out_dir)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return results
+
+def read_store(store_dir=STORE_DIR, sheets=None, columns=None):
+    """
+    读取分区存储（可只读部分工作表/列），维度列转为分类类型，“sheet”为分区列
+    """
+    filters = [("sheet", "in", list(sheets))] if sheets else None
+    df = pd.read_parquet(store_dir, columns=columns, filters=filters)
+    for col in sales_cache.CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+# ===================== 模拟月度导出 =====================
+def generate_workbook(path, sheets, rows, seed=0):
+    """用openpyxl只写模式生成多工作表工作簿（版式与supermarket_sales.xlsx相同：标题行+表头+数据）"""
+    import openpyxl
+    from openpyxl.utils import get_column_letter
+    import synthetic_data
+    source = synthetic_data.describe_source("sales")
+    columns = list(source["frame"].columns)
+    wb = openpyxl.Workbook(write_only=True)
+    for i in range(sheets):
+        ws = wb.create_sheet(f"2022年{i + 1:02d}月")
+        ws.append([f"2022年{i + 1}月销售数据"])
+        ws.append(columns)
+        for start in range(0, rows, synthetic_data.CHUNK_ROWS):
+            chunk = synthetic_data.synthesize(source, min(synthetic_data.CHUNK_ROWS, rows - start),
+                                              seed + i, start + i * rows)
+            chunk["时间"] = pd.to_datetime(chunk["时间"], format="%H:%M:%S").dt.time
+            for row in chunk[columns].itertuples(index=False, name=None):
+                ws.append(row)
+    wb.save(path)
+    _add_dimensions(path, f"A1:{get_column_letter(len(columns))}{rows + 2}")
+
+def _add_dimensions(path, ref):
+    """
+    只写模式不写<dimension>，只读打开时openpyxl会为每个工作表完整扫描一遍来确定大小
+    （每个工作进程都要打开整个工作簿，相当于多读了一遍所有工作表）。Excel导出的文件都带这个标签，这里补上
+    """
+    import zipfile
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            if item.filename.startswith("xl/worksheets/sheet"):
+                data = data.replace(b"<sheetViews>", f'<dimension ref="{ref}" /><sheetViews>'.encode(), 1)
+            dst.writestr(item, data)
+    os.replace(tmp_path, path)
+
+# ===================== 内存峰值对比 =====================
+def _peak_rss_mb():
+    """本进程与已结束子进程中的最大常驻内存（MB，Linux下ru_maxrss单位为KB）"""
+    import resource  # 仅Unix提供，放在函数内以免Windows上导入本模块（期间分析页）失败
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+def _measure(method, path, out_dir, jobs, result_queue):
+    """在独立进程中运行一种读取方式并回报 耗时与内存峰值"""
+    start = time.perf_counter()
+    if method == "read_excel":
+        frames = pd.read_excel(path, sheet_name=None, skiprows=SKIPROWS)
+        rows = sum(len(f) for f in frames.values())
+    else:
+        rows = sum(ingest_workbook(path, out_dir, jobs).values())
+    result_queue.put((rows, time.perf_counter() - start, _peak_rss_mb()))
+
+def run_benchmark(configs, jobs):
+    """对不同规模的工作簿比较 pd.read_excel(sheet_name=None) 与 流式导入 的耗时和内存峰值"""
+    import tempfile
+    workdir = tempfile.mkdtemp(prefix="sales_ingest_")
+    ctx = mp.get_context("spawn")
+    try:
+        for sheets, rows in configs:
+            path = os.path.join(workdir, f"sales_{sheets}x{rows}.xlsx")
+            start = time.perf_counter()
+            # 生成也放到子进程：Linux下子进程的ru_maxrss从父进程继承，父进程必须保持较小
+            proc = ctx.Process(target=generate_workbook, args=(path, sheets, rows))
+            proc.start()
+            proc.join()
+            print(f"== {sheets}个工作表 × {rows:,}行（{os.path.getsize(path) / 2**20:.1f} MB，"
+                  f"生成 {time.perf_counter() - start:.0f} 秒）")
+            for method in ("read_excel", "流式导入"):
+                result_queue = ctx.Queue()
+                proc = ctx.Process(target=_measure,
+                                   args=(method, path, os.path.join(workdir, "store"), jobs, result_queue))
+                proc.start()
+                total, seconds, peak = result_queue.get()
+                proc.join()
+                print(f"   {method:<10} {total:>10,}行  {seconds:7.1f} 秒  内存峰值 {peak:7.0f} MB")
+            os.remove(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# ===================== 命令行入口 =====================
+def _print_progress(done, total, text):
+    percent = f"{done / total:6.1%}" if total else "   ---"
+    sys.stdout.write(f"\r{percent}  {done:,}/{total:,}行  {text}")
+    sys.stdout.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="大工作簿流式导入")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ingest = sub.add_parser("ingest", help="把工作簿转换为分区列式存储")
+    p_ingest.add_argument("workbook")
+    p_ingest.add_argument("out_dir", nargs="?", default=STORE_DIR)
+    p_ingest.add_argument("--jobs", type=int, default=None, help="工作进程数（默认CPU核数，不超过工作表数）")
+    p_ingest.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    p_gen = sub.add_parser("gen", help="生成多工作表的模拟月度导出")
+    p_gen.add_argument("out_path")
+    p_gen.add_argument("--sheets", type=int, default=12)
+    p_gen.add_argument("--rows", type=int, default=50_000, help="每个工作表的行数")
+    p_gen.add_argument("--seed", type=int, default=0)
+    p_bench = sub.add_parser("bench", help="与pd.read_excel对比耗时和内存峰值")
+    p_bench.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        start = time.perf_counter()
+        results = ingest_workbook(args.workbook, args.out_dir, args.jobs, args.batch_rows,
+                                  progress=_print_progress)
+        print(f"\n✅ {len(results)}个工作表、{sum(results.values()):,}行 → {args.out_dir}"
+              f"（{time.perf_counter() - start:.1f} 秒，内存峰值 {_peak_rss_mb():.0f} MB）")
+    elif args.command == "gen":
+        generate_workbook(args.out_path, args.sheets, args.rows, args.seed)
+        print(f"✅ 已生成：{args.out_path}（{os.path.getsize(args.out_path) / 2**20:.1f} MB）")
+    else:
+        run_benchmark([(4, 25_000), (4, 100_000)], args.jobs)
+
+if __name__ == "__main__":
+    main()
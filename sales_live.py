@@ -0,0 +1,317 @@
+# 实时销售 - 模拟器不断向只追加的JSON Lines文件写入交易，仪表板跟踪（tail）该文件
+# 新到的交易按 城市×顾客类型×性别×产品类型×小时数 累加进内存中的立方体（与sales_cube同结构，出现新取值时扩展该轴），
+# 页面只有指标与图表所在的片段按 st.fragment(run_every=...) 定时刷新，侧边栏等其余部分不重跑
+# 用法：
+#   python sales_live.py simulate --rate 200        模拟器：每秒写入200条交易（--reset 清空旧数据）
+#   python sales_live.py bench --rate 20000         接入吞吐量与更新延迟（交易写入 → 计入聚合）
+#   streamlit run sales_live.py                     实时销售仪表板（也在hub.py的“销售数据”分组中）
+import argparse
+import io
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+import streamlit as st
+import plotly.express as px
+from sales_cube import DIMS, FILTER_DIMS, MEASURES, summarize
+
+# ===================== 全局配置 =====================
+FEED_PATH = os.path.join(".sales_live", "feed.jsonl")
+REFRESH_SECONDS = 2          # 片段刷新间隔
+MAX_POLL_BYTES = 32 << 20    # 单次读取的上限，积压很多时分几次追上，避免一次刷新卡住页面
+STAMP_COL = "写入时间"        # 模拟器写入时的时间戳（秒），用于计算更新延迟
+EVENT_COLS = ["城市", "顾客类型", "性别", "产品类型", "总价", "评分", "时间", STAMP_COL]   # 聚合用到的字段，其余忽略
+LAG_BATCHES = 50             # 延迟统计保留最近多少批
+
+# ===================== 内存聚合 =====================
+def new_live():
+    """空的实时聚合：立方体结构同sales_cube.build_cube，各轴取值随数据出现而扩展（小时数固定为0~23）"""
+    labels = {dim: np.array([], dtype=object) for dim in DIMS}
+    labels["小时数"] = np.arange(24)
+    shape = tuple(len(labels[dim]) for dim in DIMS)
+    live = {"dims": list(DIMS), "labels": labels, "rows": 0}
+    for name in MEASURES:
+        live[name] = np.zeros(shape)
+    return live
+
+def fold(live, df):
+    """把一批交易累加进聚合（原地修改；维度列为分类列时只需映射各类别，不逐行查找）"""
+    if "小时数" not in df.columns:
+        df = df.assign(小时数=df["时间"].str[:2].astype(np.int64))
+    codes = []
+    for axis, dim in enumerate(DIMS):
+        col = df[dim] if isinstance(df[dim].dtype, pd.CategoricalDtype) else df[dim].astype("category")
+        categories = col.cat.categories.to_numpy()
+        labels = live["labels"][dim]
+        new = categories[~np.isin(categories, labels)]
+        if len(new):
+            labels = np.concatenate([labels, np.sort(new).astype(labels.dtype)])
+            live["labels"][dim] = labels
+            pad = [(0, 0)] * len(DIMS)
+            pad[axis] = (0, len(new))
+            for name in MEASURES:
+                live[name] = np.pad(live[name], pad)
+        codes.append(pd.Index(labels).get_indexer(categories)[col.cat.codes.to_numpy()])
+    shape = live["总价"].shape
+    flat = np.ravel_multi_index(codes, shape)
+    for name, col in MEASURES.items():
+        weights = None if col is None else df[col].to_numpy(dtype=np.float64)
+        live[name] += np.bincount(flat, weights=weights, minlength=live[name].size).reshape(shape)
+    live["rows"] += len(df)
+    return live
+
+# ===================== 跟踪文件 =====================
+def new_feed(path):
+    """跟踪状态：读取位置、文件标识、聚合结果与接入统计"""
+    return {"path": path, "offset": 0, "inode": None, "live": new_live(), "lock": threading.Lock(),
+            "events": 0, "busy_seconds": 0.0, "lags": deque(maxlen=LAG_BATCHES), "polled_at": None}
+
+def _parse(chunk):
+    """用pyarrow解析一段JSON Lines：只取聚合用到的字段，维度列字典编码（转为pandas分类列），时间截取小时"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.json as pj
+    schema = pa.schema([(col, pa.float64() if col in ("总价", "评分", STAMP_COL) else pa.string())
+                        for col in EVENT_COLS])
+    options = pj.ParseOptions(explicit_schema=schema, unexpected_field_behavior="ignore")
+    table = pj.read_json(io.BytesIO(chunk), parse_options=options)
+    hours = pc.cast(pc.utf8_slice_codeunits(table["时间"], 0, 2), pa.int64())
+    columns = {dim: pc.dictionary_encode(table[dim]) for dim in FILTER_DIMS + ["产品类型"]}
+    columns.update({"小时数": hours, "总价": table["总价"], "评分": table["评分"], STAMP_COL: table[STAMP_COL]})
+    return pa.table(columns).to_pandas()
+
+def poll(feed):
+    """
+    读取文件中新追加的完整行并累加（文件被截断或替换时从头开始、清空聚合）
+    :return: 本次新增的交易数
+    """
+    try:
+        info = os.stat(feed["path"])
+    except FileNotFoundError:
+        return 0
+    if info.st_ino != feed["inode"] or info.st_size < feed["offset"]:
+        feed.update(offset=0, inode=info.st_ino, live=new_live(), events=0, busy_seconds=0.0)
+        feed["lags"].clear()
+    if info.st_size == feed["offset"]:
+        feed["polled_at"] = time.time()
+        return 0
+    started = time.perf_counter()
+    with open(feed["path"], "rb") as f:
+        f.seek(feed["offset"])
+        chunk = f.read(MAX_POLL_BYTES)
+    end = chunk.rfind(b"\n") + 1   # 只处理完整的行，写了一半的行留到下次
+    if not end:
+        return 0
+    df = _parse(chunk[:end])
+    fold(feed["live"], df)
+    feed["offset"] += end
+    feed["events"] += len(df)
+    feed["busy_seconds"] += time.perf_counter() - started
+    feed["polled_at"] = time.time()
+    feed["lags"].append(feed["polled_at"] - df[STAMP_COL].to_numpy())
+    return len(df)
+
+def feed_stats(feed):
+    """接入统计：累计交易数、处理吞吐量（条/秒）、最近交易的更新延迟分位数（秒）"""
+    lags = np.concatenate(feed["lags"]) if feed["lags"] else np.array([])
+    return {"交易数": feed["events"],
+            "吞吐量": feed["events"] / feed["busy_seconds"] if feed["busy_seconds"] else None,
+            "延迟P50": float(np.percentile(lags, 50)) if len(lags) else None,
+            "延迟P95": float(np.percentile(lags, 95)) if len(lags) else None}
+
+# ===================== 模拟器 =====================
+def write_events(f, source, rows, seed=0, start=0):
+    """向已打开的文件追加rows条模拟交易（日期与时间取当前时刻）"""
+    import synthetic_data
+    df = synthetic_data.synthesize(source, rows, seed, start)
+    now = time.time()
+    df["日期"] = time.strftime("%Y-%m-%d", time.localtime(now))
+    df["时间"] = time.strftime("%H:%M:%S", time.localtime(now))
+    df[STAMP_COL] = now
+    f.write(df.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8"))
+    f.flush()
+
+def simulate(path=FEED_PATH, rate=200, seconds=None, tick=0.1, reset=False, seed=0):
+    """
+    按rate条/秒向path追加交易，每tick秒写一批
+    :param seconds: 运行时长，None表示一直运行
+    :return: 写入的交易数
+    """
+    import synthetic_data
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if reset and os.path.exists(path):
+        os.remove(path)
+    source = synthetic_data.describe_source("sales")
+    written, started = 0, time.time()
+    with open(path, "ab") as f:
+        while seconds is None or time.time() - started < seconds:
+            due = int((time.time() - started) * rate) - written
+            if due > 0:
+                write_events(f, source, due, seed, written)
+                written += due
+            time.sleep(tick)
+    return written
+
+# ===================== 页面功能 =====================
+@st.cache_resource
+def get_feed(path=FEED_PATH):
+    """所有会话共用一个跟踪状态（谁的片段先刷新谁就读取新数据）"""
+    return new_feed(path)
+
+def refresh(feed):
+    """读取新数据并计算当前筛选的指标；其它会话正在读取时直接使用已有聚合"""
+    if feed["lock"].acquire(blocking=False):
+        try:
+            poll(feed)
+        finally:
+            feed["lock"].release()
+
+def live_sidebar(live):
+    """
+    侧边栏筛选；某个维度全选时记为None，之后新出现的取值也自动计入
+    选项列表变化（出现新城市等）时多选框会被当作新控件，所以选择另存在session_state中，按上次的选择恢复
+    """
+    with st.sidebar:
+        st.header("请筛选数据：")
+        selections = {}
+        for dim, label in zip(FILTER_DIMS, ["请选择城市：", "请选择顾客类型：", "请选择性别："]):
+            options = sorted(live["labels"][dim].tolist())
+            widget_key, chosen_key, options_key = f"live_filter_{dim}", f"live_chosen_{dim}", f"live_options_{dim}"
+            previous, known = st.session_state.get(chosen_key), st.session_state.get(options_key)
+            if options != known or widget_key not in st.session_state:
+                if previous is None or set(previous) >= set(known or []):
+                    st.session_state[widget_key] = options   # 之前是全选：新取值一并选中
+                else:
+                    st.session_state[widget_key] = [value for value in options if value in previous]
+            chosen = st.multiselect(label, options=options, key=widget_key)
+            st.session_state[chosen_key], st.session_state[options_key] = chosen, options
+            selections[dim] = None if len(chosen) == len(options) else chosen
+    return selections
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def live_panel(path, selections):
+    """定时刷新的片段：读取新交易，更新指标与两张图"""
+    feed = get_feed(path)
+    refresh(feed)
+    start = time.perf_counter()
+    with feed["lock"]:
+        kpis, by_product, by_hour = summarize(feed["live"], selections)
+    elapsed = time.perf_counter() - start
+    if kpis["订单数"] == 0:
+        st.info("等待交易数据...")
+        return
+    left_key_col, middle_key_col, right_key_col = st.columns(3)
+    left_key_col.metric("总销售额", f"RMB ¥ {int(kpis['总销售额']):,}")
+    middle_key_col.metric("订单数", f"{kpis['订单数']:,}")
+    right_key_col.metric("每单的平均销售额", f"RMB ¥ {kpis['每单平均销售额']:.2f}")
+    left_chart_col, right_chart_col = st.columns(2)
+    with left_chart_col:
+        hour_fig = px.bar(by_hour.sort_index().to_frame(), x=by_hour.sort_index().index, y="总价",
+                          title="<b>按小时数划分的销售额</b>")
+        st.plotly_chart(hour_fig, use_container_width=True)
+    with right_chart_col:
+        product_fig = px.bar(by_product.to_frame(), x="总价", y=by_product.index, orientation="h",
+                             title="<b>按产品类型划分的销售额</b>")
+        st.plotly_chart(product_fig, use_container_width=True)
+    stats = feed_stats(feed)
+    lag = "—" if stats["延迟P50"] is None else f"{stats['延迟P50']:.2f} / {stats['延迟P95']:.2f} 秒"
+    speed = "—" if stats["吞吐量"] is None else f"{stats['吞吐量']:,.0f} 条/秒"
+    st.caption(f"⏱️ 每{REFRESH_SECONDS}秒刷新 | 已接入 {stats['交易数']:,} 条 | 接入吞吐量 {speed} | "
+               f"更新延迟 P50/P95 {lag} | 指标计算 {elapsed * 1000:.2f} 毫秒 | "
+               f"{time.strftime('%H:%M:%S')}")
+
+def live_page(path=FEED_PATH):
+    """实时销售仪表板：侧边栏只在筛选变化时重跑，指标与图表由片段定时刷新"""
+    st.title("⚡实时销售")
+    feed = get_feed(path)
+    refresh(feed)
+    if not feed["events"]:
+        st.info(f"还没有交易数据，请先启动模拟器：python sales_live.py simulate（写入 {path}）")
+    selections = live_sidebar(feed["live"])
+    live_panel(path, selections)
+
+# ===================== 基准测试 =====================
+def _simulate_process(path, rate, seconds):
+    simulate(path, rate, seconds, reset=True)
+
+def run_benchmark(rate=20_000, seconds=10.0, interval=0.5, backlog=500_000):
+    """
+    1) 接入吞吐量：一次追上backlog条积压交易
+    2) 更新延迟：模拟器子进程按rate条/秒写入，每interval秒读取一次（相当于片段的刷新间隔），
+       与每次刷新都重读整个文件并重建立方体的做法对比单次刷新耗时
+    """
+    import multiprocessing
+    import shutil
+    import tempfile
+    import synthetic_data
+    from sales_cube import build_cube
+    workdir = tempfile.mkdtemp(prefix="sales_live_bench_")
+    try:
+        path = os.path.join(workdir, "feed.jsonl")
+        with open(path, "wb") as f:
+            write_events(f, synthetic_data.describe_source("sales"), backlog)
+        feed = new_feed(path)
+        start = time.perf_counter()
+        while poll(feed):
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"积压 {feed['events']:,} 条（{os.path.getsize(path) / 2**20:.0f} MB）：追上用时 {elapsed:.2f} 秒，"
+              f"{feed['events'] / elapsed:,.0f} 条/秒")
+
+        writer = multiprocessing.get_context("spawn").Process(target=_simulate_process, args=(path, rate, seconds))
+        writer.start()
+        feed, incremental, rebuild = new_feed(path), [], []
+        time.sleep(interval)
+        while writer.is_alive():
+            t = time.perf_counter()
+            poll(feed)
+            incremental.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            with open(path, "rb") as f:
+                full = _parse(f.read()[:feed["offset"]])
+            build_cube(full)
+            rebuild.append(time.perf_counter() - t)
+            time.sleep(max(0.0, interval - rebuild[-1] - incremental[-1]))
+        writer.join()
+        poll(feed)
+        stats = feed_stats(feed)
+        print(f"模拟器 {rate:,} 条/秒 × {seconds:.0f} 秒，每 {interval} 秒刷新一次，共接入 {stats['交易数']:,} 条")
+        print(f"  更新延迟（写入 → 计入聚合） P50 {stats['延迟P50'] * 1e3:.0f} ms，P95 {stats['延迟P95'] * 1e3:.0f} ms")
+        print(f"  单次刷新：增量累加 中位 {np.median(incremental) * 1e3:.1f} ms | "
+              f"重读全部并重建 中位 {np.median(rebuild) * 1e3:.1f} ms，最后一次 {rebuild[-1] * 1e3:.1f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# ===================== 命令行入口 =====================
+def main():
+    parser = argparse.ArgumentParser(description="实时销售")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_sim = sub.add_parser("simulate", help="模拟器：持续写入交易")
+    p_sim.add_argument("--path", default=FEED_PATH)
+    p_sim.add_argument("--rate", type=float, default=200, help="每秒交易数")
+    p_sim.add_argument("--seconds", type=float, default=None, help="运行时长（默认一直运行）")
+    p_sim.add_argument("--reset", action="store_true", help="先清空已有的交易文件")
+    p_bench = sub.add_parser("bench", help="接入吞吐量与更新延迟")
+    p_bench.add_argument("--rate", type=int, default=20_000)
+    p_bench.add_argument("--seconds", type=float, default=10.0)
+    p_bench.add_argument("--interval", type=float, default=0.5)
+    args = parser.parse_args()
+    if args.command == "simulate":
+        print(f"写入 {args.path}，每秒 {args.rate:g} 条（Ctrl+C 停止）")
+        try:
+            simulate(args.path, args.rate, args.seconds, reset=args.reset)
+        except KeyboardInterrupt:
+            pass
+    else:
+        run_benchmark(args.rate, args.seconds, args.interval)
+
+# ===================== 主程序 =====================
+if __name__ == "__main__":
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    if get_script_run_ctx() is not None:
+        st.set_page_config(page_title="实时销售", page_icon="⚡", layout="wide")
+        live_page()
+    else:
+        main()
@@ -0,0 +1,169 @@
+# 分时段销售 - 把“时间”一次性解析为当天的秒数（整数），按 城市×顾客类型×性别 组合预聚合出每分钟的销售额与订单数，
+# 再由每分钟的结果合并出 5/15/60 分钟粒度；页面切换粒度、改变筛选都只是查表切片求和，用于按时段安排人手
+# 用法：
+#   from sales_rollup import get_rollups, rollup_series
+#   python sales_rollup.py bench --rows 5000000      与按筛选结果 to_datetime + floor + groupby 的耗时对比
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+import plotly.express as px
+import sales_cache
+from sales_cube import FILTER_DIMS
+
+# ===================== 全局配置 =====================
+RESOLUTIONS = (1, 5, 15, 60)   # 预先汇总的粒度（分钟），都能整除一天的1440分钟
+MINUTES_PER_DAY = 24 * 60
+
+# ===================== 解析时间 =====================
+def seconds_of_day(times):
+    """
+    "HH:MM:SS" → 当天的秒数（int32），空值或无法解析的时间为-1
+    定长字符串直接按字符码取各位数字；格式不规整（含空值）时退回pd.to_timedelta
+    """
+    values = np.asarray(times, dtype="U8")
+    digits = values.view(np.uint32).reshape(-1, 8).astype(np.int32) - ord("0")
+    colon = ord(":") - ord("0")
+    numeric = digits[:, [0, 1, 3, 4, 6, 7]]
+    if len(values) and not ((digits[:, 2] == colon).all() and (digits[:, 5] == colon).all()
+                            and ((numeric >= 0) & (numeric <= 9)).all()):
+        seconds = pd.to_timedelta(pd.Series(times).astype("string"), errors="coerce").dt.total_seconds()
+        return seconds.fillna(-1).to_numpy().astype(np.int32)
+    tens, ones = digits[:, [0, 3, 6]], digits[:, [1, 4, 7]]
+    hms = tens * 10 + ones
+    return (hms[:, 0] * 3600 + hms[:, 1] * 60 + hms[:, 2]).astype(np.int32)
+
+# ===================== 预聚合 =====================
+def build_rollups(df):
+    """
+    每个筛选组合 × 每分钟 的销售额与订单数，再合并出RESOLUTIONS中的各粒度
+    :return: {"labels": {维度: 取值数组}, "days": 交易日数, "rows": 计入汇总的行数,
+              "rollups": {粒度: {"总价"/"订单数": 形状为(各维度取值数..., 1440/粒度)的数组}}}
+    """
+    labels, codes = {}, []
+    for dim in FILTER_DIMS:
+        col = df[dim]
+        categorical = col if isinstance(col.dtype, pd.CategoricalDtype) else col.astype("category")
+        labels[dim] = np.asarray(categorical.cat.categories)
+        codes.append(categorical.cat.codes.to_numpy())
+    seconds = seconds_of_day(df["时间"])
+    # 时间或筛选维度为空的行无法落到任何格子里，不计入汇总
+    keep = np.logical_and.reduce([seconds >= 0] + [code >= 0 for code in codes])
+    minutes = seconds[keep] // 60
+    codes = [code[keep] for code in codes]
+    shape = tuple(len(labels[dim]) for dim in FILTER_DIMS) + (MINUTES_PER_DAY,)
+    flat = np.ravel_multi_index(codes + [minutes], shape)
+    size = int(np.prod(shape))
+    per_minute = {
+        "总价": np.bincount(flat, weights=df["总价"].to_numpy(dtype=np.float64)[keep], minlength=size).reshape(shape),
+        "订单数": np.bincount(flat, minlength=size).astype(np.float64).reshape(shape),
+    }
+    rollups = {}
+    for minutes_per_bin in RESOLUTIONS:
+        binned = shape[:-1] + (MINUTES_PER_DAY // minutes_per_bin, minutes_per_bin)
+        rollups[minutes_per_bin] = {name: arr.reshape(binned).sum(axis=-1) for name, arr in per_minute.items()}
+    days = int(df["日期"].nunique()) if "日期" in df.columns else 1
+    return {"labels": labels, "days": max(days, 1), "rows": int(keep.sum()), "rollups": rollups}
+
+@st.cache_resource(show_spinner="正在汇总分时段销售...", max_entries=2)
+def load_rollups(version):
+    """每个工作簿版本只解析、汇总一次，所有会话共用"""
+    return build_rollups(sales_cache.load_sales(version))
+
+def get_rollups():
+    """当前工作簿版本的分时段汇总"""
+    return load_rollups(sales_cache.artifact_hash(sales_cache.EXCEL_PATH))
+
+# ===================== 查表 =====================
+def rollup_series(rollups, selections, minutes=15):
+    """
+    某个筛选组合在某个粒度下的分时段结果
+    :param minutes: 粒度（分钟），须为RESOLUTIONS之一
+    :return: DataFrame，索引为时段起点（"HH:MM"），列为 总价/订单数/日均销售额/日均订单数
+    """
+    if minutes not in rollups["rollups"]:
+        raise ValueError(f"不支持的粒度：{minutes}分钟（可选：{'/'.join(map(str, RESOLUTIONS))}）")
+    index = []
+    for dim in FILTER_DIMS:
+        chosen = selections.get(dim)
+        labels = rollups["labels"][dim]
+        index.append(np.arange(len(labels)) if chosen is None else np.flatnonzero(np.isin(labels, list(chosen))))
+    axes = tuple(range(len(FILTER_DIMS)))
+    table = {name: arr[np.ix_(*index)].sum(axis=axes) for name, arr in rollups["rollups"][minutes].items()}
+    starts = np.arange(MINUTES_PER_DAY // minutes) * minutes
+    result = pd.DataFrame(table, index=pd.Index([f"{m // 60:02d}:{m % 60:02d}" for m in starts], name="时段"))
+    result["日均销售额"] = result["总价"] / rollups["days"]
+    result["日均订单数"] = result["订单数"] / rollups["days"]
+    return result
+
+def trim_idle(series):
+    """去掉营业时间之外（首尾没有交易）的时段"""
+    busy = np.flatnonzero(series["订单数"].to_numpy() > 0)
+    return series.iloc[busy[0]:busy[-1] + 1] if len(busy) else series.iloc[:0]
+
+# ===================== 页面组件 =====================
+def staffing_section(rollups, selections):
+    """按所选粒度显示日均订单数（排班曲线）"""
+    st.subheader("分时段客流（排班参考）")
+    minutes = st.radio("时间粒度：", RESOLUTIONS, index=RESOLUTIONS.index(15), horizontal=True,
+                       format_func=lambda m: f"{m}分钟", key="rollup_minutes")
+    start = time.perf_counter()
+    series = trim_idle(rollup_series(rollups, selections, minutes))
+    elapsed = time.perf_counter() - start
+    if series.empty:
+        return
+    fig = px.bar(series, x=series.index, y="日均订单数", hover_data={"日均销售额": ":,.2f"},
+                 title=f"<b>每{minutes}分钟的日均订单数</b>")
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"⏱️ 查表 {elapsed * 1000:.2f} 毫秒（{rollups['days']}个交易日，"
+               f"{'/'.join(map(str, RESOLUTIONS))}分钟粒度预聚合自 {rollups['rows']:,} 条交易）")
+
+# ===================== 基准测试 =====================
+def _pandas_series(df, selections, minutes):
+    """对照：筛选后解析时间、按粒度取整再groupby"""
+    sel = df[np.logical_and.reduce([df[dim].isin(selections[dim]) for dim in FILTER_DIMS])]
+    slot = pd.to_datetime(sel["时间"], format="%H:%M:%S").dt.floor(f"{minutes}min").dt.strftime("%H:%M")
+    return sel.groupby(slot)["总价"].agg(["sum", "count"])
+
+def run_benchmark(rows, repeat=5):
+    """建立汇总的一次性耗时，以及每种粒度的查询耗时（查表 vs pandas）和结果是否一致"""
+    import synthetic_data
+    df = sales_cache.type_sales_frame(synthetic_data.generate("sales", rows))
+    selections = {"城市": ["太原", "大同"], "顾客类型": ["会员用户"], "性别": ["女性", "男性"]}
+    start = time.perf_counter()
+    seconds_of_day(df["时间"])
+    parse_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    rollups = build_rollups(df)
+    build_seconds = time.perf_counter() - start
+
+    def timed(fn):
+        samples = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t)
+        return float(np.median(samples)) * 1e3
+
+    print(f"{rows:,}行：解析时间 {parse_seconds:.2f} 秒（pd.to_datetime 每次查询都要做），"
+          f"建立 {len(RESOLUTIONS)} 种粒度的汇总共 {build_seconds:.2f} 秒")
+    for minutes in RESOLUTIONS:
+        fast = rollup_series(rollups, selections, minutes)
+        slow = _pandas_series(df, selections, minutes)
+        fast = fast[fast["订单数"] > 0]
+        same = (fast.index.equals(slow.index) and np.array_equal(fast["订单数"], slow["count"])
+                and np.allclose(fast["总价"], slow["sum"]))
+        print(f"  {minutes:>2}分钟：查表 {timed(lambda: rollup_series(rollups, selections, minutes)):7.3f} ms | "
+              f"pandas {timed(lambda: _pandas_series(df, selections, minutes)):8.1f} ms | 结果一致：{same}")
+
+def main():
+    parser = argparse.ArgumentParser(description="分时段销售")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="与to_datetime+floor+groupby的耗时对比")
+    p_bench.add_argument("--rows", type=int, default=5_000_000)
+    args = parser.parse_args()
+    run_benchmark(args.rows)
+
+if __name__ == "__main__":
+    main()
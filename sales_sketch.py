@@ -0,0 +1,293 @@
+# 近似统计草图 - 商品数很多（数万SKU）时，按商品的销售额Top-N与不同顾客数不再做精确groupby
+# Count-Min草图（按商品累计销售额）+ Top-K候选 得到销售额最高的商品及误差上界；HyperLogLog估计不同顾客数
+# 草图可合并：每个存储分区（按月份的文件）× 每个 城市/顾客类型/性别 组合各存一份，查询时合并所选的部分
+# 商品/顾客键：优先使用“商品编号”/“顾客编号”列，当前工作簿没有这两列时退化为“产品类型”/“订单号”
+# 用法：
+#   from sales_sketch import build_sketches, merge_all, top_n, distinct_count
+#   python sales_sketch.py bench --parts 8 --rows 500000 --skus 50000    与精确groupby的耗时和误差对比
+import argparse
+import math
+import os
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+import plotly.express as px
+
+# ===================== 全局配置 =====================
+CM_WIDTH = 2048        # Count-Min每行的计数器个数（2的幂）：误差上界 ε·总额，ε = e / CM_WIDTH ≈ 0.13%
+CM_DEPTH = 4           # Count-Min行数：超出误差上界的概率 δ = e^-CM_DEPTH ≈ 1.8%
+TOP_K = 64             # 每个草图保留的候选商品数（大于页面显示的Top-N，合并后仍能找回全局头部商品）
+HLL_P = 12             # HyperLogLog寄存器数 2^12，相对标准误差 1.04/√4096 ≈ 1.6%
+PRODUCT_KEYS = ["商品编号", "产品类型"]
+CUSTOMER_KEYS = ["顾客编号", "订单号"]
+CELL_DIMS = ["城市", "顾客类型", "性别"]
+CELL_SEP = "|"
+_MULTIPLIERS = np.random.default_rng(20220101).integers(1, 2**63, size=CM_DEPTH, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+# ===================== 哈希 =====================
+def hash_keys(keys):
+    """键 → 64位哈希（按字符串计算，跨进程、跨分区稳定）"""
+    return pd.util.hash_array(np.asarray(pd.Series(keys).astype(str), dtype=object))
+
+def _cm_columns(hashes):
+    """乘法移位哈希：每行一个奇数乘数，取高位作为列号，形状(CM_DEPTH, n)"""
+    shift = np.uint64(64 - int(math.log2(CM_WIDTH)))
+    return (hashes[None, :] * _MULTIPLIERS[:, None]) >> shift
+
+def _leading_zeros(values):
+    """uint64数组的前导零个数（二分法，向量化）"""
+    values = values.copy()
+    count = np.zeros(len(values), dtype=np.int64)
+    for bits in (32, 16, 8, 4, 2, 1):
+        top_empty = (values >> np.uint64(64 - bits)) == 0
+        count[top_empty] += bits
+        values[top_empty] <<= np.uint64(bits)
+    count[values == 0] = 64
+    return count
+
+# ===================== 草图 =====================
+def new_sketch():
+    return {"cm": np.zeros((CM_DEPTH, CM_WIDTH)), "total": 0.0, "candidates": [],
+            "hll": np.zeros(1 << HLL_P, dtype=np.uint8)}
+
+def _estimate(sketch, hashes):
+    cols = _cm_columns(hashes)
+    return sketch["cm"][np.arange(CM_DEPTH)[:, None], cols].min(axis=0)
+
+def _keep_top(sketch, keys):
+    """在候选键中按Count-Min估计值保留前TOP_K个"""
+    keys = list(dict.fromkeys(keys))
+    if len(keys) > TOP_K:
+        est = _estimate(sketch, hash_keys(keys))
+        keep = np.argpartition(-est, TOP_K - 1)[:TOP_K]
+        keys = [keys[i] for i in keep]
+    sketch["candidates"] = keys
+
+def update(sketch, products, revenue, customers):
+    """
+    把一批交易加入草图（原地修改）
+    :param products: 商品键；revenue: 对应的销售额；customers: 顾客键
+    """
+    grouped = pd.Series(np.asarray(revenue, dtype=np.float64)).groupby(np.asarray(products)).sum()
+    keys = grouped.index.astype(str)
+    cols = _cm_columns(hash_keys(keys))
+    for d in range(CM_DEPTH):
+        sketch["cm"][d] += np.bincount(cols[d], weights=grouped.to_numpy(), minlength=CM_WIDTH)
+    sketch["total"] += float(grouped.sum())
+    _keep_top(sketch, sketch["candidates"] + list(keys))
+    hashes = hash_keys(pd.unique(np.asarray(customers)))
+    register = (hashes >> np.uint64(64 - HLL_P)).astype(np.int64)
+    rank = np.minimum(_leading_zeros(hashes << np.uint64(HLL_P)) + 1, 64 - HLL_P + 1).astype(np.uint8)
+    np.maximum.at(sketch["hll"], register, rank)
+    return sketch
+
+def merge(a, b):
+    """合并两个草图（返回新草图）"""
+    merged = {"cm": a["cm"] + b["cm"], "total": a["total"] + b["total"], "candidates": [],
+              "hll": np.maximum(a["hll"], b["hll"])}
+    _keep_top(merged, a["candidates"] + b["candidates"])
+    return merged
+
+def merge_all(sketches):
+    result = new_sketch()
+    for sketch in sketches:
+        result = merge(result, sketch)
+    return result
+
+# ===================== 查询 =====================
+def error_bound(sketch):
+    """Count-Min的加性误差上界 ε·总额（以1-δ的概率成立）"""
+    return math.e / CM_WIDTH * sketch["total"]
+
+def top_n(sketch, n):
+    """
+    销售额最高的n个商品
+    :return: DataFrame（估计销售额为上界估计，真实值在 [估计值-误差上界, 估计值] 内）
+    """
+    keys = sketch["candidates"]
+    if not keys:
+        return pd.DataFrame(columns=["商品", "估计销售额", "误差上界"])
+    est = _estimate(sketch, hash_keys(keys))
+    order = np.argsort(-est)[:n]
+    return pd.DataFrame({"商品": [keys[i] for i in order], "估计销售额": est[order],
+                         "误差上界": error_bound(sketch)})
+
+def distinct_count(sketch):
+    """HyperLogLog估计的不同顾客数，返回 (估计值, 相对标准误差)"""
+    m = 1 << HLL_P
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -sketch["hll"].astype(np.int64)))
+    zeros = int(np.count_nonzero(sketch["hll"] == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)   # 小基数时改用线性计数
+    return float(estimate), 1.04 / math.sqrt(m)
+
+# ===================== 按分区×筛选组合建立/保存 =====================
+def key_columns(columns):
+    """实际使用的商品键列与顾客键列（不存在时为None）"""
+    product = next((c for c in PRODUCT_KEYS if c in columns), None)
+    customer = next((c for c in CUSTOMER_KEYS if c in columns), None)
+    return product, customer
+
+def cell_key(values):
+    return CELL_SEP.join(str(v) for v in values)
+
+def build_sketches(df):
+    """每个 城市/顾客类型/性别 组合一份草图：{组合键: 草图}"""
+    product, customer = key_columns(df.columns)
+    result = {}
+    for values, part in df.groupby(CELL_DIMS, observed=True, sort=False):
+        result[cell_key(values)] = update(new_sketch(), part[product], part["总价"], part[customer])
+    return result
+
+def save_sketches(cells, path):
+    """保存为npz（每个组合4个数组），写临时文件再rename"""
+    arrays = {"cells": np.array(list(cells), dtype=str)}
+    for i, sketch in enumerate(cells.values()):
+        arrays[f"cm_{i}"] = sketch["cm"]
+        arrays[f"hll_{i}"] = sketch["hll"]
+        arrays[f"total_{i}"] = np.array(sketch["total"])
+        arrays[f"candidates_{i}"] = np.array(sketch["candidates"], dtype=str)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+def load_sketches(path):
+    with np.load(path) as data:
+        return {cell: {"cm": data[f"cm_{i}"], "hll": data[f"hll_{i}"], "total": float(data[f"total_{i}"]),
+                       "candidates": data[f"candidates_{i}"].tolist()}
+                for i, cell in enumerate(data["cells"].tolist())}
+
+def select_cells(cells, selections):
+    """取出符合筛选的组合的草图"""
+    chosen = [set(map(str, selections[dim])) if selections.get(dim) is not None else None for dim in CELL_DIMS]
+    return [sketch for key, sketch in cells.items()
+            if all(c is None or v in c for v, c in zip(key.split(CELL_SEP), chosen))]
+
+# ===================== 日期区间的合并草图 =====================
+@st.cache_resource(max_entries=256)
+def _load_cached(path):
+    """草图文件名带来源哈希，内容不变，按路径缓存"""
+    return load_sketches(path)
+
+def _month_covered(month, start, end):
+    first = pd.Timestamp(f"{month}-01")
+    return first >= pd.Timestamp(start) and first + pd.offsets.MonthEnd(0) <= pd.Timestamp(end)
+
+@st.cache_resource(max_entries=32)
+def _range_sketch(range_key, key, store_dir, _manifest, _frame):
+    selections = {dim: (None if chosen is None else list(chosen)) for dim, chosen in key}
+    _, start, end = range_key
+    by_month = {}
+    for f in _manifest["files"]:
+        by_month.setdefault(f["月份"], []).append(f)
+    sketches, row_months = [], []
+    for month, files in by_month.items():
+        if not (min(f["起始日期"] for f in files) <= end and max(f["结束日期"] for f in files) >= start):
+            continue
+        if _month_covered(month, start, end) and all("草图" in f for f in files):
+            for f in files:
+                sketches.extend(select_cells(_load_cached(os.path.join(store_dir, f["草图"])), selections))
+        else:
+            row_months.append(month)
+    product, customer = key_columns(_frame.columns)
+    if row_months:
+        # 区间只覆盖一部分的月份：草图包含区间外的天，改用已读取（已筛选）的行建立
+        rows = _frame[_frame["日期"].dt.strftime("%Y-%m").isin(row_months)]
+        if len(rows):
+            sketches.append(update(new_sketch(), rows[product], rows["总价"], rows[customer]))
+    merged = merge_all(sketches)
+    merged["keys"] = (product, customer)
+    return merged
+
+def range_sketch(manifest, store_dir, range_key, selections, frame):
+    """
+    日期区间+筛选条件下的合并草图：完整覆盖的月份直接合并各文件的草图，其余月份由筛选后的行建立
+    :param range_key: (清单版本, 起始日期, 结束日期)
+    :param frame: 该区间内筛选后的数据
+    """
+    from sales_trends import selection_key
+    return _range_sketch(range_key, selection_key(selections), store_dir, manifest, frame)
+
+# ===================== 页面组件 =====================
+def sketch_section(merged, top=10):
+    """Top-N商品销售额（带误差条）与不同顾客数"""
+    distinct, rel_err = distinct_count(merged)
+    table = top_n(merged, top)
+    product, customer = merged.get("keys", (PRODUCT_KEYS[-1], CUSTOMER_KEYS[-1]))
+    st.subheader(f"按{product}的销售额Top {top}（近似）")
+    st.caption(f"Count-Min草图估计：真实值在 [估计值 − {error_bound(merged):,.0f}, 估计值] 内"
+               f"（置信度 {1 - math.exp(-CM_DEPTH):.1%}）；"
+               f"不同{customer}数 ≈ {distinct:,.0f}（±{rel_err:.1%}，HyperLogLog）")
+    if table.empty:
+        return
+    table = table.iloc[::-1]
+    fig = px.bar(table, x="估计销售额", y="商品", orientation="h",
+                 error_x_minus="误差上界", error_x=[0] * len(table),
+                 title=f"<b>按{product}划分的销售额（近似Top {top}）</b>")
+    st.plotly_chart(fig, use_container_width=True)
+
+# ===================== 基准测试 =====================
+def _bench_part(rng, rows, skus, customers):
+    """一个分区的模拟交易：商品按Zipf分布，顾客均匀分布"""
+    sku = (rng.zipf(1.2, rows) - 1) % skus
+    return pd.DataFrame({
+        "城市": rng.choice(["临汾", "大同", "太原"], rows),
+        "顾客类型": rng.choice(["会员用户", "普通用户"], rows),
+        "性别": rng.choice(["女性", "男性"], rows),
+        "商品编号": sku.astype(np.int32),
+        "顾客编号": rng.integers(0, customers, rows).astype(np.int32),
+        "总价": np.round(rng.gamma(2.0, 150.0, rows), 2),
+    })
+
+def run_benchmark(parts, rows, skus, customers, top=20):
+    """每个分区建草图后合并查询Top-N与不同顾客数，对比精确groupby的耗时与结果"""
+    rng = np.random.default_rng(0)
+    frames, partitions, build_seconds = [], [], 0.0
+    for _ in range(parts):
+        df = _bench_part(rng, rows, skus, customers)
+        start = time.perf_counter()
+        partitions.append(build_sketches(df))
+        build_seconds += time.perf_counter() - start
+        frames.append(df)
+    everything = pd.concat(frames, ignore_index=True)
+    selections = {"城市": ["太原", "大同"], "顾客类型": ["会员用户"], "性别": ["女性", "男性"]}
+
+    start = time.perf_counter()
+    merged = merge_all(s for cells in partitions for s in select_cells(cells, selections))
+    approx = top_n(merged, top)
+    distinct, rel_err = distinct_count(merged)
+    sketch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sel = everything[everything["城市"].isin(selections["城市"]) & everything["顾客类型"].isin(selections["顾客类型"])
+                     & everything["性别"].isin(selections["性别"])]
+    exact = sel.groupby("商品编号")["总价"].sum().sort_values(ascending=False)
+    exact_distinct = sel["顾客编号"].nunique()
+    exact_seconds = time.perf_counter() - start
+
+    truth = exact.reindex(approx["商品"].astype(int)).to_numpy()
+    overlap = len(set(approx["商品"].astype(int)) & set(exact.index[:top]))
+    within = np.mean((approx["估计销售额"].to_numpy() - truth >= -1e-6)
+                     & (approx["估计销售额"].to_numpy() - truth <= approx["误差上界"].to_numpy()))
+    print(f"{parts}个分区 × {rows:,}行，{skus:,}个商品，{customers:,}个顾客；建草图共 {build_seconds:.1f} 秒")
+    print(f"  合并草图查询 {sketch_seconds * 1e3:8.1f} ms | 精确groupby {exact_seconds * 1e3:8.1f} ms")
+    print(f"  Top {top} 与精确结果重合 {overlap}/{top}，估计值落在误差范围内 {within:.0%}，"
+          f"最大高估 {np.max(approx['估计销售额'].to_numpy() - truth):,.0f}（误差上界 {error_bound(merged):,.0f}）")
+    print(f"  不同顾客数 ≈ {distinct:,.0f}，精确 {exact_distinct:,}，误差 {distinct / exact_distinct - 1:+.2%}"
+          f"（标准误差 {rel_err:.1%}）")
+
+def main():
+    parser = argparse.ArgumentParser(description="近似统计草图")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="与精确groupby的耗时和误差对比")
+    p_bench.add_argument("--parts", type=int, default=8)
+    p_bench.add_argument("--rows", type=int, default=500_000, help="每个分区的行数")
+    p_bench.add_argument("--skus", type=int, default=50_000)
+    p_bench.add_argument("--customers", type=int, default=300_000)
+    args = parser.parse_args()
+    run_benchmark(args.parts, args.rows, args.skus, args.customers)
+
+if __name__ == "__main__":
+    main()
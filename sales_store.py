@@ -0,0 +1,380 @@
+# 多期销售数据存储 - 把多个时期的销售文件（xlsx/csv/parquet）按“月份”分区写成列式文件，清单记录每个文件的日期范围
+# 查询某个日期区间时，只读取日期范围与之重叠的文件（分区裁剪），再用行组统计过滤到精确的日期
+# 每个文件旁边另存一份可合并的近似统计草图（sales_sketch：按商品销售额Top-N、不同顾客数）
+# 用法：
+#   python sales_store.py ingest supermarket_sales.xlsx sales_2022Q2.csv ...   导入（同名文件再次导入会覆盖）
+#   python sales_store.py gen periods/ --periods 8 --rows 100000                生成连续多个季度的模拟销售文件
+#   python sales_store.py bench                                                  分区裁剪与全量扫描的耗时对比
+#   streamlit run sales_store.py                                                 带日期区间筛选的多期销售仪表板
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import pandas as pd
+import streamlit as st
+import sales_cache
+from model_store import artifact_hash, file_lock
+
+# ===================== 全局配置 =====================
+STORE_DIR = ".sales_periods"
+MANIFEST_NAME = "_manifest.json"
+PARTITION_KEY = "月份"
+BATCH_ROWS = 100_000     # csv/parquet按批读取的行数
+SKETCH_SUFFIX = ".sketch.npz"
+
+# ===================== 清单 =====================
+def manifest_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, MANIFEST_NAME)
+
+def load_manifest(store_dir=STORE_DIR):
+    """
+    清单：{"sources": {来源名: 来源文件哈希}, "rejected": {来源名: 日期为空被拒绝的行数},
+          "files": [{path, 月份, 来源, 起始日期, 结束日期, 行数, 字节数, 草图}]}
+    """
+    path = manifest_path(store_dir)
+    if not os.path.exists(path):
+        return {"sources": {}, "rejected": {}, "files": []}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest.setdefault("rejected", {})   # 旧版清单没有该字段
+    return manifest
+
+def _save_manifest(manifest, store_dir):
+    path = manifest_path(store_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+# ===================== 导入 =====================
+def _iter_batches(path, workdir):
+    """按批读取一个时期文件（xlsx先经sales_ingest流式转换），内存只与批大小有关"""
+    import pyarrow.parquet as pq
+    lower = path.lower()
+    if lower.endswith((".xlsx", ".xlsm")):
+        import sales_ingest
+        staging = os.path.join(workdir, "xlsx")
+        sales_ingest.ingest_workbook(path, staging)
+        for root, _, names in sorted(os.walk(staging)):
+            for name in sorted(names):
+                if name.endswith(".parquet"):
+                    yield from _iter_batches(os.path.join(root, name), workdir)
+    elif lower.endswith(".parquet"):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=BATCH_ROWS):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, encoding="utf-8-sig", chunksize=BATCH_ROWS):
+            yield chunk
+
+def _normalize(df):
+    """统一列类型：日期为datetime，补充“小时数”（维度列保持字符串，读取时再转分类）"""
+    df = df.drop(columns=["sheet"], errors="ignore")
+    df["日期"] = pd.to_datetime(df["日期"]).astype("datetime64[ns]")   # 各来源统一精度，保证各文件schema一致
+    if "小时数" not in df.columns:
+        df = sales_cache.type_sales_frame(df, categorical=False)
+    return df
+
+def _write_sketches(parquet_path):
+    """为一个月份文件建立近似统计草图（缺少所需列时跳过，页面对该月份改为按行计算）"""
+    import pyarrow.parquet as pq
+    import sales_sketch
+    columns = pq.ParquetFile(parquet_path).schema_arrow.names
+    product, customer = sales_sketch.key_columns(columns)
+    needed = sales_sketch.CELL_DIMS + ["总价"]
+    if product is None or customer is None or not set(needed) <= set(columns):
+        return
+    df = pd.read_parquet(parquet_path, columns=needed + list(dict.fromkeys([product, customer])))
+    sales_sketch.save_sketches(sales_sketch.build_sketches(df), parquet_path + SKETCH_SUFFIX)
+
+def ingest_file(path, store_dir=STORE_DIR, force=False):
+    """
+    把一个时期文件按月份拆分写入存储；同一来源（文件名）再次导入时替换旧文件，内容未变化则跳过
+    日期为空的行无法归入任何月份分区，直接拒绝，只在清单中记录行数
+    :return: (本次写入的文件记录列表, 被拒绝的行数)，跳过时为 ([], 0)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    os.makedirs(store_dir, exist_ok=True)
+    source = os.path.splitext(os.path.basename(path))[0]
+    version = artifact_hash(path)
+    if not force and load_manifest(store_dir)["sources"].get(source) == version:
+        return [], 0
+    workdir = tempfile.mkdtemp(prefix="sales_store_", dir=store_dir)
+    writers, records, rejected = {}, {}, 0
+    try:
+        for batch in _iter_batches(path, workdir):
+            batch = _normalize(batch)
+            missing = batch["日期"].isna()
+            if missing.any():
+                rejected += int(missing.sum())
+                batch = batch[~missing]
+            months = batch["日期"].dt.strftime("%Y-%m")
+            for month, part in batch.groupby(months, sort=True):
+                table = pa.Table.from_pandas(part, preserve_index=False)
+                if month not in writers:
+                    writers[month] = pq.ParquetWriter(os.path.join(workdir, f"{month}.parquet"), table.schema)
+                    records[month] = {"起始日期": None, "结束日期": None, "行数": 0}
+                writers[month].write_table(table.cast(writers[month].schema))
+                record = records[month]
+                low, high = str(part["日期"].min().date()), str(part["日期"].max().date())
+                record["起始日期"] = min(filter(None, [record["起始日期"], low]))
+                record["结束日期"] = max(filter(None, [record["结束日期"], high]))
+                record["行数"] += len(part)
+        for writer in writers.values():
+            writer.close()
+        writers = {}
+        for month in records:
+            _write_sketches(os.path.join(workdir, f"{month}.parquet"))
+        # 清单锁内替换文件并更新清单（读者按清单取文件，删除旧文件放在清单更新之后）
+        with file_lock(manifest_path(store_dir)):
+            manifest = load_manifest(store_dir)
+            stale = [f for f in manifest["files"] if f["来源"] == source]
+            written = []
+            for month, record in sorted(records.items()):
+                rel_path = os.path.join(f"{PARTITION_KEY}={month}", f"{source}.{version[:8]}.parquet")
+                os.makedirs(os.path.join(store_dir, os.path.dirname(rel_path)), exist_ok=True)
+                target = os.path.join(store_dir, rel_path)
+                os.replace(os.path.join(workdir, f"{month}.parquet"), target)
+                record.update({"path": rel_path, PARTITION_KEY: month, "来源": source,
+                               "字节数": os.path.getsize(target)})
+                sketch = os.path.join(workdir, f"{month}.parquet{SKETCH_SUFFIX}")
+                if os.path.exists(sketch):
+                    os.replace(sketch, target + SKETCH_SUFFIX)
+                    record["草图"] = rel_path + SKETCH_SUFFIX
+                written.append(record)
+            manifest["files"] = [f for f in manifest["files"] if f["来源"] != source] + written
+            manifest["files"].sort(key=lambda f: (f[PARTITION_KEY], f["来源"]))
+            manifest["sources"][source] = version
+            manifest["rejected"][source] = rejected
+            _save_manifest(manifest, store_dir)
+            kept = {w["path"] for w in written} | {w["草图"] for w in written if "草图" in w}
+            for record in stale:
+                for rel_path in filter(None, [record["path"], record.get("草图")]):
+                    if rel_path not in kept:
+                        try:
+                            os.remove(os.path.join(store_dir, rel_path))
+                        except FileNotFoundError:
+                            pass
+        return written, rejected
+    finally:
+        for writer in writers.values():
+            writer.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# ===================== 查询（分区裁剪） =====================
+def query_range(start, end, store_dir=STORE_DIR, columns=None, manifest=None):
+    """
+    读取 [start, end] 日期区间内的销售数据
+    :return: (DataFrame, 裁剪统计dict)
+    """
+    import pyarrow.parquet as pq
+    began = time.perf_counter()
+    manifest = manifest or load_manifest(store_dir)
+    start, end = str(pd.Timestamp(start).date()), str(pd.Timestamp(end).date())
+    files = manifest["files"]
+    selected = [f for f in files if f["起始日期"] <= end and f["结束日期"] >= start]
+    filters = [("日期", ">=", pd.Timestamp(start)), ("日期", "<=", pd.Timestamp(end))]
+    if selected:
+        paths = [os.path.join(store_dir, f["path"]) for f in selected]
+        df = pq.ParquetDataset(paths, filters=filters).read(columns=columns).to_pandas()
+    else:
+        df = pd.DataFrame(columns=columns or [])
+    for col in sales_cache.CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    stats = {
+        "日期区间": f"{start} ~ {end}",
+        "分区总数": len({f[PARTITION_KEY] for f in files}),
+        "读取分区数": len({f[PARTITION_KEY] for f in selected}),
+        "文件总数": len(files),
+        "读取文件数": len(selected),
+        "读取分区": sorted({f[PARTITION_KEY] for f in selected}),
+        "候选行数": sum(f["行数"] for f in selected),
+        "命中行数": len(df),
+        "存储总行数": sum(f["行数"] for f in files),
+        "导入时拒绝的无日期行数": sum(manifest.get("rejected", {}).values()),
+        "读取字节数": sum(f["字节数"] for f in selected),
+        "存储总字节数": sum(f["字节数"] for f in files),
+        "耗时(毫秒)": round((time.perf_counter() - began) * 1000, 2),
+    }
+    return df, stats
+
+def date_bounds(manifest):
+    """存储中最早与最晚的日期"""
+    if not manifest["files"]:
+        return None, None
+    return (pd.Timestamp(min(f["起始日期"] for f in manifest["files"])).date(),
+            pd.Timestamp(max(f["结束日期"] for f in manifest["files"])).date())
+
+# ===================== 多期销售仪表板 =====================
+@st.cache_resource(show_spinner="正在读取所选日期区间...", max_entries=8)
+def load_range(manifest_version, start, end, store_dir=STORE_DIR):
+    """
+    按 清单版本+日期区间 缓存查询结果与它的位图索引（所有会话共用，调用方不要原地修改）
+    """
+    from sales_filter import build_index
+    from sales_trends import build_daily_cube
+    df, stats = query_range(start, end, store_dir)
+    if not len(df):
+        return {"frame": df, "stats": stats, "index": None, "daily": None}
+    return {"frame": df, "stats": stats, "index": build_index(df), "daily": build_daily_cube(df)}
+
+def snapshot_pending(store_dir=STORE_DIR):
+    """当前的supermarket_sales.xlsx是否尚未导入（或导入后又有改动）；只比较文件哈希，不解析工作簿"""
+    if not os.path.exists(sales_cache.EXCEL_PATH):
+        return False
+    source = os.path.splitext(os.path.basename(sales_cache.EXCEL_PATH))[0]
+    return load_manifest(store_dir)["sources"].get(source) != artifact_hash(sales_cache.EXCEL_PATH)
+
+def period_page(store_dir=STORE_DIR):
+    """侧边栏选择日期区间（只读取重叠的分区），其余筛选与图表沿用销售仪表板，下方为环比与滚动指标、近似Top-N与导出"""
+    import sales_data2
+    from sales_filter import filter_frame
+    from sales_trends import trend_section
+    from sales_sketch import range_sketch, sketch_section
+    from sales_export import export_section
+    # 导入要解析整个工作簿（多进程），只在服务器上用命令行执行，页面请求中不做
+    if snapshot_pending(store_dir):
+        st.info(f"ℹ️ {sales_cache.EXCEL_PATH} 尚未导入多期存储（或导入后已修改），"
+                f"请在服务器上执行 python sales_store.py ingest {sales_cache.EXCEL_PATH}")
+    manifest = load_manifest(store_dir)
+    low, high = date_bounds(manifest)
+    if low is None:
+        st.warning("⚠️ 存储中还没有销售数据，请先用 python sales_store.py ingest 导入")
+        return
+    with st.sidebar:
+        st.header("请选择日期区间：")
+        picked = st.date_input("日期区间：", value=(low, high), min_value=low, max_value=high)
+    if not isinstance(picked, (tuple, list)) or len(picked) != 2:
+        st.info("请选择结束日期")
+        return
+    range_key = (artifact_hash(manifest_path(store_dir)), str(picked[0]), str(picked[1]))
+    loaded = load_range(*range_key, store_dir)
+    df = loaded["frame"]
+    if df.empty:
+        st.warning("⚠️ 所选日期区间内没有交易记录")
+    else:
+        with st.sidebar:
+            st.header("请筛选数据：")
+            selections = {}
+            for dim, label in [("城市", "请选择城市："), ("顾客类型", "请选择顾客类型："), ("性别", "请选择性别：")]:
+                options = list(df[dim].cat.categories)
+                selections[dim] = st.multiselect(label, options=options, default=options)
+        df_selection = filter_frame(df, selections, loaded["index"])
+        if df_selection.empty:
+            st.warning("⚠️ 当前筛选条件下没有交易记录")
+        else:
+            sales_data2.main_page_demo(df_selection)
+            st.divider()
+            trend_section(loaded["daily"], selections, range_key)
+            st.divider()
+            sketch_section(range_sketch(manifest, store_dir, range_key, selections, df_selection))
+            st.divider()
+            export_section(df, loaded["index"], selections, len(df_selection),
+                           name=f"销售数据_{picked[0]}_{picked[1]}")
+    with st.expander("🔧 调试：分区裁剪"):
+        st.json(loaded["stats"])
+
+# ===================== 模拟多期数据 =====================
+def generate_periods(out_dir, periods, rows, fmt="parquet", seed=0):
+    """
+    生成连续periods个季度的模拟销售文件（每个文件为原数据日期整体平移k个季度）
+    :return: 生成的文件路径列表
+    """
+    import synthetic_data
+    os.makedirs(out_dir, exist_ok=True)
+    source = synthetic_data.describe_source("sales")
+    paths = []
+    for k in range(periods):
+        df = synthetic_data.synthesize(source, rows, seed, k * rows)
+        df["日期"] = pd.to_datetime(df["日期"]) + pd.DateOffset(months=3 * k)
+        quarter = df["日期"].min()
+        path = os.path.join(out_dir, f"sales_{quarter.year}Q{(quarter.month - 1) // 3 + 1}.{fmt}")
+        if fmt == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False, encoding="utf-8-sig")
+        paths.append(path)
+    return paths
+
+def run_benchmark(periods=8, rows=250_000, repeat=5):
+    """在periods个季度（共periods×rows行）的存储上，比较按月查询时分区裁剪与全量扫描+过滤的耗时"""
+    import pyarrow.parquet as pq
+    workdir = tempfile.mkdtemp(prefix="sales_store_bench_")
+    try:
+        store_dir = os.path.join(workdir, "store")
+        start = time.perf_counter()
+        for path in generate_periods(os.path.join(workdir, "src"), periods, rows):
+            ingest_file(path, store_dir)
+        manifest = load_manifest(store_dir)
+        print(f"导入 {periods}个季度 × {rows:,}行：{time.perf_counter() - start:.1f} 秒，"
+              f"{len(manifest['files'])}个文件")
+        low, high = date_bounds(manifest)
+        all_paths = [os.path.join(store_dir, f["path"]) for f in manifest["files"]]
+
+        def full_scan(a, b):
+            df = pq.ParquetDataset(all_paths).read().to_pandas()
+            return df[(df["日期"] >= a) & (df["日期"] <= b)]
+
+        for label, a, b in [("1个月", pd.Timestamp(high) - pd.Timedelta(days=30), pd.Timestamp(high)),
+                            ("1个季度", pd.Timestamp(high) - pd.Timedelta(days=90), pd.Timestamp(high)),
+                            ("全部", pd.Timestamp(low), pd.Timestamp(high))]:
+            pruned_t, scan_t = [], []
+            for _ in range(repeat):
+                t = time.perf_counter()
+                df, stats = query_range(a, b, store_dir, manifest=manifest)
+                pruned_t.append(time.perf_counter() - t)
+                t = time.perf_counter()
+                full = full_scan(a, b)
+                scan_t.append(time.perf_counter() - t)
+            same = len(df) == len(full) and abs(df["总价"].sum() - full["总价"].sum()) < 1e-6 * max(1, full["总价"].sum())
+            print(f"  {label:<5} 读取 {stats['读取文件数']:>3}/{stats['文件总数']}个文件，{len(df):>9,}行 | "
+                  f"分区裁剪 {min(pruned_t) * 1e3:8.1f} ms | 全量扫描 {min(scan_t) * 1e3:8.1f} ms | 结果一致：{same}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# ===================== 命令行入口 =====================
+def main():
+    parser = argparse.ArgumentParser(description="多期销售数据存储")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ingest = sub.add_parser("ingest", help="导入时期文件（xlsx/csv/parquet）")
+    p_ingest.add_argument("paths", nargs="+")
+    p_ingest.add_argument("--store", default=STORE_DIR)
+    p_ingest.add_argument("--force", action="store_true", help="内容未变化也重新导入")
+    p_gen = sub.add_parser("gen", help="生成连续多个季度的模拟销售文件")
+    p_gen.add_argument("out_dir")
+    p_gen.add_argument("--periods", type=int, default=8)
+    p_gen.add_argument("--rows", type=int, default=100_000, help="每个季度的行数")
+    p_gen.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    p_bench = sub.add_parser("bench", help="分区裁剪与全量扫描的耗时对比")
+    p_bench.add_argument("--periods", type=int, default=8)
+    p_bench.add_argument("--rows", type=int, default=250_000)
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        for path in args.paths:
+            start = time.perf_counter()
+            written, rejected = ingest_file(path, args.store, args.force)
+            if written or rejected:
+                print(f"✅ {path}：{sum(r['行数'] for r in written):,}行，"
+                      f"{len(written)}个月份分区（{time.perf_counter() - start:.1f} 秒）")
+                if rejected:
+                    print(f"⚠️ {path}：{rejected:,}行日期为空，未导入")
+            else:
+                print(f"⏭️ {path}：内容未变化，跳过")
+    elif args.command == "gen":
+        for path in generate_periods(args.out_dir, args.periods, args.rows, args.format):
+            print(f"✅ {path}")
+    else:
+        run_benchmark(args.periods, args.rows)
+
+# ===================== 主程序 =====================
+if __name__ == "__main__":
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    if get_script_run_ctx() is not None:
+        st.set_page_config(page_title="多期销售仪表板", page_icon="📅", layout="wide")
+        period_page()
+    else:
+        main()
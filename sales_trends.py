@@ -0,0 +1,223 @@
+# 环比与滚动指标 - 日环比、周环比，以及按产品类型/城市的近7日、近30日销售额与均值
+# 先把交易聚合成按日历天排序的稠密数组（天 × 城市 × 顾客类型 × 性别 × 产品类型，复用sales_cube.build_cube），
+# 筛选 = 切片求和，滚动窗口 = 沿天数轴的累计和之差，全部是向量化运算；结果按筛选组合缓存
+# 用法：
+#   from sales_trends import build_daily_cube, compute_trends
+#   python sales_trends.py bench      与按筛选结果groupby+rolling的耗时对比
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+import plotly.express as px
+import sales_cube
+from sales_cube import FILTER_DIMS
+
+# ===================== 全局配置 =====================
+TREND_DIMS = ["日期", "城市", "顾客类型", "性别", "产品类型"]   # 日历天必须是第0轴
+WINDOWS = (7, 30)   # 滚动窗口（天）
+
+# ===================== 按天的立方体 =====================
+def build_daily_cube(df):
+    """
+    按天聚合（日历连续：没有交易的日期也占一行，保证窗口按天数而不是按行数计算）
+    :return: sales_cube.build_cube的结果，第0轴为日期
+    """
+    days = pd.date_range(df["日期"].min().normalize(), df["日期"].max().normalize(), freq="D")
+    frame = pd.DataFrame({dim: df[dim] for dim in TREND_DIMS[1:]})
+    frame["日期"] = pd.Categorical(df["日期"].dt.normalize(), categories=days)
+    frame["总价"] = df["总价"].to_numpy()
+    frame["评分"] = df["评分"].to_numpy()
+    return sales_cube.build_cube(frame, TREND_DIMS)
+
+def daily_slice(daily, selections):
+    """
+    按城市/顾客类型/性别切片，求和掉顾客类型与性别
+    :return: ({度量: 形状为(天数, 选中城市数, 产品类型数)的数组}, 选中城市的取值)
+    """
+    index = []
+    for dim in daily["dims"]:
+        labels = daily["labels"][dim]
+        chosen = selections.get(dim) if dim in FILTER_DIMS else None
+        index.append(np.arange(len(labels)) if chosen is None
+                     else np.flatnonzero(np.isin(labels, list(chosen))))
+    sliced = {name: daily[name][np.ix_(*index)].sum(axis=(2, 3)) for name in sales_cube.MEASURES}
+    return sliced, daily["labels"]["城市"][index[1]]
+
+# ===================== 向量化窗口运算 =====================
+def rolling_sum(values, window):
+    """沿第0轴（天）的滚动和：累计和相减；不足一个完整窗口的天为NaN（与pandas rolling默认一致）"""
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        cumulative = np.cumsum(values, axis=0)
+        before = np.concatenate([np.zeros((1,) + values.shape[1:]), cumulative[:-window]])
+        out[window - 1:] = cumulative[window - 1:] - before
+    return out
+
+def _ratio(numerator, denominator):
+    """逐元素相除，分母为0或NaN时为NaN"""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    valid = np.isfinite(denominator) & (denominator != 0)
+    np.divide(numerator, denominator, out=out, where=valid)
+    return out
+
+def _at(series, day):
+    """取第day天（越界时为NaN）"""
+    if day < 0:
+        return np.full(series.shape[1:], np.nan)
+    return series[day]
+
+def _group_table(sales, count, rating, labels, index_name):
+    """
+    一组分组（各列为一个分组，形状(天数, 分组数)）在最后一天的对比指标
+    """
+    last = len(sales) - 1
+    rolled = {w: (rolling_sum(sales, w), rolling_sum(count, w), rolling_sum(rating, w)) for w in WINDOWS}
+    table = {
+        "当日销售额": _at(sales, last),
+        "前一日销售额": _at(sales, last - 1),
+    }
+    table["日环比"] = _ratio(table["当日销售额"] - table["前一日销售额"], table["前一日销售额"])
+    week_sales = rolled[7][0]
+    table["近7日销售额"] = _at(week_sales, last)
+    table["前7日销售额"] = _at(week_sales, last - 7)
+    table["周环比"] = _ratio(table["近7日销售额"] - table["前7日销售额"], table["前7日销售额"])
+    for w in WINDOWS:
+        s, c, r = (_at(a, last) for a in rolled[w])
+        if w != 7:
+            table[f"近{w}日销售额"] = s
+        table[f"近{w}日日均销售额"] = s / w
+        table[f"近{w}日每单均额"] = _ratio(s, c)
+        table[f"近{w}日平均评分"] = _ratio(r, c)
+    return pd.DataFrame(table, index=pd.Index(labels, name=index_name))
+
+def compute_trends(daily, selections):
+    """
+    某个筛选组合的环比与滚动指标
+    :return: {"截至": 最后一天, "总体": 1行DataFrame, "按产品类型"/"按城市": DataFrame, "每日": 每日销售额及滚动和}
+    """
+    sliced, cities = daily_slice(daily, selections)
+    sales, count, rating = sliced["总价"], sliced["订单数"], sliced["评分总和"]
+    days = daily["labels"]["日期"]
+    by_product = _group_table(sales.sum(axis=1), count.sum(axis=1), rating.sum(axis=1),
+                              daily["labels"]["产品类型"], "产品类型")
+    by_city = _group_table(sales.sum(axis=2), count.sum(axis=2), rating.sum(axis=2), cities, "城市")
+    total_sales = sales.sum(axis=(1, 2))[:, None]
+    overall = _group_table(total_sales, count.sum(axis=(1, 2))[:, None], rating.sum(axis=(1, 2))[:, None],
+                           ["全部"], "范围")
+    per_day = pd.DataFrame({"日销售额": total_sales[:, 0]}, index=pd.Index(days, name="日期"))
+    for w in WINDOWS:
+        per_day[f"近{w}日销售额"] = rolling_sum(total_sales, w)[:, 0]
+    return {"截至": pd.Timestamp(days[-1]).date(), "总体": overall,
+            "按产品类型": by_product, "按城市": by_city, "每日": per_day}
+
+# ===================== 页面组件 =====================
+def selection_key(selections):
+    """筛选组合的缓存键"""
+    return tuple((dim, None if selections.get(dim) is None else tuple(sorted(selections[dim])))
+                 for dim in FILTER_DIMS)
+
+@st.cache_resource(max_entries=32)
+def cached_trends(cube_key, key, _daily):
+    """
+    按 数据版本+筛选组合 缓存（_daily不参与哈希，由cube_key标识）
+    :param cube_key: 标识_daily的键（如 清单版本+日期区间）
+    """
+    return compute_trends(_daily, {dim: (None if chosen is None else list(chosen)) for dim, chosen in key})
+
+def _fmt_money(value):
+    return "—" if not np.isfinite(value) else f"RMB ¥ {value:,.0f}"
+
+def _fmt_pct(value):
+    return None if not np.isfinite(value) else f"{value:+.1%}"
+
+def trend_section(daily, selections, cube_key):
+    """日环比/周环比指标卡、按产品类型与城市的滚动指标表，以及每日销售额与滚动和的折线图"""
+    trends = cached_trends(cube_key, selection_key(selections), daily)
+    overall = trends["总体"].iloc[0]
+    st.subheader(f"环比与滚动指标（截至 {trends['截至']}）")
+    st.caption("窗口只使用所选日期区间内的数据，不足一个完整窗口时显示为“—”")
+    cols = st.columns(4)
+    cols[0].metric("当日销售额", _fmt_money(overall["当日销售额"]), _fmt_pct(overall["日环比"]))
+    cols[1].metric("近7日销售额", _fmt_money(overall["近7日销售额"]), _fmt_pct(overall["周环比"]))
+    cols[2].metric("近30日销售额", _fmt_money(overall["近30日销售额"]))
+    cols[3].metric("近7日每单均额", _fmt_money(overall["近7日每单均额"]))
+    percent_cols = {"日环比": "{:+.1%}", "周环比": "{:+.1%}"}
+    formats = {col: percent_cols.get(col, "{:,.2f}") for col in trends["按产品类型"].columns}
+    product_tab, city_tab = st.tabs(["按产品类型", "按城市"])
+    with product_tab:
+        st.dataframe(trends["按产品类型"].style.format(formats, na_rep="—"), use_container_width=True)
+    with city_tab:
+        st.dataframe(trends["按城市"].style.format(formats, na_rep="—"), use_container_width=True)
+    fig = px.line(trends["每日"], title="<b>每日销售额与滚动和</b>")
+    st.plotly_chart(fig, use_container_width=True)
+
+# ===================== 基准测试 =====================
+def _pandas_trends(df, selections):
+    """对照：筛选后按 日期×产品类型/城市 透视，再用DataFrame.rolling"""
+    sel = df[np.logical_and.reduce([df[dim].isin(selections[dim]) for dim in FILTER_DIMS])]
+    days = pd.date_range(df["日期"].min().normalize(), df["日期"].max().normalize(), freq="D")
+    out = {}
+    for group in ("产品类型", "城市"):
+        pivot = (sel.groupby([sel["日期"].dt.normalize(), group], observed=True)[["总价", "评分"]]
+                 .agg(["sum", "count"]).unstack(fill_value=0).reindex(days, fill_value=0))
+        out[group] = {w: pivot.rolling(w).sum().iloc[-1] for w in WINDOWS}
+    return out
+
+def run_benchmark(periods=8, rows=250_000, repeat=5):
+    """基础指标 vs 基础指标+环比滚动指标（立方体 / pandas），以及建立按天立方体的一次性耗时"""
+    import synthetic_data
+    from sales_filter import build_index, filter_frame
+    source = synthetic_data.describe_source("sales")
+    parts = []
+    for k in range(periods):
+        part = synthetic_data.synthesize(source, rows, 0, k * rows)
+        part["日期"] = pd.to_datetime(part["日期"]) + pd.DateOffset(months=3 * k)
+        parts.append(part[["日期"] + FILTER_DIMS + ["产品类型", "总价", "评分"]])
+    df = pd.concat(parts, ignore_index=True)
+    for col in FILTER_DIMS + ["产品类型"]:
+        df[col] = df[col].astype("category")
+    selections = {"城市": ["太原", "大同"], "顾客类型": ["会员用户"], "性别": ["女性", "男性"]}
+    index = build_index(df)
+    start = time.perf_counter()
+    daily = build_daily_cube(df)
+    build_seconds = time.perf_counter() - start
+
+    def base():
+        sel = filter_frame(df, selections, index)
+        return sel["总价"].sum(), sel["评分"].mean(), sel["总价"].mean()
+
+    def timed(fn):
+        samples = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t)
+        return float(np.median(samples)) * 1e3
+
+    trends = compute_trends(daily, selections)
+    reference = _pandas_trends(df, selections)
+    ref_30 = reference["产品类型"][30][("总价", "sum")].reindex(trends["按产品类型"].index)
+    same = np.allclose(trends["按产品类型"]["近30日销售额"], ref_30)
+    t_base = timed(base)
+    t_cube = timed(lambda: compute_trends(daily, selections))
+    t_pandas = timed(lambda: _pandas_trends(df, selections))
+    print(f"{len(df):,}行，{len(daily['labels']['日期'])}天（建立按天立方体 {build_seconds:.2f} 秒，每个数据版本一次）")
+    print(f"  基础指标（位图筛选+3个指标）      {t_base:8.1f} ms")
+    print(f"  环比与滚动指标：按天立方体          {t_cube:8.2f} ms（未命中缓存时；命中时为字典查找）")
+    print(f"  环比与滚动指标：groupby+rolling    {t_pandas:8.1f} ms")
+    print(f"  近30日销售额与pandas一致：{same}")
+
+def main():
+    parser = argparse.ArgumentParser(description="环比与滚动指标")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="与groupby+rolling的耗时对比")
+    p_bench.add_argument("--periods", type=int, default=8, help="季度数")
+    p_bench.add_argument("--rows", type=int, default=250_000, help="每个季度的行数")
+    args = parser.parse_args()
+    run_benchmark(args.periods, args.rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+# 预测应用启动器 - 先在后台线程预热模型，再在同一进程内启动Streamlit服务
+# 用法：python serve.py third.py [--server.port 8501 ...]
+# （等价于 streamlit run third.py，但模型在服务启动时就开始加载，而不是等第一位用户访问）
+import sys
+from streamlit.web import cli as stcli
+import model_warmup
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法：python serve.py <应用脚本.py> [streamlit参数...]")
+        sys.exit(1)
+    model_warmup.start_warmup()
+    sys.argv = ["streamlit", "run"] + sys.argv[1:]
+    sys.exit(stcli.main())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# 模拟数据生成 - 按四个原始数据集的列结构与各列分布，生成任意行数（可达千万行）的可复现数据
+# 方法：平滑自助采样（按行有放回抽样保留列间关系，连续列加少量高斯扰动并截断到原始范围、保留原小数位）
+# 用法：
+#   python synthetic_data.py insurance 1000000 insurance_1m.parquet   生成100万行（.csv或.parquet）
+#   python synthetic_data.py sales 10000000 sales_10m.parquet --seed 7
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+# ===================== 全局配置 =====================
+JITTER = 0.05            # 连续列扰动的标准差（占该列标准差的比例）
+CHUNK_ROWS = 1_000_000   # 写文件时每块生成的行数
+MAX_DECIMALS = 4         # 识别原始小数位时最多检查到的位数
+
+# ===================== 读取原始数据集 =====================
+def _read_insurance():
+    return pd.read_csv("insurance-chinese.csv", encoding="gbk")
+
+def _read_penguins():
+    import penguin_model as pm
+    return pm.read_dataset()
+
+def _read_students():
+    return pd.read_csv("student_data_adjusted_rounded.csv")
+
+def _read_sales():
+    df = pd.read_excel("supermarket_sales.xlsx", sheet_name="销售数据", skiprows=1)
+    df["时间"] = df["时间"].astype(str)  # 与应用中的处理一致：按"%H:%M:%S"字符串使用
+    return df
+
+# ===================== 各数据集的派生列（保证生成数据内部自洽） =====================
+def _fix_students(df, start):
+    df["学号"] = np.arange(start, start + len(df), dtype=np.int64) + 2023000001
+    return df
+
+def _fix_sales(df, start):
+    digits = pd.Series(np.arange(start, start + len(df), dtype=np.int64)).astype(str).str.zfill(10)
+    df["订单号"] = digits.str[:4] + "-" + digits.str[4:6] + "-" + digits.str[6:]  # 与原数据同为“4-2-4”位
+    df["总价"] = (df["单价"] * df["数量"]).round(2)  # 原数据中 总价 = 单价 × 数量
+    return df
+
+DATASETS = {
+    "insurance": {"reader": _read_insurance, "fix": None},
+    "penguins": {"reader": _read_penguins, "fix": None},
+    "students": {"reader": _read_students, "fix": _fix_students},
+    "sales": {"reader": _read_sales, "fix": _fix_sales},
+}
+
+# ===================== 列分布描述 =====================
+def _decimals(values):
+    """原始数据的小数位数（如BMI为1位、费用为2位）"""
+    values = values[~np.isnan(values)]
+    for d in range(MAX_DECIMALS + 1):
+        scaled = values * 10 ** d
+        if np.allclose(scaled, np.round(scaled), atol=1e-6):
+            return d
+    return MAX_DECIMALS
+
+def describe_source(name):
+    """
+    读取原始数据集并记录每个连续列的标准差/范围/小数位
+    :return: {"frame": 原始DataFrame, "continuous": {列名: (std, min, max, 小数位)}}
+    """
+    df = DATASETS[name]["reader"]().reset_index(drop=True)
+    continuous = {}
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col]):
+            values = df[col].to_numpy(dtype=np.float64)
+            continuous[col] = (np.nanstd(values), np.nanmin(values), np.nanmax(values), _decimals(values))
+    return {"name": name, "frame": df, "continuous": continuous}
+
+# ===================== 生成 =====================
+def synthesize(source, rows, seed=0, start=0):
+    """
+    生成rows行模拟数据
+    :param source: describe_source的返回值
+    :param start: 本块第一行的全局行号（用于生成不重复的学号/订单号）
+    """
+    rng = np.random.default_rng([seed, start])
+    frame = source["frame"]
+    df = frame.iloc[rng.integers(0, len(frame), rows)].reset_index(drop=True)
+    for col, (std, low, high, decimals) in source["continuous"].items():
+        values = df[col].to_numpy(dtype=np.float64)
+        values = np.clip(values + rng.normal(0.0, JITTER * std, rows), low, high)
+        df[col] = np.round(values, decimals)  # NaN保持为NaN（缺失比例与原数据一致）
+    fix = DATASETS[source["name"]]["fix"]
+    return fix(df, start) if fix else df
+
+def iter_chunks(name, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """逐块生成，内存占用只与块大小有关"""
+    source = describe_source(name)
+    for start in range(0, rows, chunk_rows):
+        yield synthesize(source, min(chunk_rows, rows - start), seed, start)
+
+def generate(name, rows, seed=0):
+    """一次性生成完整DataFrame（适合基准测试中的中小规模）"""
+    return pd.concat(list(iter_chunks(name, rows, seed)), ignore_index=True)
+
+def write_file(name, rows, path, seed=0, chunk_rows=CHUNK_ROWS):
+    """逐块写出CSV（utf-8-sig）或Parquet"""
+    if path.lower().endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        for chunk in iter_chunks(name, rows, seed, chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is not None:
+            writer.close()
+        return
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        for i, chunk in enumerate(iter_chunks(name, rows, seed, chunk_rows)):
+            chunk.to_csv(f, index=False, header=(i == 0))
+
+# ===================== 命令行入口 =====================
+def main():
+    parser = argparse.ArgumentParser(description="模拟数据生成")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("rows", type=int)
+    parser.add_argument("out_path", help="输出文件（.csv或.parquet）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_file(args.dataset, args.rows, args.out_path, args.seed)
+    print(f"✅ 已生成 {args.rows:,} 行 {args.dataset}：{args.out_path}"
+          f"（{time.perf_counter() - start:.1f} 秒）")
+
+if __name__ == "__main__":
+    main()